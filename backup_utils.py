@@ -1,12 +1,15 @@
 # backup_utils.py
 from __future__ import annotations
 from datetime import datetime
+from decimal import Decimal
 import os
 from typing import Optional
 
-from constants import COLUMNS
+from constants import COLUMNS, DATE_COLUMNS, DATETIME_COLUMNS
 import exporter
 import db_utils
+from diagnostics import traced, file_size
+from records import format_date, format_datetime
 
 
 def _ensure_dir(path: str):
@@ -16,7 +19,7 @@ def _ensure_dir(path: str):
 def _escape_sql_value(v):
     if v is None or v == "":
         return "NULL"
-    if isinstance(v, (int, float)):
+    if isinstance(v, (int, float, Decimal)):
         return str(v)
     s = str(v)
     # escape single quotes
@@ -24,25 +27,39 @@ def _escape_sql_value(v):
     return f"'{s}'"
 
 
+def _sql_formatter(fmt):
+    # Date/datetime columns come back from MySQL as date/datetime objects
+    def literal(v):
+        return "NULL" if v is None else f"'{fmt(v)}'"
+    return literal
+
+
+# Per-column SQL literal, chosen once from the column's type
+_SQL_LITERALS = [
+    _sql_formatter(format_date) if c in DATE_COLUMNS
+    else _sql_formatter(format_datetime) if c in DATETIME_COLUMNS
+    else _escape_sql_value
+    for c in COLUMNS
+]
+
+
+@traced('backup_sql', size=lambda r, a: file_size(r))
 def backup_to_sql(output_path: str) -> str:
-    """Create a portable SQL file containing schema + data for `patients`.
+    """Create a portable SQL file containing schema + data for `patients`
+    and the `patients_archive` table of older visits.
 
     Returns the written path.
     """
-    conn = db_utils._get_connection()  # use internal connector for consistency
-    try:
+    # Borrow from the shared pool used by the rest of the app
+    with db_utils.borrow_connection() as conn:
         cur = conn.cursor()
         # Determine current DB and table schema
         cur.execute("SELECT DATABASE()")
         db_name = cur.fetchone()[0]
 
-        cur.execute("SHOW CREATE TABLE `patients`")
-        _tbl, create_sql = cur.fetchone()
-
-        # Fetch data
-        cols_quoted = ", ".join([f"`{c}`" for c in COLUMNS])
-        cur.execute(f"SELECT {cols_quoted} FROM `patients` ORDER BY `Patient ID` ASC")
-        rows = cur.fetchall()
+        cur.execute("SHOW TABLES LIKE %s", (db_utils.ARCHIVE_TABLE,))
+        has_archive = cur.fetchone() is not None
+        tables = ['patients', db_utils.ARCHIVE_TABLE] if has_archive else ['patients']
 
         # Write dump
         with open(output_path, "w", encoding="utf-8") as f:
@@ -54,40 +71,41 @@ def backup_to_sql(output_path: str) -> str:
             if db_name:
                 f.write(f"CREATE DATABASE IF NOT EXISTS `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;\n")
                 f.write(f"USE `{db_name}`;\n\n")
-            f.write("-- Table schema\n")
-            f.write(f"{create_sql};\n\n")
-
-            f.write("-- Data\n")
-            if rows:
-                # Insert in batches to keep lines reasonable
-                batch_size = 500
-                for i in range(0, len(rows), batch_size):
-                    batch = rows[i:i+batch_size]
-                    values_sql_parts = []
-                    for row in batch:
-                        vals = []
-                        for idx, col in enumerate(COLUMNS):
-                            v = row[idx] if idx < len(row) else None
-                            # Dates and datetimes should be stringified in ISO
-                            if v is not None:
-                                if hasattr(v, 'strftime'):
-                                    # Date/datetime
-                                    fmt = '%Y-%m-%d %H:%M:%S' if getattr(v, 'hour', None) is not None else '%Y-%m-%d'
-                                    v = v.strftime(fmt)
-                            vals.append(_escape_sql_value(v))
-                        values_sql_parts.append("(" + ", ".join(vals) + ")")
-                    insert_sql = f"INSERT INTO `patients` ({cols_quoted}) VALUES \n  " + ",\n  ".join(values_sql_parts) + ";\n"
-                    f.write(insert_sql)
+            for table in tables:
+                _dump_table(f, cur, table)
             f.write("\nSET FOREIGN_KEY_CHECKS=1;\n")
+        cur.close()
         return output_path
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
 
 
+def _dump_table(f, cur, table: str):
+    cur.execute(f"SHOW CREATE TABLE `{table}`")
+    _tbl, create_sql = cur.fetchone()
+
+    # Fetch data
+    cols_quoted = ", ".join([f"`{c}`" for c in COLUMNS])
+    cur.execute(f"SELECT {cols_quoted} FROM `{table}` ORDER BY `Patient ID` ASC")
+    rows = cur.fetchall()
+
+    f.write(f"-- Table schema: {table}\n")
+    f.write(f"{create_sql};\n\n")
+
+    f.write(f"-- Data: {table}\n")
+    if rows:
+        # Insert in batches to keep lines reasonable
+        batch_size = 500
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i+batch_size]
+            values_sql_parts = []
+            for row in batch:
+                vals = [literal(v) for literal, v in zip(_SQL_LITERALS, row)]
+                values_sql_parts.append("(" + ", ".join(vals) + ")")
+            insert_sql = f"INSERT INTO `{table}` ({cols_quoted}) VALUES \n  " + ",\n  ".join(values_sql_parts) + ";\n"
+            f.write(insert_sql)
+    f.write("\n")
+
+
+@traced('backup_excel', size=lambda r, a: file_size(r))
 def backup_to_excel(output_path: str) -> str:
     """Create an Excel export using existing exporter."""
     exporter.export_db_to_excel(output_path)
@@ -0,0 +1,107 @@
+# bench_db.py
+# Micro-benchmark for the CRUD hot paths in db_utils: per-operation latency
+# with plain text statements vs server-side prepared statements.
+#
+# Runs against the database configured for the app (settings.json / DMS_DB_*
+# env vars). It inserts its own rows (Patient Name 'zz-bench') and deletes
+# them again; existing patients are not touched.
+#
+#   python bench_db.py [--iterations 200]
+import argparse
+import statistics
+import sys
+import time
+
+import db_utils
+from constants import AGE_GROUP_OPTIONS, CATEGORY_OPTIONS, COLUMNS, SEX_OPTIONS, WARD_OPTIONS
+
+BENCH_NAME = 'zz-bench'
+
+
+def _sample_item():
+    # Category values come from the option lists, so the row is one the
+    # form could have saved
+    values = {col: options[0] for col, options in CATEGORY_OPTIONS.items()}
+    values.update({
+        'Patient Name': BENCH_NAME,
+        'Sex': SEX_OPTIONS[1],
+        'Age': 34,
+        'Age Group': AGE_GROUP_OPTIONS[5],
+        'Ward Admission Date': '2024-01-15',
+        'Date of Visit': '2024-01-16',
+        'Diagnosis': 'Benchmark row',
+        'Ward': WARD_OPTIONS[0],
+        'Height': 160.5,
+        'Weight': 55.2,
+        'Encoded Date': '2024-01-16',
+    })
+    return [values.get(col) for col in COLUMNS]
+
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000.0, result
+
+
+def run(iterations):
+    """Return {operation: [ms, ...]} for one pass over the hot paths."""
+    timings = {'add_patient': [], 'update_patient_fields': [], 'update_patient': [],
+               'load_patients_since': [], 'delete_patient': []}
+    item = _sample_item()
+    version = db_utils.load_patients_since(None)[2]
+    ids = []
+    try:
+        for _ in range(iterations):
+            ms, row = _time(db_utils.add_patient, item)
+            timings['add_patient'].append(ms)
+            ids.append(row[0])
+            ms, stamp = _time(db_utils.update_patient_fields, row[0], {'Weight': 56.0}, row[-1])
+            timings['update_patient_fields'].append(ms)
+            full = list(row)
+            full[COLUMNS.index('Weight')] = 57.0
+            ms, _ = _time(db_utils.update_patient, row[0], full)
+            timings['update_patient'].append(ms)
+            ms, _ = _time(db_utils.load_patients_since, version)
+            timings['load_patients_since'].append(ms)
+    finally:
+        # Runs on failure too, so no benchmark rows are left in `patients`
+        for pid in ids:
+            ms, _ = _time(db_utils.delete_patient, pid)
+            timings['delete_patient'].append(ms)
+    return timings
+
+
+def _report(label, timings):
+    print(f"\n{label}")
+    print(f"  {'operation':<24}{'mean':>9}{'p50':>9}{'p95':>9}  (ms)")
+    for op, samples in timings.items():
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"  {op:<24}{statistics.mean(samples):>9.2f}{statistics.median(samples):>9.2f}{p95:>9.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='CRUD latency: text vs prepared statements')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    db_utils.init_db()
+    cfg = db_utils._get_db_config()
+    results = {}
+    for label, prepared in (('text statements', False), ('prepared statements', True)):
+        cfg['prepared_statements'] = prepared
+        run(max(1, args.iterations // 10))  # warm up pool + statement caches
+        results[label] = run(args.iterations)
+        _report(label, results[label])
+
+    text, prep = results['text statements'], results['prepared statements']
+    print(f"\n  {'operation':<24}{'p50 change':>12}")
+    for op in text:
+        before, after = statistics.median(text[op]), statistics.median(prep[op])
+        print(f"  {op:<24}{(after - before) / before * 100:>+11.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# bench_startup.py
+# Startup import-time check for the GUI entry point, using `python -X importtime`.
+#
+# Two phases are measured, each in a fresh interpreter:
+#   first frame  import inventory_app (what runs before the window is drawn)
+#   ui           import ui (what runs before the app is usable)
+# Each phase is checked against its budget (median of --runs), and the
+# modules that must stay lazy (Excel / reporting paths) must not appear.
+#
+#   python bench_startup.py [--runs 5] [--top 10]
+#
+# Exits 1 when a budget is exceeded or a deferred module is imported.
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Import-time budgets (ms), median over runs
+FIRST_FRAME_BUDGET_MS = 400
+UI_BUDGET_MS = 1500
+# Loaded on first use only; importing any of these at startup is a regression
+DEFERRED_MODULES = ['openpyxl', 'pandas', 'numpy', 'exporter', 'extractor', 'backup_utils', 'excel_utils']
+
+PHASES = [
+    ('first frame', 'inventory_app', FIRST_FRAME_BUDGET_MS),
+    ('ui', 'ui', UI_BUDGET_MS),
+]
+
+
+def _import_times(module):
+    """Run `import module` in a fresh interpreter; return {module: (self_us, cumulative_us)}."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=here, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}')
+    times = {}
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def run(runs, top):
+    failed = False
+    for label, module, budget_ms in PHASES:
+        totals = []
+        times = {}
+        for _ in range(runs):
+            times = _import_times(module)
+            totals.append(times[module][1] / 1000.0)
+        median = statistics.median(totals)
+        status = 'ok' if median <= budget_ms else 'OVER BUDGET'
+        print(f"\n{label}: import {module}  median {median:.0f} ms  (budget {budget_ms} ms)  {status}")
+        slowest = sorted(times.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"  {self_us / 1000.0:>8.1f} ms self {cumulative_us / 1000.0:>8.1f} ms cumulative  {name}")
+        loaded = [m for m in DEFERRED_MODULES if m in times]
+        if loaded:
+            print(f"  imported at startup but should be deferred: {', '.join(loaded)}")
+        failed = failed or median > budget_ms or bool(loaded)
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Startup import time vs budget')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest modules to list per phase')
+    args = parser.parse_args()
+    try:
+        return run(max(1, args.runs), args.top)
+    except RuntimeError as e:
+        print(e)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
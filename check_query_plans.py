@@ -0,0 +1,30 @@
+# check_query_plans.py
+# Applies pending schema migrations, then EXPLAINs the app's hot queries and
+# reports whether each one uses its intended index. Exits with status 1 if any
+# plan falls back to a different index or a full table scan.
+#
+#   python check_query_plans.py
+import sys
+
+import db_utils
+
+
+def main() -> int:
+    db_utils.init_db()
+    results = db_utils.explain_hot_queries()
+    failed = 0
+    for r in results:
+        status = 'OK  ' if r['ok'] else 'FAIL'
+        print(f"{status} {r['name']:<28} key={r['key'] or '(full scan)':<26} "
+              f"expected={r['expected']:<26} rows~{r['rows']}")
+        if not r['ok']:
+            failed += 1
+    if failed:
+        print(f"\n{failed} of {len(results)} queries are not using their index.")
+        return 1
+    print(f"\nAll {len(results)} hot queries use their indexes.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
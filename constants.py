@@ -9,6 +9,11 @@ COLUMNS = [
     'Encoded By', 'Encoded Date', 'Last Updated'
 ]
 
+# Column types (DATE / DATETIME / numeric in the database)
+DATE_COLUMNS = ['Ward Admission Date', 'Date of Visit', 'Encoded Date']
+DATETIME_COLUMNS = ['Last Updated']
+NUMERIC_COLUMNS = ['Patient ID', 'Age', 'Height', 'Weight']
+
 EXCEL_FILE = 'Dietary Report.xlsx'
 
 SEX_OPTIONS = ['Male', 'Female']
@@ -27,3 +32,23 @@ RND_DIETARY_MANAGEMENT_OPTIONS = ['Maintain Current Feeding', 'Change of Feeding
 ENCODED_BY_OPTIONS = ['RB', 'LA', 'JD', 'DM', 'Intern 1', 'Intern 2', 'Intern 3', 'Intern 4']
 WITH_DOCUMENTS_OPTIONS = ['Yes', 'No']
 GIVEN_NCP_OPTIONS = ['Yes', 'No']
+
+# Columns with a fixed vocabulary, mapped to their options
+CATEGORY_OPTIONS = {
+    'Sex': SEX_OPTIONS,
+    'Age Group': AGE_GROUP_OPTIONS,
+    'With Nutrition Support': NUTRITION_SUPPORT_OPTIONS,
+    'Ward': WARD_OPTIONS,
+    'Subspecialty': SUBSPECIALTY_OPTIONS,
+    'Type Of Visit': TYPE_OF_VISIT_OPTIONS,
+    'Purpose of Visit': PURPOSE_OPTIONS,
+    'Nutritional Status': NUTRITIONAL_STATUS_OPTIONS,
+    'Bowel Movement': BOWEL_MOVEMENT_OPTIONS,
+    'Emesis': EMESIS_OPTIONS,
+    'Abdominal Distention': ABDOMINAL_DISTENTION_OPTIONS,
+    'Biochemical Parameters': BIOCHEMICAL_PARAMETERS_OPTIONS,
+    'RND Dietary Management': RND_DIETARY_MANAGEMENT_OPTIONS,
+    'With Documents': WITH_DOCUMENTS_OPTIONS,
+    'Given NCP': GIVEN_NCP_OPTIONS,
+    'Encoded By': ENCODED_BY_OPTIONS,
+}
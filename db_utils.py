@@ -2,13 +2,20 @@
 # MySQL CRUD layer mirroring excel_utils.py signatures
 import json
 import os
-from datetime import datetime
-from typing import List, Any, Tuple
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Any, Tuple, Optional
 
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
+from mysql.connector.constants import ClientFlag
 
-from constants import COLUMNS
+from constants import COLUMNS, CATEGORY_OPTIONS, DATE_COLUMNS, DATETIME_COLUMNS
+import metrics
+from diagnostics import traced, estimate_bytes
+from records import PatientRecord, display_row, format_datetime
 
 # Default DB config (safe defaults; override via settings.json or env vars)
 DEFAULT_DB_CONFIG = {
@@ -17,13 +24,118 @@ DEFAULT_DB_CONFIG = {
     "user": "diet_app",
     "password": "",
     "database": "dietary_mgmt",
+    # Connection pool: number of warm connections kept open per app instance
+    # and how long (seconds) a caller waits for one when all are busy.
+    "pool_size": 4,
+    "pool_timeout": 10,
+    # Seconds to wait for the server to accept a connection before treating
+    # it as unavailable (the OS default can be well over 20 s)
+    "connect_timeout": 5,
+    # Run the fixed CRUD statements as server-side prepared statements
+    # (prepared once per pooled connection); false = plain text queries
+    "prepared_statements": True,
 }
 
+POOL_NAME = 'dms_pool'
+# mysql-connector refuses pools larger than this
+MAX_POOL_SIZE = 32
+
+# Loaded once per process; see _get_db_config() / reset_pool()
+_db_config: Optional[dict] = None
+_pool: Optional[pooling.MySQLConnectionPool] = None
+_pool_lock = threading.Lock()
+
+# load_patients_since() re-reads this many seconds before the last version so
+# rows committed by slow transactions right at the boundary are not missed.
+SYNC_OVERLAP_SECONDS = 5
+
+# Free-text search: columns covered by the FULLTEXT index, and categorical
+# columns (indexed) matched by equality when the query is one of their options
+FULLTEXT_COLUMNS = ['Patient Name', 'Diagnosis', 'Diet Prescriptions(Current)']
+SEARCH_CATEGORY_COLUMNS = ['Ward', 'Subspecialty', 'Nutritional Status', 'Age Group', 'Encoded By']
+# InnoDB ignores shorter words (innodb_ft_min_token_size)
+FT_MIN_TOKEN_SIZE = 3
+
+# Secondary indexes on `patients`: name -> index definition
+# (created by the schema migrations below)
+SEARCH_INDEXES = {
+    'ft_patient_text': 'FULLTEXT (' + ', '.join(f"`{c}`" for c in FULLTEXT_COLUMNS) + ')',
+    'idx_ward': 'INDEX (`Ward`)',
+    'idx_subspecialty': 'INDEX (`Subspecialty`)',
+    'idx_nutritional_status': 'INDEX (`Nutritional Status`)',
+    'idx_age_group': 'INDEX (`Age Group`)',
+    'idx_encoded_by': 'INDEX (`Encoded By`)',
+}
+QUERY_INDEXES = {
+    'idx_date_of_visit': 'INDEX (`Date of Visit`)',
+    'idx_ward_admission_date': 'INDEX (`Ward Admission Date`)',
+    'idx_age_group_sex': 'INDEX (`Age Group`, `Sex`)',
+    'idx_last_updated': 'INDEX (`Last Updated`)',
+    'idx_ward_date_of_visit': 'INDEX (`Ward`, `Date of Visit`)',
+}
+# Single-column indexes made redundant by a composite with the same prefix
+SUPERSEDED_INDEXES = ['idx_ward', 'idx_age_group']
+
+# Max IDs per `WHERE ... IN (...)` statement in the bulk operations
+BULK_CHUNK_SIZE = 500
+
+# Hot/cold split: visits dated before January 1st of the previous year are
+# moved from `patients` to `patients_archive` by archive_patients(), so the
+# UI only loads the current and previous year
+ARCHIVE_TABLE = 'patients_archive'
+HOT_YEARS = 2
+ARCHIVE_BATCH_SIZE = 500
+# Pause between archive batches so other PCs' writes get the table
+ARCHIVE_BATCH_PAUSE = 0.2
+ARCHIVE_LOCK = 'dms_archive'
+
+# Serializes migrations when several PCs start the app at once
+MIGRATION_LOCK = 'dms_schema_migrate'
+MIGRATION_LOCK_TIMEOUT = 30
+
 
 class DatabaseError(Exception):
     pass
 
 
+class ConflictError(DatabaseError):
+    """The row was changed or deleted by someone else since it was read."""
+    pass
+
+
+class DatabaseUnavailableError(DatabaseError):
+    """The server could not be reached (down, rebooting, network lost)."""
+    pass
+
+
+# Client error codes meaning the server is unreachable or the link dropped:
+# can't connect (2002/2003/2005), server gone away / lost connection
+# (2006/2013/2055)
+_UNAVAILABLE_ERRNOS = {2002, 2003, 2005, 2006, 2013, 2055}
+
+
+def _wrap_error(err: Exception, prefix: str = '') -> DatabaseError:
+    if isinstance(err, DatabaseError):
+        return err
+    msg = f"{prefix}{err}"
+    if getattr(err, 'errno', None) in _UNAVAILABLE_ERRNOS:
+        return DatabaseUnavailableError(msg)
+    return DatabaseError(msg)
+
+
+def is_unavailable_error(err: Exception) -> bool:
+    """True if err means the server can't be reached (as opposed to a bad query)."""
+    return isinstance(err, DatabaseUnavailableError) or getattr(err, 'errno', None) in _UNAVAILABLE_ERRNOS
+
+
+def _rollback_quietly(conn):
+    # After a dropped connection rollback() raises too; keep the original error
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
 def _load_db_config() -> dict:
     # Start with default config
     cfg = dict(DEFAULT_DB_CONFIG)
@@ -51,32 +163,184 @@ def _load_db_config() -> dict:
     cfg['user'] = os.environ.get('DMS_DB_USER', cfg['user'])
     cfg['password'] = os.environ.get('DMS_DB_PASSWORD', cfg['password'])
     cfg['database'] = os.environ.get('DMS_DB_NAME', cfg['database'])
+    cfg['pool_size'] = int(os.environ.get('DMS_DB_POOL_SIZE', cfg['pool_size']))
+    cfg['pool_size'] = max(1, min(MAX_POOL_SIZE, cfg['pool_size']))
+    cfg['pool_timeout'] = float(cfg.get('pool_timeout', DEFAULT_DB_CONFIG['pool_timeout']))
+    cfg['connect_timeout'] = int(cfg.get('connect_timeout', DEFAULT_DB_CONFIG['connect_timeout']))
+    prepared = os.environ.get('DMS_DB_PREPARED')
+    if prepared is not None:
+        cfg['prepared_statements'] = prepared.strip().lower() not in ('0', 'false', 'no', 'off')
+    cfg['prepared_statements'] = bool(cfg.get('prepared_statements', True))
     
     return cfg
 
 
+def _get_db_config() -> dict:
+    # settings.json and env vars are read once; call reset_pool() to reload
+    global _db_config
+    if _db_config is None:
+        _db_config = _load_db_config()
+    return _db_config
+
+
+def _connect_args(cfg: dict, database_required: bool = True) -> dict:
+    return dict(
+        host=cfg['host'],
+        port=cfg['port'],
+        user=cfg['user'],
+        password=cfg['password'],
+        database=(cfg['database'] if database_required else None),
+        autocommit=False,
+        use_pure=True,
+        connection_timeout=cfg['connect_timeout'],
+        # UPDATE rowcount = rows matched (not changed); the compare-and-set
+        # in update_patient_fields() relies on it
+        client_flags=[ClientFlag.FOUND_ROWS],
+    )
+
+
+def _get_pool() -> pooling.MySQLConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                cfg = _get_db_config()
+                try:
+                    # Opens pool_size connections up front; if the server is
+                    # unreachable we leave _pool unset and retry next call.
+                    _pool = pooling.MySQLConnectionPool(
+                        pool_name=POOL_NAME,
+                        pool_size=cfg['pool_size'],
+                        # No COM_RESET_CONNECTION on return: it would drop
+                        # the connection's prepared statements. _release()
+                        # rolls back instead, and the app sets no session state.
+                        pool_reset_session=False,
+                        **_connect_args(cfg),
+                    )
+                except mysql.connector.Error as err:
+                    raise _wrap_error(err)
+    return _pool
+
+
+def reset_pool():
+    """Drop idle pooled connections and re-read the DB config on next use."""
+    global _pool, _db_config
+    with _pool_lock:
+        pool, _pool = _pool, None
+        _db_config = None
+    if pool is not None:
+        try:
+            pool._remove_connections()
+        except Exception:
+            pass
+
+
 def _get_connection(database_required=True):
-    cfg = _load_db_config()
+    """Borrow a connection from the shared pool (close() returns it).
+
+    Connections without a default database (only needed by init_db to
+    create the schema) are opened directly and are not pooled.
+    """
+    cfg = _get_db_config()
+    if not database_required:
+        try:
+            return mysql.connector.connect(**_connect_args(cfg, database_required=False))
+        except mysql.connector.Error as err:
+            raise _wrap_error(err)
+
+    pool = _get_pool()
+    deadline = time.monotonic() + cfg['pool_timeout']
+    while True:
+        try:
+            # get_connection() pings the borrowed connection and transparently
+            # reconnects it if the server dropped it while idle (wait_timeout,
+            # server restart), so callers always receive a live session.
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            # Pool exhausted: all connections are in use by other callers
+            if time.monotonic() >= deadline:
+                raise DatabaseError('Timed out waiting for a free database connection.')
+            time.sleep(0.05)
+        except mysql.connector.Error as err:
+            raise _wrap_error(err)
+
+
+def _release(conn):
+    """Return a borrowed connection to the pool (or close a direct one).
+
+    Ends any transaction the caller left open (e.g. a read-only snapshot)
+    so the next borrower starts clean.
+    """
     try:
-        conn = mysql.connector.connect(
-            host=cfg['host'],
-            port=cfg['port'],
-            user=cfg['user'],
-            password=cfg['password'],
-            database=(cfg['database'] if database_required else None),
-            autocommit=False,
-            use_pure=True,
-        )
-        return conn
-    except mysql.connector.Error as err:
-        raise DatabaseError(str(err))
+        if conn.in_transaction:
+            conn.rollback()
+    except Exception:
+        pass
+    conn.close()
+
+
+@contextmanager
+def borrow_connection():
+    """Context manager yielding a pooled connection, returned to the pool on exit.
+
+    Used by backup_utils and exporter so they share the app's warm connections.
+    """
+    conn = _get_connection()
+    try:
+        yield conn
+    finally:
+        _release(conn)
+
+
+# Prepared statements cached per pooled connection: at most this many, the
+# oldest is closed (deallocated on the server) when the limit is reached
+MAX_PREPARED_PER_CONNECTION = 32
+
+
+def _statement_cursor(conn, sql: str):
+    # Cursors live on the underlying session (the pool hands out a new
+    # wrapper on every borrow). A reconnect starts a new session whose
+    # connection_id differs, so the old statements are forgotten.
+    cnx = getattr(conn, '_cnx', conn)
+    session = cnx.connection_id
+    cache = getattr(cnx, '_dms_statements', None)
+    if cache is None or cache[0] != session:
+        cache = (session, {})
+        cnx._dms_statements = cache
+    cursors = cache[1]
+    prepared = _get_db_config()['prepared_statements']
+    key = sql if prepared else None
+    cur = cursors.get(key)
+    if cur is None:
+        if prepared and len(cursors) >= MAX_PREPARED_PER_CONNECTION:
+            oldest = next(iter(cursors))
+            try:
+                cursors.pop(oldest).close()
+            except Exception:
+                pass
+        # Text mode shares one plain cursor for every statement
+        cur = cnx.cursor(prepared=True) if prepared else cnx.cursor()
+        cursors[key] = cur
+    return cur
+
+
+def _execute(conn, sql: str, params: Tuple[Any, ...] = ()):
+    """Run one of the fixed statements below on conn and return its cursor.
+
+    The statement is prepared on the server the first time a pooled
+    connection runs it and only re-executed with new parameters afterwards.
+    Cursors belong to the connection: read all results, don't close them.
+    """
+    cur = _statement_cursor(conn, sql)
+    cur.execute(sql, params)
+    return cur
 
 
 def init_db():
     """Check connectivity and ensure `patients` table exists.
     Assumes you've run schema_dietary_mgmt.sql. If not, attempts to create the table.
     """
-    cfg = _load_db_config()
+    cfg = _get_db_config()
     # Ensure database exists
     try:
         conn = _get_connection(database_required=False)
@@ -86,7 +350,7 @@ def init_db():
         cur.close()
         conn.close()
     except Exception as e:
-        raise DatabaseError(f"Failed to ensure database: {e}")
+        raise _wrap_error(e, "Failed to ensure database: ")
 
     # Ensure table exists
     create_sql = (
@@ -131,7 +395,7 @@ def init_db():
         cur.execute(create_sql)
         conn.commit()
     except Exception as e:
-        raise DatabaseError(f"Failed to ensure table: {e}")
+        raise _wrap_error(e, "Failed to ensure table: ")
     finally:
         try:
             cur.close()
@@ -142,9 +406,213 @@ def init_db():
         except Exception:
             pass
 
+    migrate()
+
+
+# --- Schema migrations ---
+# Each migration is (version, description, fn(cur)). Applied versions are
+# recorded in `schema_version`; never edit or renumber a released migration,
+# append a new one instead. MySQL commits DDL implicitly, so every step must
+# be safe to re-run if a migration is interrupted half way.
+
+def _index_exists(cur, table: str, name: str) -> bool:
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, name),
+    )
+    return bool(cur.fetchone()[0])
+
+
+def _ensure_index(cur, table: str, name: str, definition: str):
+    # MySQL has no CREATE INDEX IF NOT EXISTS; check information_schema first
+    if _index_exists(cur, table, name):
+        return
+    kind, _, columns = definition.partition(' ')
+    cur.execute(f"ALTER TABLE `{table}` ADD {kind} `{name}` {columns}")
+
+
+def _drop_index(cur, table: str, name: str):
+    if _index_exists(cur, table, name):
+        cur.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+
+
+def _migration_1_tombstones(cur):
+    # Tombstones so other PCs can drop deleted rows during incremental sync
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS `patients_deleted` (
+          `Patient ID` INT NOT NULL,
+          `Deleted At` DATETIME NOT NULL,
+          PRIMARY KEY (`Patient ID`),
+          KEY `idx_deleted_at` (`Deleted At`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def _migration_2_search_indexes(cur):
+    for name, definition in SEARCH_INDEXES.items():
+        _ensure_index(cur, 'patients', name, definition)
+
+
+def _migration_3_query_indexes(cur):
+    for name, definition in QUERY_INDEXES.items():
+        _ensure_index(cur, 'patients', name, definition)
+    for name in SUPERSEDED_INDEXES:
+        _drop_index(cur, 'patients', name)
+
+
+def _migration_4_archive_table(cur):
+    # Same columns and indexes as `patients`. RANGE partitioning by year was
+    # not an option: MySQL requires the partitioning column in every unique
+    # key (the primary key is Patient ID alone) and InnoDB does not support
+    # FULLTEXT indexes on partitioned tables.
+    cur.execute(f"CREATE TABLE IF NOT EXISTS `{ARCHIVE_TABLE}` LIKE `patients`")
+
+
+MIGRATIONS = [
+    (1, 'patients_deleted tombstone table', _migration_1_tombstones),
+    (2, 'FULLTEXT and categorical search indexes', _migration_2_search_indexes),
+    (3, 'date, age group/sex, last updated and ward/date indexes', _migration_3_query_indexes),
+    (4, 'patients_archive table for visits older than the hot window', _migration_4_archive_table),
+]
+
+
+def get_schema_version(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(`version`), 0) FROM `schema_version`")
+    return int(cur.fetchone()[0])
+
+
+def migrate() -> int:
+    """Apply pending schema migrations. Returns the resulting schema version."""
+    conn = _get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS `schema_version` (
+              `version` INT NOT NULL,
+              `description` VARCHAR(255) NOT NULL,
+              `applied_at` DATETIME NOT NULL,
+              PRIMARY KEY (`version`)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """
+        )
+        cur.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if cur.fetchone()[0] != 1:
+            raise DatabaseError('Timed out waiting for another PC to finish upgrading the database.')
+        try:
+            # Re-read under the lock; another PC may have just migrated
+            current = get_schema_version(cur)
+            conn.commit()
+            for version, description, fn in MIGRATIONS:
+                if version <= current:
+                    continue
+                fn(cur)
+                cur.execute(
+                    "INSERT INTO `schema_version` (`version`, `description`, `applied_at`) VALUES (%s, %s, NOW())",
+                    (version, description),
+                )
+                conn.commit()
+                current = version
+            return current
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cur.fetchall()
+    except mysql.connector.Error as err:
+        raise _wrap_error(err, "Schema migration failed: ")
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        _release(conn)
+
+
+# Queries the app relies on, with the index each should be using.
+# Parameters are representative sample values.
+HOT_QUERIES = [
+    ('visits by date range',
+     "SELECT `Patient ID` FROM `patients` WHERE `Date of Visit` BETWEEN %s AND %s",
+     ('2025-01-01', '2025-01-31'), 'idx_date_of_visit'),
+    ('admissions by date range',
+     "SELECT `Patient ID` FROM `patients` WHERE `Ward Admission Date` BETWEEN %s AND %s",
+     ('2025-01-01', '2025-01-31'), 'idx_ward_admission_date'),
+    ('age group and sex',
+     "SELECT `Patient ID` FROM `patients` WHERE `Age Group` = %s AND `Sex` = %s",
+     ('0-4 years old', 'Male'), 'idx_age_group_sex'),
+    ('changed since',
+     "SELECT `Patient ID` FROM `patients` WHERE `Last Updated` >= %s",
+     ('2025-01-01 00:00:00',), 'idx_last_updated'),
+    ('ward visits by date range',
+     "SELECT `Patient ID` FROM `patients` WHERE `Ward` = %s AND `Date of Visit` BETWEEN %s AND %s",
+     ('ICU', '2025-01-01', '2025-01-31'), 'idx_ward_date_of_visit'),
+    # search_patients(): the FULLTEXT branch on both tables, and the
+    # categorical option branches without a composite index above
+    ('free-text search',
+     "SELECT `Patient ID` FROM `patients` WHERE MATCH(" + ', '.join(f"`{c}`" for c in FULLTEXT_COLUMNS)
+     + ") AGAINST (%s IN BOOLEAN MODE)",
+     ('+pneumonia*',), 'ft_patient_text'),
+    ('archive free-text search',
+     f"SELECT `Patient ID` FROM `{ARCHIVE_TABLE}` WHERE MATCH(" + ', '.join(f"`{c}`" for c in FULLTEXT_COLUMNS)
+     + ") AGAINST (%s IN BOOLEAN MODE)",
+     ('+pneumonia*',), 'ft_patient_text'),
+    ('search by subspecialty',
+     "SELECT `Patient ID` FROM `patients` WHERE `Subspecialty` = %s",
+     ('Cardio',), 'idx_subspecialty'),
+    ('search by nutritional status',
+     "SELECT `Patient ID` FROM `patients` WHERE `Nutritional Status` = %s",
+     ('SAM',), 'idx_nutritional_status'),
+    ('search by encoder',
+     "SELECT `Patient ID` FROM `patients` WHERE `Encoded By` = %s",
+     ('RB',), 'idx_encoded_by'),
+]
+
+
+def explain_hot_queries() -> List[dict]:
+    """Run EXPLAIN on HOT_QUERIES and report which index each plan uses.
+
+    Returns one dict per query: name, expected, key (index chosen, or None
+    for a full scan), rows (estimate) and ok. Note that on a nearly empty
+    table the optimizer may legitimately prefer a scan.
+    """
+    results = []
+    conn = _get_connection()
+    try:
+        cur = conn.cursor()
+        for name, sql, params, expected in HOT_QUERIES:
+            cur.execute("EXPLAIN " + sql, params)
+            plan = cur.fetchall()
+            cols = list(cur.column_names)
+            row = dict(zip(cols, plan[0])) if plan else {}
+            key = row.get('key')
+            if isinstance(key, (bytes, bytearray)):
+                key = key.decode()
+            results.append({
+                'name': name,
+                'expected': expected,
+                'key': key,
+                'rows': row.get('rows'),
+                'ok': key == expected,
+            })
+        return results
+    except mysql.connector.Error as err:
+        raise _wrap_error(err)
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        _release(conn)
+
 
 def _normalize_date(value: Any):
-    # Accept 'YYYY-MM-DD' strings or empty -> None
+    # Accept dates, 'YYYY-MM-DD' strings or empty -> None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
     if not value or str(value).strip() == '':
         return None
     s = str(value)
@@ -154,118 +622,579 @@ def _normalize_date(value: Any):
     return s
 
 
-def load_patients() -> List[Tuple[Any, ...]]:
-    cols = ', '.join([f"`{c}`" for c in COLUMNS])
-    sql = f"SELECT {cols} FROM `patients` ORDER BY `Patient ID` ASC"
+# --- Statement text for the CRUD paths, built once at import ---
+_COLS_SQL = ', '.join(f"`{c}`" for c in COLUMNS)
+_SELECT_ALL_SQL = f"SELECT {_COLS_SQL} FROM `patients` ORDER BY `Patient ID` ASC"
+_SELECT_WITH_ARCHIVE_SQL = (
+    f"SELECT {_COLS_SQL} FROM `patients` UNION ALL SELECT {_COLS_SQL} FROM `{ARCHIVE_TABLE}` "
+    "ORDER BY `Patient ID` ASC"
+)
+_SELECT_SINCE_SQL = f"SELECT {_COLS_SQL} FROM `patients` WHERE `Last Updated` >= %s ORDER BY `Patient ID` ASC"
+_SELECT_ONE_SQL = f"SELECT {_COLS_SQL} FROM `patients` WHERE `Patient ID` = %s"
+_SELECT_DELETED_SINCE_SQL = "SELECT `Patient ID` FROM `patients_deleted` WHERE `Deleted At` >= %s"
+_SELECT_STAMP_SQL = "SELECT `Last Updated` FROM `patients` WHERE `Patient ID` = %s"
+_NOW_SQL = "SELECT NOW()"
+
+# add_patient: with an explicit Patient ID, and without (AUTO_INCREMENT).
+# Values follow COLUMNS order minus Last Updated, which the server stamps.
+_INSERT_COLUMNS = [c for c in COLUMNS if c != 'Last Updated']
+_INSERT_SQL = (
+    f"INSERT INTO `patients` ({', '.join(f'`{c}`' for c in _INSERT_COLUMNS)}, `Last Updated`) "
+    f"VALUES ({', '.join(['%s'] * len(_INSERT_COLUMNS))}, NOW())"
+)
+_INSERT_AUTO_ID_SQL = (
+    f"INSERT INTO `patients` ({', '.join(f'`{c}`' for c in _INSERT_COLUMNS[1:])}, `Last Updated`) "
+    f"VALUES ({', '.join(['%s'] * (len(_INSERT_COLUMNS) - 1))}, NOW())"
+)
+# Indexes into an item (COLUMNS order) of the values bound to _INSERT_SQL
+_INSERT_VALUE_INDEXES = [COLUMNS.index(c) for c in _INSERT_COLUMNS]
+_DATE_INDEXES = frozenset(COLUMNS.index(c) for c in DATE_COLUMNS)
+
+_UPDATE_ALL_SQL = (
+    "UPDATE `patients` SET "
+    + ', '.join(f"`{c}` = %s" for c in _INSERT_COLUMNS)
+    + ", `Last Updated` = NOW() WHERE `Patient ID` = %s"
+)
+_DELETE_SQL = "DELETE FROM `patients` WHERE `Patient ID` = %s"
+# Tombstone written in the same transaction so other PCs see the delete
+_TOMBSTONE_SQL = (
+    "INSERT INTO `patients_deleted` (`Patient ID`, `Deleted At`) VALUES (%s, NOW()) "
+    "ON DUPLICATE KEY UPDATE `Deleted At` = NOW()"
+)
+
+# update_patient_fields: one statement per distinct set of changed columns
+_update_fields_sql_cache = {}
+
+
+def _update_fields_sql(cols: Tuple[str, ...]) -> str:
+    sql = _update_fields_sql_cache.get(cols)
+    if sql is None:
+        sql = (
+            "UPDATE `patients` SET "
+            + ''.join(f"`{c}` = %s, " for c in cols)
+            + "`Last Updated` = %s WHERE `Patient ID` = %s AND `Last Updated` <=> %s"
+        )
+        _update_fields_sql_cache[cols] = sql
+    return sql
+
+
+def _item_values(item: List[Any], indexes) -> List[Any]:
+    # Bind values for the given COLUMNS indexes, with dates normalized
+    values = []
+    for idx in indexes:
+        v = item[idx] if idx < len(item) else None
+        values.append(_normalize_date(v) if idx in _DATE_INDEXES else v)
+    return values
+
+
+def load_patients(include_archive: bool = False) -> List[Tuple[Any, ...]]:
+    """All patients in the hot table, plus archived ones if include_archive.
+
+    Rows are in the UI's display format (see records.display_row); reporting
+    code should use load_records() and format only what it writes out.
+    """
+    return [display_row(r) for r in load_records(include_archive)]
+
+
+# Traced here only, so a load_patients() call is recorded once
+@traced('load', rows=lambda r, a: len(r), size=lambda r, a: estimate_bytes(r))
+def load_records(include_archive: bool = False) -> List[PatientRecord]:
+    """Like load_patients(), as PatientRecords with native date/datetime/Decimal values."""
+    sql = _SELECT_WITH_ARCHIVE_SQL if include_archive else _SELECT_ALL_SQL
+    conn = _get_connection()
+    try:
+        return list(map(PatientRecord._make, _execute(conn, sql).fetchall()))
+    except mysql.connector.Error as err:
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
+
+
+@traced('load_frame', rows=lambda r, a: len(r), size=lambda r, a: int(r.memory_usage().sum()))
+def load_patients_frame(include_archive: bool = False):
+    """Load all patients as a pandas DataFrame with typed columns.
+
+    Dates are datetime64, Age is a nullable integer, Height/Weight are
+    floats and the categorical columns from constants.CATEGORY_OPTIONS use
+    categorical dtypes (options first, then any other values found). Meant
+    for reporting code that works column-wise rather than row by row.
+    """
+    import pandas as pd  # heavy; only needed by reporting paths
+
+    sql = _SELECT_WITH_ARCHIVE_SQL if include_archive else _SELECT_ALL_SQL
+    conn = _get_connection()
+    try:
+        rows = _execute(conn, sql).fetchall()
+    except mysql.connector.Error as err:
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
+
+    # Transpose once in C instead of converting cell by cell
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    df = pd.DataFrame({col: list(values) for col, values in zip(COLUMNS, columns)}, columns=COLUMNS)
+    for col in DATE_COLUMNS + DATETIME_COLUMNS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    df['Patient ID'] = pd.to_numeric(df['Patient ID']).astype('Int64')
+    df['Age'] = pd.to_numeric(df['Age'], errors='coerce').astype('Int64')
+    for col in ('Height', 'Weight'):
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    for col, options in CATEGORY_OPTIONS.items():
+        known = set(options)
+        extra = sorted(v for v in df[col].dropna().unique() if v not in known)
+        df[col] = pd.Categorical(df[col], categories=list(options) + extra)
+    return df
+
+
+@traced('sync', rows=lambda r, a: len(r[0]) + len(r[1]), size=lambda r, a: estimate_bytes(r[0]))
+def load_patients_since(version: Optional[str]) -> Tuple[List[Tuple[Any, ...]], List[int], str]:
+    """Incremental sync for the UI cache.
+
+    Returns (changed_rows, deleted_ids, new_version). `version` is the value
+    returned by the previous call; pass None for a full load. Rows are those
+    whose `Last Updated` is at or after the previous version (minus a small
+    overlap, so callers must upsert idempotently by Patient ID); deleted_ids
+    come from the `patients_deleted` tombstone table.
+    """
+    conn = _get_connection()
+    try:
+        # Versions are server timestamps so clock skew between PCs doesn't matter.
+        # All reads below share one transaction snapshot.
+        now = _execute(conn, _NOW_SQL).fetchall()[0][0]
+        new_version = now.strftime('%Y-%m-%d %H:%M:%S')
+        if not version:
+            rows = [display_row(row) for row in _execute(conn, _SELECT_ALL_SQL).fetchall()]
+            return rows, [], new_version
+
+        since = datetime.strptime(version, '%Y-%m-%d %H:%M:%S') - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        rows = [display_row(row) for row in _execute(conn, _SELECT_SINCE_SQL, (since,)).fetchall()]
+        deleted = [r[0] for r in _execute(conn, _SELECT_DELETED_SINCE_SQL, (since,)).fetchall()]
+        return rows, deleted, new_version
+    except mysql.connector.Error as err:
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
+
+
+def archive_cutoff(today: Optional[date] = None) -> date:
+    """First day kept in the hot table: January 1st of the previous year."""
+    today = today or date.today()
+    return date(today.year - (HOT_YEARS - 1), 1, 1)
+
+
+@traced('archive', rows=lambda r, a: r)
+def archive_patients(before: Any = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move visits dated before `before` (default archive_cutoff()) to the archive.
+
+    Works in small batches, each its own short transaction, so row locks are
+    held briefly and other PCs can keep saving. Each moved row gets a
+    tombstone, which removes it from every PC's cache on its next sync.
+    Visits without a Date of Visit stay in `patients`. Only one PC archives
+    at a time; others return 0 immediately. Returns the number of rows moved.
+    """
+    cutoff = _normalize_date(before) if before else archive_cutoff().isoformat()
+    cols = _COLS_SQL
     conn = _get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(sql)
-        rows = cur.fetchall()
-        # Convert dates to string format YYYY-MM-DD to match Excel UI expectation
-        out = []
-        for row in rows:
-            row = list(row)
-            for idx, col in enumerate(COLUMNS):
-                if col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
-                    v = row[idx]
-                    if v is None:
-                        row[idx] = ''
-                    else:
-                        row[idx] = v.strftime('%Y-%m-%d')
-                elif col == 'Last Updated':
-                    v = row[idx]
-                    if v is None:
-                        row[idx] = ''
-                    else:
-                        # Keep the same format the UI uses
-                        row[idx] = v.strftime('%Y-%m-%d %H:%M:%S')
-            out.append(tuple(row))
-        return out
+        cur.execute("SELECT GET_LOCK(%s, 0)", (ARCHIVE_LOCK,))
+        if cur.fetchone()[0] != 1:
+            return 0
+        moved = 0
+        try:
+            while True:
+                # Uses idx_date_of_visit; locks just this batch until commit
+                cur.execute(
+                    "SELECT `Patient ID` FROM `patients` WHERE `Date of Visit` < %s "
+                    "ORDER BY `Date of Visit` LIMIT %s FOR UPDATE",
+                    (cutoff, int(batch_size)),
+                )
+                ids = [r[0] for r in cur.fetchall()]
+                if not ids:
+                    conn.rollback()
+                    break
+                placeholders = ', '.join(['%s'] * len(ids))
+                cur.execute(
+                    f"INSERT INTO `{ARCHIVE_TABLE}` ({cols}) SELECT {cols} FROM `patients` "
+                    f"WHERE `Patient ID` IN ({placeholders})",
+                    tuple(ids),
+                )
+                cur.execute(f"DELETE FROM `patients` WHERE `Patient ID` IN ({placeholders})", tuple(ids))
+                tombstones = ', '.join(['(%s, NOW())'] * len(ids))
+                cur.execute(
+                    f"INSERT INTO `patients_deleted` (`Patient ID`, `Deleted At`) VALUES {tombstones} "
+                    "ON DUPLICATE KEY UPDATE `Deleted At` = NOW()",
+                    tuple(ids),
+                )
+                conn.commit()
+                moved += len(ids)
+                if len(ids) < batch_size:
+                    break
+                time.sleep(ARCHIVE_BATCH_PAUSE)
+            return moved
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (ARCHIVE_LOCK,))
+            cur.fetchall()
+    except mysql.connector.Error as err:
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
     finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
+        _release(conn)
 
 
-def add_patient(item: List[Any]):
-    # item matches COLUMNS order
-    # Convert date strings to DATE, Last Updated to DATETIME
-    values = []
-    for idx, col in enumerate(COLUMNS):
-        v = item[idx] if idx < len(item) else None
-        if col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
-            v = _normalize_date(v)
-        elif col == 'Last Updated':
-            if not v:
-                v = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        values.append(v)
+def _fulltext_terms(query: str) -> str:
+    # Build a BOOLEAN MODE expression requiring every word as a prefix match
+    cleaned = ''.join(' ' if ch in '+-<>()~*"@' else ch for ch in query)
+    words = [w for w in cleaned.split() if len(w) >= FT_MIN_TOKEN_SIZE]
+    return ' '.join(f"+{w}*" for w in words)
+
 
-    cols_sql = ', '.join([f"`{c}`" for c in COLUMNS])
-    placeholders = ', '.join(['%s'] * len(COLUMNS))
-    sql = f"INSERT INTO `patients` ({cols_sql}) VALUES ({placeholders})"
+@traced('search', rows=lambda r, a: len(r), size=lambda r, a: estimate_bytes(r))
+def search_patients(query: str, limit: int = 200, offset: int = 0,
+                    archive: bool = False) -> List[Tuple[Any, ...]]:
+    """Search patients on the server, ordered by Patient ID.
 
+    Words in the query are matched against the FULLTEXT index on name,
+    diagnosis and diet prescription. If the whole query is one of the options
+    of a categorical column (e.g. a ward) rows with that value are included
+    through the column's index, and a numeric query also matches Patient ID.
+    archive searches the archive table instead, which the UI never loads whole.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+    table = ARCHIVE_TABLE if archive else 'patients'
+    branches = []
+    params: List[Any] = []
+    terms = _fulltext_terms(query)
+    if terms:
+        ft_cols = ', '.join(f"`{c}`" for c in FULLTEXT_COLUMNS)
+        branches.append(f"SELECT `Patient ID` FROM `{table}` WHERE MATCH({ft_cols}) AGAINST (%s IN BOOLEAN MODE)")
+        params.append(terms)
+    q = query.lower()
+    for col in SEARCH_CATEGORY_COLUMNS:
+        for option in CATEGORY_OPTIONS.get(col, []):
+            if option.lower() == q:
+                branches.append(f"SELECT `Patient ID` FROM `{table}` WHERE `{col}` = %s")
+                params.append(option)
+    if query.isdigit():
+        branches.append(f"SELECT `Patient ID` FROM `{table}` WHERE `Patient ID` = %s")
+        params.append(int(query))
+    if not branches:
+        # Too short for the FULLTEXT index; fall back to a substring scan
+        like = f"%{query}%"
+        branches.append(
+            f"SELECT `Patient ID` FROM `{table}` WHERE "
+            + ' OR '.join(f"`{c}` LIKE %s" for c in FULLTEXT_COLUMNS)
+        )
+        params.extend([like] * len(FULLTEXT_COLUMNS))
+
+    cols = ', '.join(f"p.`{c}`" for c in COLUMNS)
+    # UNION of index lookups, so each branch can use its own index
+    sql = (
+        f"SELECT {cols} FROM ({' UNION '.join(branches)}) AS m "
+        f"JOIN `{table}` p ON p.`Patient ID` = m.`Patient ID` "
+        "ORDER BY p.`Patient ID` ASC LIMIT %s OFFSET %s"
+    )
+    params.extend([int(limit), int(offset)])
     conn = _get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(sql, tuple(values))
-        conn.commit()
+        cur.execute(sql, tuple(params))
+        return [display_row(row) for row in cur.fetchall()]
     except mysql.connector.Error as err:
-        conn.rollback()
-        raise DatabaseError(str(err))
+        raise _wrap_error(err)
     finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
+        _release(conn)
+
+
+@traced('add', rows=lambda r, a: 1)
+def add_patient(item: List[Any]) -> Tuple[Any, ...]:
+    """Insert a patient and return the stored row (in load_patients() format).
+
+    Leave Patient ID empty to have AUTO_INCREMENT assign it, so PCs adding
+    visits at the same time can't collide. The returned row carries the
+    assigned ID and the server's Last Updated stamp.
+    """
+    # item matches COLUMNS order
+    # Convert date strings to DATE; Last Updated is stamped by the server
+    # (NOW()) so it can be used as the incremental sync watermark
+    explicit_id = item[0] if item and item[0] not in (None, '') else None
+    if explicit_id is None:
+        sql, values = _INSERT_AUTO_ID_SQL, _item_values(item, _INSERT_VALUE_INDEXES[1:])
+    else:
+        sql, values = _INSERT_SQL, _item_values(item, _INSERT_VALUE_INDEXES)
+
+    conn = _get_connection()
+    try:
+        cur = _execute(conn, sql, tuple(values))
+        patient_id = int(explicit_id) if explicit_id is not None else cur.lastrowid
+        # Read back in the same transaction: assigned ID + server timestamps
+        stored = _execute(conn, _SELECT_ONE_SQL, (patient_id,)).fetchall()[0]
+        conn.commit()
+        return display_row(stored)
+    except mysql.connector.Error as err:
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
 
 
+@traced('update', rows=lambda r, a: 1)
 def update_patient(item_id: Any, updated_item: List[Any]):
-    set_parts = []
+    # Always set every column based on updated_item order; Last Updated is
+    # the server timestamp that drives load_patients_since()
+    params = _item_values(updated_item, _INSERT_VALUE_INDEXES) + [item_id]
+    conn = _get_connection()
+    try:
+        _execute(conn, _UPDATE_ALL_SQL, tuple(params))
+        conn.commit()
+    except mysql.connector.Error as err:
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
+
+
+@traced('update', rows=lambda r, a: 1)
+def update_patient_fields(item_id: Any, changes: dict, expected_last_updated: Any) -> str:
+    """Write only the changed columns, if nobody else changed the row meanwhile.
+
+    `expected_last_updated` is the `Last Updated` value the caller last saw;
+    the update only applies while the row still has it (compare-and-set),
+    otherwise ConflictError is raised and nothing is written. Returns the new
+    server `Last Updated` stamp.
+    """
     params = []
-    for idx, col in enumerate(COLUMNS):
-        # Always set based on updated_item order
-        set_parts.append(f"`{col}` = %s")
-        v = updated_item[idx] if idx < len(updated_item) else None
-        if col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
+    for col, v in changes.items():
+        if col not in COLUMNS or col in ('Patient ID', 'Last Updated'):
+            raise DatabaseError(f"Column cannot be updated: {col}")
+        if col in DATE_COLUMNS:
             v = _normalize_date(v)
         params.append(v)
-    params.append(item_id)
+    sql = _update_fields_sql(tuple(changes))
+    expected = expected_last_updated or None
+
+    conn = _get_connection()
+    try:
+        stamp = _execute(conn, _NOW_SQL).fetchall()[0][0]
+        cur = _execute(conn, sql, tuple(params) + (stamp, item_id, expected))
+        if cur.rowcount == 0:
+            current = _execute(conn, _SELECT_STAMP_SQL, (item_id,)).fetchall()
+            conn.rollback()
+            if not current:
+                raise ConflictError('This patient was deleted on another PC.')
+            when = format_datetime(current[0][0]) if current[0][0] else 'unknown time'
+            raise ConflictError(f'This patient was changed on another PC at {when}.')
+        conn.commit()
+        return format_datetime(stamp)
+    except mysql.connector.Error as err:
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
 
-    sql = f"UPDATE `patients` SET {', '.join(set_parts)} WHERE `Patient ID` = %s"
+
+@traced('delete', rows=lambda r, a: 1)
+def delete_patient(item_id: Any):
+    conn = _get_connection()
+    try:
+        _execute(conn, _DELETE_SQL, (item_id,))
+        _execute(conn, _TOMBSTONE_SQL, (item_id,))
+        conn.commit()
+    except mysql.connector.Error as err:
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
+    finally:
+        _release(conn)
+
+
+def _chunks(seq: List[Any], size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+@traced('update_bulk', rows=lambda r, a: len(a[0]))
+def update_patients_bulk(ids: List[Any], changes: dict) -> str:
+    """Set the same column values on many patients in one transaction.
+
+    `changes` maps column name -> new value (Patient ID and Last Updated
+    can't be changed). Returns the server `Last Updated` stamp written to
+    every row, so callers can patch their cache without re-fetching.
+    """
+    ids = [int(i) for i in ids]
+    if not ids or not changes:
+        return ''
+    set_parts = []
+    values = []
+    for col, v in changes.items():
+        if col not in COLUMNS or col in ('Patient ID', 'Last Updated'):
+            raise DatabaseError(f"Column cannot be bulk updated: {col}")
+        if col in DATE_COLUMNS:
+            v = _normalize_date(v)
+        set_parts.append(f"`{col}` = %s")
+        values.append(v)
+    set_parts.append("`Last Updated` = %s")
 
     conn = _get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(sql, tuple(params))
+        cur.execute("SELECT NOW()")
+        stamp = cur.fetchone()[0]
+        for chunk in _chunks(ids, BULK_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            sql = f"UPDATE `patients` SET {', '.join(set_parts)} WHERE `Patient ID` IN ({placeholders})"
+            cur.execute(sql, tuple(values) + (stamp,) + tuple(chunk))
         conn.commit()
+        return format_datetime(stamp)
     except mysql.connector.Error as err:
-        conn.rollback()
-        raise DatabaseError(str(err))
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
     finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
+        _release(conn)
 
 
-def delete_patient(item_id: Any):
-    sql = "DELETE FROM `patients` WHERE `Patient ID` = %s"
+@traced('delete_bulk', rows=lambda r, a: r)
+def delete_patients_bulk(ids: List[Any]) -> int:
+    """Delete many patients (with tombstones) in one transaction. Returns rows deleted."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return 0
     conn = _get_connection()
     try:
         cur = conn.cursor()
-        cur.execute(sql, (item_id,))
+        deleted = 0
+        for chunk in _chunks(ids, BULK_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cur.execute(f"DELETE FROM `patients` WHERE `Patient ID` IN ({placeholders})", tuple(chunk))
+            deleted += cur.rowcount
+            tombstones = ', '.join(['(%s, NOW())'] * len(chunk))
+            cur.execute(
+                f"INSERT INTO `patients_deleted` (`Patient ID`, `Deleted At`) VALUES {tombstones} "
+                "ON DUPLICATE KEY UPDATE `Deleted At` = NOW()",
+                tuple(chunk),
+            )
         conn.commit()
+        return deleted
     except mysql.connector.Error as err:
-        conn.rollback()
-        raise DatabaseError(str(err))
+        _rollback_quietly(conn)
+        raise _wrap_error(err)
     finally:
         try:
             cur.close()
         except Exception:
             pass
-        conn.close()
+        _release(conn)
+
+
+# compute_metrics(): SQL expression per metric, mirroring how
+# excel_utils.add_summary_table_to_all_sheets counts a row. The table
+# collation is case-insensitive and ignores trailing spaces.
+_METRIC_SQL = {
+    'admitted': "COUNT(*)",
+    # Anything not explicitly Normal (including blank) is at risk
+    'nar': "SUM(COALESCE(TRIM(`Nutritional Status`), '') <> 'Normal')",
+    'mam': "SUM(TRIM(`Nutritional Status`) = 'MAM')",
+    'sam': "SUM(TRIM(`Nutritional Status`) = 'SAM')",
+    'stunting': "SUM(TRIM(`Nutritional Status`) = 'Stunting')",
+    'underweight': "SUM(TRIM(`Nutritional Status`) = 'Underweight')",
+    'overweight': "SUM(TRIM(`Nutritional Status`) = 'Overweight')",
+    'obese': "SUM(TRIM(`Nutritional Status`) = 'Obese')",
+    'screening': "SUM(COALESCE(`Type Of Visit`, '') <> '')",
+    'assessment': "SUM(COALESCE(`Purpose of Visit`, '') <> '')",
+    'intervention': "SUM(COALESCE(`RND Dietary Management`, '') <> '')",
+    'documentation': "SUM(`With Documents` = 'Yes')",
+    'ncp': "SUM(`Given NCP` = 'Yes')",
+}
+
+_PERIOD_SQL = {
+    'month': "CONCAT(YEAR(`Date of Visit`), '-', LPAD(MONTH(`Date of Visit`), 2, '0'))",
+    'half': "CONCAT(YEAR(`Date of Visit`), IF(MONTH(`Date of Visit`) <= 6, '-H1', '-H2'))",
+    'year': "CAST(YEAR(`Date of Visit`) AS CHAR)",
+    'all': "'all'",
+}
+
+
+@traced('metrics')
+def compute_metrics(start_date: Any = None, end_date: Any = None, period: str = 'month',
+                    include_archive: bool = False) -> dict:
+    """Compute the nutrition metrics table on the server in one query.
+
+    Counts visits whose Date of Visit is between start_date and end_date
+    (inclusive; either may be None for open-ended), grouped by period,
+    Age Group and Sex. `period` is 'month' (keys 'YYYY-MM'), 'half'
+    ('YYYY-H1'/'YYYY-H2'), 'year' ('YYYY') or 'all' (single key 'all').
+    Visits without a Date of Visit only count towards period='all'.
+    include_archive also counts the archived (older) visits.
+
+    Returns {period_key: {metric_key: [[male, female] per age group]}} with
+    metric keys and age group order from metrics.py.
+    """
+    if period not in _PERIOD_SQL:
+        raise ValueError(f"Unknown period: {period}")
+    aggregates = ', '.join(f"{_METRIC_SQL[k]} AS `{k}`" for k in metrics.METRIC_KEYS)
+    where = [
+        "`Age Group` IN (" + ', '.join(['%s'] * len(metrics.AGE_GROUPS)) + ")",
+        "`Sex` IN ('Male', 'Female')",
+    ]
+    params: List[Any] = list(metrics.AGE_GROUPS)
+    if start_date:
+        where.append("`Date of Visit` >= %s")
+        params.append(_normalize_date(start_date))
+    if end_date:
+        where.append("`Date of Visit` <= %s")
+        params.append(_normalize_date(end_date))
+    tables = ['patients', ARCHIVE_TABLE] if include_archive else ['patients']
+    # One aggregate per table so each keeps its indexes; the cube below sums
+    # groups that appear in both
+    sql = ' UNION ALL '.join(
+        f"SELECT {_PERIOD_SQL[period]} AS period, `Age Group`, `Sex`, {aggregates} "
+        f"FROM `{table}` WHERE {' AND '.join(where)} "
+        "GROUP BY period, `Age Group`, `Sex`"
+        for table in tables
+    )
+    params = params * len(tables)
+
+    conn = _get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
+    except mysql.connector.Error as err:
+        raise _wrap_error(err)
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        _release(conn)
+
+    age_index = {ag.lower(): i for i, ag in enumerate(metrics.AGE_GROUPS)}
+    cube: dict = {}
+    sex_index = {sex: i for i, sex in enumerate(metrics.SEXES)}
+    for period_key, age_group, sex, *values in rows:
+        if period_key is None:
+            continue
+        # The IN (...) filters ignore trailing spaces (PAD SPACE); match the same way
+        ag = age_index.get(str(age_group).strip().lower())
+        sx = sex_index.get(str(sex).strip().lower())
+        if ag is None or sx is None:
+            continue
+        entry = cube.get(period_key)
+        if entry is None:
+            entry = cube[period_key] = metrics.empty_cube_entry()
+        for key, v in zip(metrics.METRIC_KEYS, values):
+            entry[key][ag][sx] += int(v or 0)
+    return cube
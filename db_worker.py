@@ -0,0 +1,119 @@
+# db_worker.py
+# Runs database (and other slow I/O) work off the Tk event thread so the
+# window stays responsive while MySQL, backups or exports are slow.
+#
+# Jobs run on worker threads; their results are handed back to the UI thread
+# through a queue that is drained with root.after(), because Tk widgets may
+# only be touched from the thread running mainloop.
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class DbWorker:
+    POLL_MS = 30
+
+    def __init__(self, root, on_busy_change: Optional[Callable[[bool, str], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None, read_workers: int = 2):
+        self.root = root
+        # Used for failed jobs submitted without their own on_error
+        self._default_error = on_error
+        self._results = queue.Queue()
+        # Writes run one at a time, in the order they were submitted
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dms-db-write')
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='dms-db-read')
+        self._on_busy_change = on_busy_change
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pending_writes = 0
+        self._busy_texts = []
+        self._poll_id = None
+        self._closed = False
+
+    @property
+    def busy(self) -> bool:
+        return self._pending > 0
+
+    @property
+    def writing(self) -> bool:
+        return self._pending_writes > 0
+
+    def submit(self, fn, *args, on_success=None, on_error=None, write=False, busy_text='Working...', **kwargs):
+        """Run fn(*args, **kwargs) on a worker thread.
+
+        on_success(result) or on_error(exception) is then called on the Tk
+        thread. write=True jobs are serialized on a single thread.
+        """
+        if self._closed:
+            return
+        with self._lock:
+            self._pending += 1
+            if write:
+                self._pending_writes += 1
+        self._busy_texts.append(busy_text)
+        self._notify_busy()
+
+        def run():
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._results.put((write, busy_text, on_error, e, True))
+            else:
+                self._results.put((write, busy_text, on_success, result, False))
+
+        (self._writer if write else self._readers).submit(run)
+        self._ensure_polling()
+
+    def shutdown(self):
+        # Let running jobs finish in the background; drop queued callbacks
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._writer.shutdown(wait=False)
+        self._readers.shutdown(wait=False)
+
+    def _ensure_polling(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.root.after(self.POLL_MS, self._drain)
+
+    def _drain(self):
+        self._poll_id = None
+        while True:
+            try:
+                write, busy_text, callback, value, failed = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._pending -= 1
+                if write:
+                    self._pending_writes -= 1
+            try:
+                self._busy_texts.remove(busy_text)
+            except ValueError:
+                pass
+            self._notify_busy()
+            if failed and callback is None:
+                callback = self._default_error
+            if callback is not None:
+                try:
+                    callback(value)
+                except Exception:
+                    # A failing UI callback must not stop later results
+                    traceback.print_exc()
+        if self._pending > 0:
+            self._ensure_polling()
+
+    def _notify_busy(self):
+        if self._on_busy_change is None:
+            return
+        text = self._busy_texts[-1] if self._busy_texts else ''
+        try:
+            self._on_busy_change(self.busy, text)
+        except Exception:
+            pass
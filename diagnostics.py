@@ -0,0 +1,187 @@
+# diagnostics.py
+# Per-process timing of database and file operations (load, add, update,
+# delete, backup, export), so slow PCs and slow operations can be spotted
+# from the Settings > Diagnostics dialog without a profiler.
+#
+# db_utils, backup_utils and exporter wrap their entry points with
+# @traced(...). Each call records latency, rows and approximate bytes; calls
+# slower than SLOW_OPERATION_MS (and failures) are also written to a rotating
+# log file once configure() has been given a directory.
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Optional
+
+SLOW_OPERATION_MS = 500
+# Latency histogram bucket upper bounds (ms); the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+# Percentiles are computed over this many most recent calls per operation
+RECENT_SAMPLES = 500
+
+SLOW_LOG_NAME = 'slow_operations.log'
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+_logger = logging.getLogger('dms.slow')
+_logger.propagate = False
+_lock = threading.Lock()
+_stats = {}
+
+
+class _OpStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+class _Trace:
+    # Handed to the body of `with trace(...)`; set rows/bytes when known
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.detail = ''
+
+
+def configure(log_dir: str):
+    """Write slow/failed operations to log_dir/slow_operations.log (rotating)."""
+    path = os.path.join(log_dir, SLOW_LOG_NAME)
+    with _lock:
+        for handler in list(_logger.handlers):
+            _logger.removeHandler(handler)
+            handler.close()
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=SLOW_LOG_MAX_BYTES,
+                                          backupCount=SLOW_LOG_BACKUPS, encoding='utf-8')
+        except OSError:
+            return
+        handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(message)s'))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+
+
+def slow_log_path() -> Optional[str]:
+    for handler in _logger.handlers:
+        if isinstance(handler, RotatingFileHandler):
+            return handler.baseFilename
+    return None
+
+
+def _record(op: str, ms: float, rows: int, nbytes: int, error: Optional[BaseException], detail: str):
+    with _lock:
+        st = _stats.get(op)
+        if st is None:
+            st = _stats[op] = _OpStats()
+        st.calls += 1
+        st.total_ms += ms
+        st.max_ms = max(st.max_ms, ms)
+        st.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        st.recent.append(ms)
+        if error is not None:
+            st.errors += 1
+        else:
+            st.rows += rows
+            st.bytes += nbytes
+    if error is not None:
+        _logger.warning('FAILED %s after %.0f ms: %s: %s %s', op, ms, type(error).__name__, error, detail)
+    elif ms >= SLOW_OPERATION_MS:
+        _logger.info('SLOW %s %.0f ms rows=%d bytes=%d %s', op, ms, rows, nbytes, detail)
+
+
+@contextmanager
+def trace(op: str, detail: str = ''):
+    """Time the enclosed block as one call of `op`."""
+    t = _Trace()
+    t.detail = detail
+    start = time.perf_counter()
+    try:
+        yield t
+    except BaseException as e:
+        _record(op, (time.perf_counter() - start) * 1000.0, 0, 0, e, t.detail)
+        raise
+    _record(op, (time.perf_counter() - start) * 1000.0, t.rows, t.bytes, None, t.detail)
+
+
+def traced(op: str, rows: Optional[Callable] = None, size: Optional[Callable] = None):
+    """Decorator form of trace().
+
+    rows(result, args) and size(result, args) give the row count and byte
+    size of a successful call; they default to zero.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(op) as t:
+                result = fn(*args, **kwargs)
+                try:
+                    if rows is not None:
+                        t.rows = rows(result, args)
+                    if size is not None:
+                        t.bytes = size(result, args)
+                except Exception:
+                    pass
+                return result
+        return wrapper
+    return decorate
+
+
+def estimate_bytes(rows, sample: int = 64) -> int:
+    """Approximate text size of a list of rows from an even sample of them."""
+    n = len(rows)
+    if not n:
+        return 0
+    step = max(1, n // sample)
+    picked = rows[::step]
+    total = sum(len(str(v)) for row in picked for v in row if v is not None)
+    return int(total * n / len(picked))
+
+
+def file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def _percentile(sorted_samples, q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+def snapshot() -> list:
+    """Per-operation summary dicts, sorted by operation name."""
+    with _lock:
+        items = [(op, st, sorted(st.recent), list(st.histogram)) for op, st in _stats.items()]
+        out = []
+        for op, st, recent, histogram in sorted(items, key=lambda i: i[0]):
+            out.append({
+                'op': op,
+                'calls': st.calls,
+                'errors': st.errors,
+                'p50_ms': _percentile(recent, 0.50),
+                'p95_ms': _percentile(recent, 0.95),
+                'max_ms': st.max_ms,
+                'mean_ms': st.total_ms / st.calls if st.calls else 0.0,
+                'rows': st.rows,
+                'bytes': st.bytes,
+                'histogram': histogram,
+            })
+    return out
+
+
+def reset():
+    with _lock:
+        _stats.clear()
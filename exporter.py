@@ -1,41 +1,34 @@
 # exporter.py
-from datetime import datetime
-from typing import List, Tuple, Any
+from typing import List
 
 from openpyxl import Workbook
 
 from constants import COLUMNS
-from db_utils import load_patients
+from db_utils import load_records
+from records import PatientRecord
 import excel_utils
+from diagnostics import traced, file_size
 
 MONTH_NAMES = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
 
 
-def _append_row(ws, row: Tuple[Any, ...]):
+def _append_row(ws, row: PatientRecord):
+    # Dates go in as real date cells (openpyxl formats them yyyy-mm-dd)
     ws.append(list(row))
 
 
-def _parse_month(date_str: str) -> int | None:
-    if not date_str:
-        return None
-    try:
-        # Expecting YYYY-MM-DD
-        dt = datetime.strptime(date_str[:10], '%Y-%m-%d')
-        return dt.month
-    except Exception:
-        return None
-
-
-def export_db_to_excel(export_path: str):
+@traced('export_excel', size=lambda r, a: file_size(a[0]))
+def export_db_to_excel(export_path: str, include_archive: bool = False):
     """
-    Export all patients from DB into a fresh workbook with:
+    Export all patients from DB (plus archived visits if include_archive)
+    into a fresh workbook with:
     - Main
     - Monthly sheets JAN..DEC
     - Half-year sheets JAN-JUNE, JULY-DEC
     Then run the existing summary generator to produce the metrics table.
     """
-    # Load DB data as tuples in COLUMNS order
-    rows: List[Tuple[Any, ...]] = load_patients()
+    # Load DB data as typed records in COLUMNS order
+    rows: List[PatientRecord] = load_records(include_archive=include_archive)
 
     wb = Workbook()
     # Prepare sheets and headers
@@ -52,14 +45,11 @@ def export_db_to_excel(export_path: str):
     ws_h2 = wb.create_sheet('JULY-DEC')
     ws_h2.append(COLUMNS)
 
-    # Distribute rows
-    date_idx = COLUMNS.index('Date of Visit') if 'Date of Visit' in COLUMNS else None
+    # Distribute rows by Date of Visit (a date, or None)
     for row in rows:
         _append_row(ws_main, row)
-        month = None
-        if date_idx is not None and date_idx < len(row):
-            month = _parse_month(str(row[date_idx]) if row[date_idx] is not None else '')
-        if month and 1 <= month <= 12:
+        month = row.date_of_visit.month if row.date_of_visit else None
+        if month:
             # Monthly
             ws_month = wb[MONTH_NAMES[month - 1]]
             _append_row(ws_month, row)
@@ -78,7 +68,7 @@ def export_db_to_excel(export_path: str):
         original = getattr(excel_utils, 'EXCEL_FILE', None)
         # excel_utils imported EXCEL_FILE at module level from constants, so set the module var
         excel_utils.EXCEL_FILE = export_path
-        excel_utils.add_summary_table_to_all_sheets()
+        excel_utils.add_summary_table_to_all_sheets(period_column='Date of Visit')
     finally:
         if original is not None:
             excel_utils.EXCEL_FILE = original
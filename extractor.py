@@ -11,6 +11,7 @@ import shutil
 from datetime import datetime
 import openpyxl
 from constants import COLUMNS
+from records import month_of
 import excel_utils as eu
 import uuid
 
@@ -93,7 +94,8 @@ class ExtractorWindow:
             try:
                 old_path = eu.EXCEL_FILE
                 eu.EXCEL_FILE = tgt
-                eu.add_summary_table_to_all_sheets()
+                # Sheets were just rebuilt by Ward Admission Date (resync_sheets)
+                eu.add_summary_table_to_all_sheets(period_column='Ward Admission Date')
             finally:
                 try:
                     eu.EXCEL_FILE = old_path
@@ -257,13 +259,11 @@ def resync_sheets(tgt_path: str):
     for m in MONTH_NAMES:
         clear_data(month_sheets[m])
 
-    # Append rows to appropriate sheets
+    # Append rows to appropriate sheets. openpyxl reads date cells as
+    # datetimes; older workbooks may still hold 'YYYY-MM-DD' text
+    wad_idx = COLUMNS.index('Ward Admission Date')
     for data in rows:
-        try:
-            wad = data[COLUMNS.index('Ward Admission Date')]
-            month = int(str(wad).split('-')[1]) if wad else 0
-        except Exception:
-            month = 0
+        month = month_of(data[wad_idx])
         if 1 <= month <= 6:
             sh_first.append(data)
         elif 7 <= month <= 12:
@@ -0,0 +1,308 @@
+# grid_view.py
+# Patient table widget: a ttk.Treeview plus scrollbars that can show tens of
+# thousands of rows without creating a Tk item for each one.
+#
+# Below VIRTUAL_MIN_ROWS rows every row is a Treeview item (iid = Patient ID)
+# and the Treeview scrolls itself; set_rows() then diffs the new rows against
+# what is shown and only inserts, deletes, moves or rewrites the rows that
+# changed, so scroll position and selection are kept.
+#
+# Above it the grid is "virtual": only the rows in view (plus a few spare
+# items) exist in Tk, the vertical scrollbar drives a row offset, and
+# scrolling rewrites the values of the same recycled items. Rendering then
+# costs O(rows on screen) whatever the dataset size.
+#
+# set_rows() takes any sequence of rows; rows are read by position only when
+# shown, so a lazy sequence (a RowStore, or the UI's view over one) never has
+# to build the rows that stay off screen. A sequence with an `ids` attribute
+# (Patient IDs in row order) is never iterated in virtual mode.
+#
+# Selection is tracked by Patient ID (row[0]), so it survives scrolling and
+# re-filtering; use selected_rows() / focused_row() instead of reading the
+# Treeview selection directly. The Patient ID -> position map those need is
+# built on first use after set_rows(), not on every refresh.
+#
+# Heading clicks call on_sort(column); the caller re-orders the rows and
+# passes them back through set_rows(). show_sort() marks the sorted heading.
+from tkinter import ttk, VERTICAL, HORIZONTAL, END
+
+VIRTUAL_MIN_ROWS = 2000
+# Spare recycled items kept beyond the visible window (e.g. for resizes)
+VIRTUAL_BUFFER_ROWS = 10
+WHEEL_ROWS = 3
+SORT_MARKS = {False: ' \u25b2', True: ' \u25bc'}
+
+
+class PatientGrid:
+    def __init__(self, parent, columns, on_select=None, on_sort=None,
+                 virtual_threshold: int = VIRTUAL_MIN_ROWS, **tree_options):
+        self.columns = list(columns)
+        self.on_select = on_select
+        self.on_sort = on_sort
+        self.virtual_threshold = virtual_threshold
+        self.tree = ttk.Treeview(parent, columns=self.columns, show='headings', **tree_options)
+        self.vsb = ttk.Scrollbar(parent, orient=VERTICAL)
+        self.hsb = ttk.Scrollbar(parent, orient=HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.hsb.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.vsb.grid(row=0, column=1, sticky='ns')
+        self.hsb.grid(row=1, column=0, sticky='ew')
+
+        self.rows = []
+        self._ids = []
+        self._pos_of = {}  # Patient ID -> position in rows; None until needed
+        self._selected = set()
+        self._focus_id = None
+        self.virtual = False
+        # Virtual mode: first row shown, and the recycled item IDs
+        self._top = 0
+        self._pool = []
+        self._attached = 0
+        # iid -> Patient ID for the items currently in the Treeview
+        self._iid_pid = {}
+        # Non-virtual mode: iid -> row as last written to the Treeview
+        self._shown = {}
+        # Selection we set ourselves; the <<TreeviewSelect>> it causes is ignored
+        self._expected_selection = None
+
+        self._set_mode(False)
+        if on_sort is not None:
+            for col in self.columns:
+                self.tree.heading(col, text=col, command=lambda c=col: self.on_sort(c))
+        self.tree.bind('<<TreeviewSelect>>', self._on_tree_select)
+        self.tree.bind('<Configure>', lambda e: self.virtual and self._render_window())
+        self.tree.bind('<MouseWheel>', self._on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self._on_wheel(e, -1))
+        self.tree.bind('<Button-5>', lambda e: self._on_wheel(e, 1))
+        for key, delta in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-'), ('<Next>', 'page+')):
+            self.tree.bind(key, lambda e, d=delta: self._on_key(d))
+
+    # --- Public API ---
+    def set_rows(self, rows):
+        """Show rows (tuples in column order, Patient ID first)."""
+        self.rows = rows
+        ids = getattr(rows, 'ids', None)
+        self._ids = ids if ids is not None else [row[0] for row in rows]
+        # Selected IDs no longer in rows are dropped when the map is built
+        self._pos_of = None
+        virtual = len(rows) >= self.virtual_threshold
+        if virtual != self.virtual:
+            self._set_mode(virtual)
+        if self.virtual:
+            self._top = max(0, min(self._top, len(rows) - self._visible_count()))
+            self._render_window()
+        else:
+            self._render_all()
+
+    def selected_rows(self):
+        pos_of = self._positions()
+        return [self.rows[pos_of[pid]] for pid in self.selected_ids()]
+
+    def selected_ids(self):
+        # In display order, so bulk operations are predictable
+        pos_of = self._positions()
+        if len(self._selected) <= 1:
+            return list(self._selected)
+        return sorted(self._selected, key=pos_of.__getitem__)
+
+    def focused_row(self):
+        pos_of = self._positions()
+        pid = self._focus_id
+        if pid not in pos_of and len(self._selected) == 1:
+            pid = next(iter(self._selected))
+        pos = pos_of.get(pid)
+        return None if pos is None else self.rows[pos]
+
+    def show_sort(self, column, descending: bool = False):
+        """Mark column's heading as sorted (None clears the mark)."""
+        for col in self.columns:
+            self.tree.heading(col, text=col + SORT_MARKS[descending] if col == column else col)
+
+    def clear_selection(self):
+        self._selected = set()
+        self._focus_id = None
+        self._apply_selection()
+
+    def _positions(self) -> dict:
+        if self._pos_of is None:
+            self._pos_of = {pid: i for i, pid in enumerate(self._ids)}
+            self._selected &= self._pos_of.keys()
+            if self._focus_id not in self._pos_of:
+                self._focus_id = None
+        return self._pos_of
+
+    # --- Modes ---
+    def _set_mode(self, virtual: bool):
+        self.virtual = virtual
+        # Detached pool items are not children; delete them too
+        self.tree.delete(*(set(self.tree.get_children()) | set(self._pool)))
+        self._pool = []
+        self._attached = 0
+        self._iid_pid = {}
+        self._shown = {}
+        self._top = 0
+        if virtual:
+            # The scrollbar moves our row offset, not the Treeview
+            self.tree.configure(yscrollcommand=lambda *args: None)
+            self.vsb.configure(command=self._on_scrollbar)
+        else:
+            self.tree.configure(yscrollcommand=self.vsb.set)
+            self.vsb.configure(command=self.tree.yview)
+
+    def _render_all(self):
+        # Minimal edit from the shown rows to self.rows, in display order
+        new_iids = []
+        new_rows = {}
+        for row in self.rows:
+            iid = str(row[0])
+            if iid not in new_rows:
+                new_iids.append(iid)
+                new_rows[iid] = row
+        gone = [iid for iid in self._shown if iid not in new_rows]
+        if gone:
+            self.tree.delete(*gone)
+        remaining = [iid for iid in self.tree.get_children()]
+        moved = set()
+        j = 0
+        for i, iid in enumerate(new_iids):
+            while j < len(remaining) and remaining[j] in moved:
+                j += 1
+            row = new_rows[iid]
+            old = self._shown.get(iid)
+            if old is None:
+                self.tree.insert('', i, iid=iid, values=row)
+            else:
+                if j < len(remaining) and remaining[j] == iid:
+                    j += 1  # already in place
+                else:
+                    self.tree.move(iid, '', i)
+                    moved.add(iid)
+                if old != row:
+                    self.tree.item(iid, values=row)
+        self._shown = new_rows
+        self._iid_pid = {iid: row[0] for iid, row in new_rows.items()}
+        self._apply_selection()
+
+    # --- Virtual window ---
+    def _row_height(self) -> int:
+        try:
+            return int(ttk.Style().lookup('Treeview', 'rowheight')) or 20
+        except (TypeError, ValueError):
+            return 20
+
+    def _visible_count(self) -> int:
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Not laid out yet: use the requested height in rows
+            try:
+                return max(1, int(self.tree.cget('height')))
+            except (TypeError, ValueError):
+                return 20
+        # One row's worth for the heading
+        return max(1, height // self._row_height() - 1)
+
+    def _render_window(self):
+        n = min(self._visible_count(), len(self.rows))
+        self._top = max(0, min(self._top, len(self.rows) - n))
+        while len(self._pool) < n + VIRTUAL_BUFFER_ROWS:
+            iid = self.tree.insert('', END, values=())
+            self.tree.detach(iid)
+            self._pool.append(iid)
+        self._iid_pid = {}
+        for i in range(n):
+            iid = self._pool[i]
+            row = self.rows[self._top + i]
+            self.tree.item(iid, values=row)
+            self._iid_pid[iid] = row[0]
+            if i >= self._attached:
+                self.tree.move(iid, '', i)
+        # Park the recycled items not needed for this window
+        for iid in self._pool[n:self._attached]:
+            self.tree.detach(iid)
+        self._attached = n
+        self._apply_selection()
+        total = len(self.rows)
+        if total:
+            self.vsb.set(self._top / total, (self._top + n) / total)
+        else:
+            self.vsb.set(0.0, 1.0)
+
+    def _scroll_to(self, top: int):
+        top = max(0, min(top, len(self.rows) - self._visible_count()))
+        if top != self._top:
+            self._top = top
+            self._render_window()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        n = self._visible_count()
+        if action == 'moveto':
+            self._scroll_to(int(float(amount) * len(self.rows)))
+        elif action == 'scroll':
+            step = n if unit == 'pages' else 1
+            self._scroll_to(self._top + int(amount) * step)
+
+    def _on_wheel(self, event, direction=None):
+        if not self.virtual:
+            return None  # native Treeview scrolling
+        if direction is None:
+            direction = -1 if event.delta > 0 else 1
+        self._scroll_to(self._top + direction * WHEEL_ROWS)
+        return 'break'  # the Treeview itself must not scroll
+
+    def _on_key(self, delta):
+        if not self.virtual:
+            return None  # native Treeview navigation
+        n = self._visible_count()
+        if delta in ('page-', 'page+'):
+            self._scroll_to(self._top + (n if delta == 'page+' else -n))
+            return 'break'
+        focus = self.tree.focus()
+        pos = self._pool.index(focus) if focus in self._iid_pid else -1
+        if (delta > 0 and pos == self._attached - 1) or (delta < 0 and pos == 0):
+            # At the edge of the window: scroll, then move focus onto the new row
+            before = self._top
+            self._scroll_to(self._top + delta)
+            if self._top != before:
+                row = self.rows[self._top + pos]
+                self._focus_id = row[0]
+                self._selected = {row[0]}
+                self._apply_selection()
+                if self.on_select is not None:
+                    self.on_select(None)
+            return 'break'
+        return None
+
+    # --- Selection ---
+    def _apply_selection(self):
+        # Reflect the Patient ID selection onto whatever items are showing
+        iids = [iid for iid, pid in self._iid_pid.items() if pid in self._selected]
+        if set(iids) != set(self.tree.selection()):
+            self._expected_selection = set(iids)
+            self.tree.selection_set(iids)
+        for iid, pid in self._iid_pid.items():
+            if pid == self._focus_id:
+                self.tree.focus(iid)
+                break
+
+    def _on_tree_select(self, event=None):
+        current = set(self.tree.selection())
+        if self._expected_selection is not None:
+            expected, self._expected_selection = self._expected_selection, None
+            if current == expected:
+                return
+        shown = set(self._iid_pid.values())
+        picked = {self._iid_pid[iid] for iid in current if iid in self._iid_pid}
+        if self.virtual:
+            # Rows scrolled out of view keep their selection
+            self._selected = (self._selected - shown) | picked
+        else:
+            self._selected = picked
+        # A recycled item may still have Tk focus after scrolling; only trust
+        # it when it is part of the new selection
+        focus = self.tree.focus()
+        if focus in current and focus in self._iid_pid:
+            self._focus_id = self._iid_pid[focus]
+        elif len(picked) == 1 and len(self._selected) == 1:
+            self._focus_id = next(iter(picked))
+        if self.on_select is not None:
+            self.on_select(event)
@@ -1,4 +1,6 @@
 # helpers.py
+import os
+import platform
 from datetime import datetime
 
 def format_date(year, month, day):
@@ -12,3 +14,16 @@ def parse_date(date_str):
         return y, m, d
     except Exception:
         return '', '', ''
+
+def user_config_dir(app_name):
+    # Per-user writable dir for settings and the offline store
+    system = platform.system()
+    home = os.path.expanduser('~')
+    if system == 'Windows':
+        base = os.environ.get('APPDATA') or os.path.join(home, 'AppData', 'Roaming')
+        return os.path.join(base, app_name)
+    elif system == 'Darwin':
+        return os.path.join(home, 'Library', 'Application Support', app_name)
+    else:
+        base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(home, '.config')
+        return os.path.join(base, app_name)
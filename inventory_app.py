@@ -1,8 +1,6 @@
 import os
 import sys
 from ttkbootstrap import Window
-from ui import InventoryApp
-from db_utils import init_db
 
 # Resolve resource paths in dev and in PyInstaller onefile builds
 def resource_path(relative_path: str) -> str:
@@ -12,15 +10,25 @@ def resource_path(relative_path: str) -> str:
         base_path = os.path.abspath(os.path.dirname(__file__))
     return os.path.join(base_path, relative_path)
 
+def _create_app(root):
+    # Draw the window before importing the UI: ui pulls in db_utils and
+    # mysql.connector, which take a while on slow PCs. The database/table
+    # check (init_db) then runs in the background once the window is up.
+    from tkinter import ttk
+    loading = ttk.Label(root, text='Loading...')
+    loading.pack(expand=True)
+    root.update()
+    from ui import InventoryApp
+    loading.destroy()
+    return InventoryApp(root)
+
 def main():
-    init_db()
     root = Window(themename='minty')
-    app = InventoryApp(root)
+    app = _create_app(root)
     root.mainloop()
 
 
 if __name__ == '__main__':
-    init_db()
     root = Window(themename='minty')
     try:
         # Use a multi-size .ico containing 16/32/48/256 px for best results
@@ -29,5 +37,5 @@ if __name__ == '__main__':
         pass
     root.title('Daito.dev')
     root.geometry('1366x768')
-    app = InventoryApp(root)
+    app = _create_app(root)
     root.mainloop()
@@ -0,0 +1,598 @@
+# local_store.py
+# Keeps the app usable while the MySQL server is unreachable (server PC
+# rebooting, LAN down).
+#
+# A SQLite file in the user config dir holds the last synced snapshot of the
+# patients table plus a durable queue of writes made while offline. Reads fall
+# back to the snapshot; writes are queued and replayed to MySQL in order once
+# the server answers again, using the same conflict checks as online edits.
+#
+# LocalStore exposes the same functions (and return values) as db_utils for
+# the calls the UI makes, so the UI does not care whether it is online.
+#
+# The rows are also saved, from time to time, as a binary snapshot file (see
+# snapshot.py) next to the SQLite file. Every change to the snapshot table
+# bumps a revision counter; the file is only used at startup when it was
+# written at the current revision, otherwise rows come from SQLite.
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Tuple
+
+import db_utils
+import snapshot as snapshot_file
+from constants import COLUMNS
+from db_utils import ConflictError, DatabaseError, DatabaseUnavailableError
+
+# After the server is found unreachable, don't try it again for this long;
+# calls in between go straight to the local store instead of stalling on
+# the connect timeout every time
+RETRY_INTERVAL_SECONDS = 30
+# Rewrite the snapshot file at most this often (unless forced)
+SNAPSHOT_SAVE_INTERVAL_SECONDS = 60
+
+_ID_IDX = COLUMNS.index('Patient ID')
+_LAST_UPDATED_IDX = COLUMNS.index('Last Updated')
+
+# Values JSON has no type for (Height / Weight are DECIMAL) are stored as a
+# one-key object: type tag -> text, like snapshot.py's type codes
+_JSON_TYPES = {Decimal: '$decimal'}
+_JSON_DECODERS = {'$decimal': Decimal}
+
+
+def _json_default(v):
+    tag = _JSON_TYPES.get(type(v))
+    if tag is None:
+        raise TypeError(f'Object of type {type(v).__name__} is not JSON serializable')
+    return {tag: str(v)}
+
+
+def _json_object(obj: dict):
+    if len(obj) == 1:
+        (tag, text), = obj.items()
+        decode = _JSON_DECODERS.get(tag)
+        if decode is not None:
+            return decode(text)
+    return obj
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_json_default)
+
+
+def _loads(text: str):
+    return json.loads(text, object_hook=_json_object)
+
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS snapshot (
+        patient_id INTEGER PRIMARY KEY,
+        row TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+    # At most one queued op per patient: later edits are merged into it, so
+    # replay never has to chain compare-and-set stamps between ops
+    """CREATE TABLE IF NOT EXISTS pending_ops (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        patient_id INTEGER NOT NULL UNIQUE,
+        payload TEXT,
+        conditional INTEGER NOT NULL DEFAULT 0,
+        expected TEXT,
+        created_at TEXT NOT NULL
+    )""",
+    # Queued writes the server rejected on replay, kept so nothing typed in
+    # offline is silently lost
+    """CREATE TABLE IF NOT EXISTS conflicts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        patient_id INTEGER NOT NULL,
+        payload TEXT,
+        error TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+]
+
+
+class LocalStore:
+    def __init__(self, path: str, snapshot_path: Optional[str] = None):
+        self.path = path
+        self.snapshot_path = snapshot_path or os.path.splitext(path)[0] + '.snap'
+        # One SQLite connection shared by the DbWorker threads, serialized here
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # FULL: a queued visit must survive a power cut on the ward PC
+        self._conn.execute('PRAGMA synchronous=FULL')
+        for sql in _SCHEMA:
+            self._conn.execute(sql)
+        self._retry_at = 0.0
+        self._revision = int(self._get_meta('revision') or 0)
+        # Revision the snapshot file was last written (or found valid) at
+        self._file_revision = None
+        self._file_saved_at = 0.0
+        self._file_lock = threading.Lock()
+        # Queue sizes as of the last transaction, for readers that must not
+        # wait on the lock (the Tk thread while a load holds it)
+        self.pending = 0
+        self.conflicts = 0
+        self._recount()
+
+    @contextmanager
+    def _transaction(self):
+        # Autocommit connection; group related statements explicitly
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                yield
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            self._recount()
+
+    # --- Connection state ---
+    @property
+    def offline(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    def _server_usable(self) -> bool:
+        # Write through only when nothing is queued, so writes keep their order
+        return not self.offline and self.pending_count() == 0
+
+    def _mark_offline(self):
+        self._retry_at = time.monotonic() + RETRY_INTERVAL_SECONDS
+
+    def _mark_online(self):
+        self._retry_at = 0.0
+
+    def _recount(self):
+        with self._lock:
+            self.pending = self._conn.execute('SELECT COUNT(*) FROM pending_ops').fetchone()[0]
+            self.conflicts = self._conn.execute('SELECT COUNT(*) FROM conflicts').fetchone()[0]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending_ops').fetchone()[0]
+
+    def conflict_count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM conflicts').fetchone()[0]
+
+    # --- Snapshot ---
+    def snapshot(self) -> Tuple[List[Tuple[Any, ...]], Optional[str]]:
+        """Return (rows, version) as last synced, with queued edits applied."""
+        with self._lock:
+            version = self._get_meta('version')
+            revision = self._revision
+            count = self._conn.execute('SELECT COUNT(*) FROM snapshot').fetchone()[0]
+        meta = snapshot_file.read_meta(self.snapshot_path)
+        if meta is not None and (meta['revision'], meta['version'], meta['rows']) == (revision, version, count):
+            loaded = snapshot_file.read(self.snapshot_path)
+            if loaded is not None:
+                self._file_revision = revision
+                return loaded[0], version
+        with self._lock:
+            return self._read_rows(), self._get_meta('version')
+
+    def _read_rows(self) -> List[Tuple[Any, ...]]:
+        rows = [tuple(_loads(r[0])) for r in self._conn.execute('SELECT row FROM snapshot')]
+        # Offline-added rows have negative IDs; list them after the synced ones
+        rows.sort(key=lambda r: (r[_ID_IDX] < 0, abs(r[_ID_IDX])))
+        return rows
+
+    def save_snapshot_file(self, force: bool = False) -> bool:
+        """Write the snapshot file if rows changed since it was last written.
+
+        Without force, at most once per SNAPSHOT_SAVE_INTERVAL_SECONDS.
+        Returns True if the file was written.
+        """
+        if not force and time.monotonic() - self._file_saved_at < SNAPSHOT_SAVE_INTERVAL_SECONDS:
+            return False
+        if not self._file_lock.acquire(blocking=False):
+            return False  # another save is writing the file
+        try:
+            with self._lock:
+                revision = self._revision
+                if revision == self._file_revision:
+                    return False
+                rows = self._read_rows()
+                version = self._get_meta('version')
+            try:
+                snapshot_file.write(self.snapshot_path, rows, version, revision)
+            except OSError:
+                return False
+            self._file_revision = revision
+            self._file_saved_at = time.monotonic()
+            return True
+        finally:
+            self._file_lock.release()
+
+    def _touch(self):
+        # Snapshot rows changed: the file no longer matches them
+        self._revision += 1
+        self._set_meta('revision', str(self._revision))
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Optional[str]):
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def _get_row(self, patient_id: int) -> Optional[list]:
+        row = self._conn.execute('SELECT row FROM snapshot WHERE patient_id = ?', (patient_id,)).fetchone()
+        return _loads(row[0]) if row else None
+
+    def _put_rows(self, rows):
+        self._touch()
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO snapshot (patient_id, row) VALUES (?, ?)',
+            [(int(r[_ID_IDX]), _dumps(list(r))) for r in rows],
+        )
+
+    def _delete_rows(self, ids):
+        self._touch()
+        self._conn.executemany('DELETE FROM snapshot WHERE patient_id = ?', [(int(i),) for i in ids])
+
+    def _patch_rows(self, ids, changes: dict, stamp: str) -> List[Tuple[Any, ...]]:
+        patched = []
+        for pid in ids:
+            row = self._get_row(pid)
+            if row is None:
+                continue
+            for col, v in changes.items():
+                row[COLUMNS.index(col)] = v
+            row[_LAST_UPDATED_IDX] = stamp
+            patched.append(tuple(row))
+        self._put_rows(patched)
+        return patched
+
+    # --- Pending queue ---
+    def _pending_op(self, patient_id: int):
+        return self._conn.execute(
+            'SELECT seq, op, payload, conditional, expected FROM pending_ops WHERE patient_id = ?',
+            (patient_id,),
+        ).fetchone()
+
+    def _queue(self, op: str, patient_id: int, payload=None, conditional=False, expected=None):
+        self._conn.execute(
+            'INSERT INTO pending_ops (op, patient_id, payload, conditional, expected, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (op, patient_id, None if payload is None else _dumps(payload),
+             int(conditional), expected, datetime.now().isoformat(sep=' ', timespec='seconds')),
+        )
+
+    def _queue_add(self, item) -> Tuple[Any, ...]:
+        # Offline rows get a temporary negative ID until replay stores them
+        lowest = self._conn.execute(
+            'SELECT MIN(patient_id) FROM (SELECT patient_id FROM snapshot '
+            'UNION ALL SELECT patient_id FROM pending_ops)'
+        ).fetchone()[0]
+        temp_id = min(lowest or 0, 0) - 1
+        item = list(item)
+        item[_ID_IDX] = None
+        self._queue('add', temp_id, item)
+        row = list(item)
+        row[_ID_IDX] = temp_id
+        row[_LAST_UPDATED_IDX] = ''
+        self._put_rows([row])
+        return tuple(row)
+
+    def _queue_update(self, patient_id: int, changes: dict, conditional: bool, expected):
+        existing = self._pending_op(patient_id)
+        if existing is None:
+            self._queue('update', patient_id, changes, conditional, expected)
+        elif existing[1] == 'add':
+            # Not on the server yet: fold the edit into the queued insert
+            item = _loads(existing[2])
+            for col, v in changes.items():
+                item[COLUMNS.index(col)] = v
+            self._conn.execute('UPDATE pending_ops SET payload = ? WHERE seq = ?', (_dumps(item), existing[0]))
+        elif existing[1] == 'update':
+            # Keep the stamp from the first queued edit; that is what the
+            # server row must still have for the merged edit to apply
+            merged = _loads(existing[2])
+            merged.update(changes)
+            self._conn.execute('UPDATE pending_ops SET payload = ? WHERE seq = ?', (_dumps(merged), existing[0]))
+        else:
+            return  # already queued for deletion
+        self._patch_rows([patient_id], changes, '')
+
+    def _queue_delete(self, patient_id: int):
+        existing = self._pending_op(patient_id)
+        if existing is not None and existing[1] == 'add':
+            # Never reached the server: just drop it
+            self._conn.execute('DELETE FROM pending_ops WHERE seq = ?', (existing[0],))
+        elif existing is not None:
+            self._conn.execute(
+                "UPDATE pending_ops SET op = 'delete', payload = NULL WHERE seq = ?", (existing[0],)
+            )
+        else:
+            self._queue('delete', patient_id)
+        self._delete_rows([patient_id])
+
+    def _pending_by_patient(self) -> dict:
+        # The whole queue in one read: patient_id -> (op, payload)
+        return {pid: (op, payload) for pid, op, payload in
+                self._conn.execute('SELECT patient_id, op, payload FROM pending_ops')}
+
+    def _overlay(self, row, pending: dict) -> Optional[Tuple[Any, ...]]:
+        # Re-apply a queued edit (see _pending_by_patient) on top of a row
+        # fresh from the server
+        queued = pending.get(int(row[_ID_IDX]))
+        if queued is None:
+            return tuple(row)
+        op, payload = queued
+        if op == 'delete':
+            return None
+        row = list(row)
+        for col, v in _loads(payload).items():
+            row[COLUMNS.index(col)] = v
+        row[_LAST_UPDATED_IDX] = ''
+        return tuple(row)
+
+    def _replace_synced_rows(self, rows):
+        # A full load: write only the rows whose stored copy differs and drop
+        # synced rows that are gone, instead of rewriting the whole table
+        stored = dict(self._conn.execute('SELECT patient_id, row FROM snapshot WHERE patient_id >= 0'))
+        changed = []
+        for r in rows:
+            pid = int(r[_ID_IDX])
+            text = _dumps(list(r))
+            if stored.pop(pid, None) != text:
+                changed.append((pid, text))
+        if not changed and not stored:
+            return
+        self._touch()
+        self._conn.executemany('INSERT OR REPLACE INTO snapshot (patient_id, row) VALUES (?, ?)', changed)
+        self._conn.executemany('DELETE FROM snapshot WHERE patient_id = ?', [(pid,) for pid in stored])
+
+    # --- db_utils equivalents used by the UI ---
+    def add_patient(self, item: List[Any]) -> Tuple[Any, ...]:
+        """Like db_utils.add_patient; offline rows get a temporary negative ID."""
+        if self._server_usable():
+            try:
+                row = db_utils.add_patient(item)
+            except DatabaseError as e:
+                if not db_utils.is_unavailable_error(e):
+                    raise
+                self._mark_offline()
+            else:
+                with self._lock:
+                    self._put_rows([row])
+                return row
+        with self._transaction():
+            row = self._queue_add(item)
+        return row
+
+    def update_patient_fields(self, item_id: Any, changes: dict, expected_last_updated: Any) -> str:
+        """Like db_utils.update_patient_fields; returns '' if the edit was queued."""
+        item_id = int(item_id)
+        if self._server_usable():
+            try:
+                stamp = db_utils.update_patient_fields(item_id, changes, expected_last_updated)
+            except DatabaseError as e:
+                if not db_utils.is_unavailable_error(e):
+                    raise
+                self._mark_offline()
+            else:
+                with self._lock:
+                    self._patch_rows([item_id], changes, stamp)
+                return stamp
+        with self._transaction():
+            self._queue_update(item_id, changes, True, expected_last_updated)
+        return ''
+
+    def delete_patient(self, item_id: Any):
+        item_id = int(item_id)
+        if self._server_usable():
+            try:
+                db_utils.delete_patient(item_id)
+            except DatabaseError as e:
+                if not db_utils.is_unavailable_error(e):
+                    raise
+                self._mark_offline()
+            else:
+                with self._lock:
+                    self._delete_rows([item_id])
+                return
+        with self._transaction():
+            self._queue_delete(item_id)
+
+    def update_patients_bulk(self, ids: List[Any], changes: dict) -> str:
+        ids = [int(i) for i in ids]
+        if self._server_usable():
+            try:
+                stamp = db_utils.update_patients_bulk(ids, changes)
+            except DatabaseError as e:
+                if not db_utils.is_unavailable_error(e):
+                    raise
+                self._mark_offline()
+            else:
+                with self._lock:
+                    self._patch_rows(ids, changes, stamp)
+                return stamp
+        with self._transaction():
+            for pid in ids:
+                # Bulk edits are unconditional online too
+                self._queue_update(pid, changes, False, None)
+        return ''
+
+    def delete_patients_bulk(self, ids: List[Any]) -> int:
+        ids = [int(i) for i in ids]
+        if self._server_usable():
+            try:
+                deleted = db_utils.delete_patients_bulk(ids)
+            except DatabaseError as e:
+                if not db_utils.is_unavailable_error(e):
+                    raise
+                self._mark_offline()
+            else:
+                with self._lock:
+                    self._delete_rows(ids)
+                return deleted
+        with self._transaction():
+            for pid in ids:
+                self._queue_delete(pid)
+        return len(ids)
+
+    def load_patients_since(self, version: Optional[str]) -> Tuple[List[Tuple[Any, ...]], List[int], str]:
+        """Like db_utils.load_patients_since, also saving the result locally.
+
+        Queued edits are applied on top of the server rows. A full load
+        (version None) also returns the rows added offline. Raises
+        DatabaseUnavailableError without waiting while the server is
+        known to be down.
+        """
+        if self.offline:
+            raise DatabaseUnavailableError('Working offline: the database server is not reachable.')
+        try:
+            rows, deleted, new_version = db_utils.load_patients_since(version)
+        except DatabaseError as e:
+            if db_utils.is_unavailable_error(e):
+                self._mark_offline()
+            raise
+        self._mark_online()
+        with self._transaction():
+            if deleted:
+                self._delete_rows(deleted)
+            pending = self._pending_by_patient()
+            result = []
+            for row in rows:
+                shown = self._overlay(row, pending)
+                if shown is None:
+                    deleted.append(row[_ID_IDX])
+                    continue
+                result.append(shown)
+            if not version:
+                self._replace_synced_rows(result)
+            elif result:
+                self._put_rows(result)
+            if not version:
+                result.extend(tuple(_loads(r[0])) for r in
+                              self._conn.execute('SELECT row FROM snapshot WHERE patient_id < 0'))
+            self._set_meta('version', new_version)
+        return result, deleted, new_version
+
+    # --- Rejected writes ---
+    def list_conflicts(self) -> List[dict]:
+        """Writes the server rejected on replay, oldest first.
+
+        Each is a dict: id, op, patient_id, payload (the queued row for an
+        add, the changed fields for an update), error and created_at.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, op, patient_id, payload, error, created_at FROM conflicts ORDER BY id'
+            ).fetchall()
+        return [{'id': cid, 'op': op, 'patient_id': pid, 'payload': _loads(payload) if payload is not None else None,
+                 'error': error, 'created_at': created_at}
+                for cid, op, pid, payload, error, created_at in rows]
+
+    def discard_conflict(self, conflict_id: int) -> bool:
+        """Drop a rejected write for good. Returns False if it was already gone."""
+        with self._transaction():
+            cur = self._conn.execute('DELETE FROM conflicts WHERE id = ?', (conflict_id,))
+        return cur.rowcount > 0
+
+    def requeue_conflict(self, conflict_id: int) -> Optional[Tuple[Any, ...]]:
+        """Queue a rejected write again; it is sent on the next replay.
+
+        An add is queued under a new temporary ID. An update goes back
+        unconditionally, so it overwrites whatever the other PC saved. A
+        delete is queued again. Returns the local row as it now stands (None
+        after a delete, or if the patient is not held locally).
+        """
+        with self._transaction():
+            found = self._conn.execute(
+                'SELECT op, patient_id, payload FROM conflicts WHERE id = ?', (conflict_id,)
+            ).fetchone()
+            if found is None:
+                raise DatabaseError('This rejected change was already re-queued or discarded.')
+            op, pid, payload = found
+            self._conn.execute('DELETE FROM conflicts WHERE id = ?', (conflict_id,))
+            if op == 'add':
+                return self._queue_add(_loads(payload))
+            if op == 'update':
+                self._queue_update(pid, _loads(payload), False, None)
+            else:
+                self._queue_delete(pid)
+            row = self._get_row(pid)
+        return tuple(row) if row is not None else None
+
+    # --- Replay ---
+    def replay(self, batch_size: int = 50) -> dict:
+        """Send up to batch_size queued writes to the server, oldest first.
+
+        Returns {'replayed', 'remaining', 'conflicts', 'id_map', 'reload'}:
+        conflicts are messages for writes the server rejected (kept in the
+        conflicts table), id_map maps temporary IDs to the stored rows, and
+        reload is set when the cache should be fully reloaded because a
+        rejected edit left local rows out of step with the server.
+        """
+        result = {'replayed': 0, 'remaining': 0, 'conflicts': [], 'id_map': {}, 'reload': False}
+        if self.offline:
+            result['remaining'] = self.pending_count()
+            return result
+        with self._lock:
+            ops = self._conn.execute(
+                'SELECT seq, op, patient_id, payload, conditional, expected FROM pending_ops '
+                'ORDER BY seq LIMIT ?', (batch_size,),
+            ).fetchall()
+        for seq, op, pid, payload, conditional, expected in ops:
+            data = _loads(payload) if payload is not None else None
+            try:
+                if op == 'add':
+                    row = db_utils.add_patient(data)
+                elif op == 'update' and conditional:
+                    stamp = db_utils.update_patient_fields(pid, data, expected)
+                elif op == 'update':
+                    stamp = db_utils.update_patients_bulk([pid], data)
+                else:
+                    db_utils.delete_patient(pid)
+            except DatabaseError as e:
+                if db_utils.is_unavailable_error(e):
+                    self._mark_offline()
+                    break
+                with self._transaction():
+                    self._conn.execute(
+                        'INSERT INTO conflicts (op, patient_id, payload, error, created_at) VALUES (?, ?, ?, ?, ?)',
+                        (op, pid, payload, str(e), datetime.now().isoformat(sep=' ', timespec='seconds')),
+                    )
+                    self._conn.execute('DELETE FROM pending_ops WHERE seq = ?', (seq,))
+                    self._delete_rows([pid])
+                    if pid >= 0:
+                        # The local row holds an edit the server refused;
+                        # a full reload brings back the server's version
+                        self._set_meta('version', None)
+                        result['reload'] = True
+                    else:
+                        result['id_map'][pid] = None
+                kind = 'Update' if isinstance(e, ConflictError) else op.capitalize()
+                result['conflicts'].append(f'{kind} of patient {pid}: {e}')
+                continue
+            self._mark_online()
+            with self._transaction():
+                self._conn.execute('DELETE FROM pending_ops WHERE seq = ?', (seq,))
+                if op == 'add':
+                    self._delete_rows([pid])
+                    self._put_rows([row])
+                    result['id_map'][pid] = row
+                elif op == 'update':
+                    self._patch_rows([pid], {}, stamp)
+            result['replayed'] += 1
+        result['remaining'] = self.pending_count()
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
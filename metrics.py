@@ -0,0 +1,181 @@
+# metrics.py
+# Definitions for the nutrition metrics table (rows = metrics, columns =
+# age group x sex), shared by the SQL aggregation in db_utils and the
+# workbook summary in excel_utils.
+from array import array
+
+from constants import AGE_GROUP_OPTIONS
+
+METRIC_LABELS = [
+    'Number of patients admitted',
+    'Number of nutritionally-at-risk (NAR) patients',
+    '  a. Wasting',
+    '    i. Moderate acute malnutrition',
+    '    ii. Severe acute malnutrition',
+    '  b. Stunting',
+    '  c. Underweight',
+    '  d. Overweight',
+    '  e. Obese',
+    '  f. Disease and other co-morbidities (Please specify)',
+    '    i.',
+    '    ii.',
+    '    iii.',
+    '    iv.',
+    'Number of NAR patients given nutrition screening (by the nurse)',
+    'Number of patients given nutrition assessment',
+    'Number of patients given nutrition intervention',
+    'Number of patients with nutrition documentation',
+    'Number of patients given nutrition care process (ADIME)',
+]
+
+# Computed metrics: key -> row index in METRIC_LABELS. Rows not listed here
+# (Wasting header, co-morbidities) are filled in by hand on the sheet.
+METRIC_ROWS = {
+    'admitted': 0,
+    'nar': 1,
+    'mam': 3,
+    'sam': 4,
+    'stunting': 5,
+    'underweight': 6,
+    'overweight': 7,
+    'obese': 8,
+    'screening': 14,
+    'assessment': 15,
+    'intervention': 16,
+    'documentation': 17,
+    'ncp': 18,
+}
+METRIC_KEYS = list(METRIC_ROWS)
+_METRIC_INDEX = {key: i for i, key in enumerate(METRIC_KEYS)}
+
+AGE_GROUPS = AGE_GROUP_OPTIONS
+TABLE_AGE_GROUPS = ['0-4', '5-9', '10-14', '15-18', '19-29', '30-39', '40-49', '50-59', '60 & above']
+SEXES = ['male', 'female']
+TABLE_SEXES = ['M', 'F']
+
+
+def empty_counts():
+    # [age_group][sex], sex: 0=M, 1=F
+    return [[0, 0] for _ in AGE_GROUPS]
+
+
+def empty_cube_entry():
+    return {key: empty_counts() for key in METRIC_KEYS}
+
+
+def totals(counts):
+    """Return (subtotal_m, subtotal_f, total) for one metric's counts."""
+    subtotal_m = sum(ag[0] for ag in counts)
+    subtotal_f = sum(ag[1] for ag in counts)
+    return subtotal_m, subtotal_f, subtotal_m + subtotal_f
+
+
+# --- Row-level counting (workbook summaries) ---
+# The same rules as db_utils._METRIC_SQL, for rows read from a workbook or
+# a list of records. A row's metrics depend only on a handful of short
+# categorical values, so each distinct combination is classified once.
+
+# Values summarize() expects per row, after the row's period keys
+SUMMARY_FIELDS = ['Age Group', 'Sex', 'Nutritional Status', 'Type Of Visit', 'Purpose of Visit',
+                  'RND Dietary Management', 'With Documents', 'Given NCP']
+
+_AGE_INDEX = {ag: i for i, ag in enumerate(AGE_GROUPS)}
+_SEX_INDEX = {sex: i for i, sex in enumerate(SEXES)}
+# Nutritional Status (lowercased) -> metric counted besides 'nar'
+_STATUS_KEYS = {'mam': 'mam', 'sam': 'sam', 'stunting': 'stunting', 'underweight': 'underweight',
+                'overweight': 'overweight', 'obese': 'obese'}
+
+
+def _text(v) -> str:
+    return str(v).strip().lower() if v else ''
+
+
+def classify(age_group, sex, status, visit_type, purpose, rnd, documents, ncp):
+    """(age group index, sex index, metric keys) for one visit, or None if it isn't counted."""
+    ag = _AGE_INDEX.get(age_group)
+    sx = _SEX_INDEX.get(_text(sex))
+    if ag is None or sx is None:
+        return None
+    keys = ['admitted']
+    s = _text(status)
+    # Anything not explicitly Normal (including blank) is at risk
+    if s != 'normal':
+        keys.append('nar')
+    if s in _STATUS_KEYS:
+        keys.append(_STATUS_KEYS[s])
+    if visit_type:
+        keys.append('screening')
+    if purpose:
+        keys.append('assessment')
+    if rnd:
+        keys.append('intervention')
+    if _text(documents) == 'yes':
+        keys.append('documentation')
+    if _text(ncp) == 'yes':
+        keys.append('ncp')
+    return ag, sx, tuple(keys)
+
+
+def summarize(rows) -> dict:
+    """Metric cube from one pass over rows.
+
+    Each row is (period_keys, *values in SUMMARY_FIELDS order); the row is
+    counted once in every period it lists (e.g. its month, its half-year
+    and the whole). Returns {period_key: {metric_key: [[male, female] per
+    age group]}}, like db_utils.compute_metrics().
+    """
+    class_of = {}   # SUMMARY_FIELDS values -> class code
+    classes = []    # class code -> classify() result
+    period_of = {}  # period key -> period code
+    period_codes = array('i')
+    class_codes = array('i')
+    for row in rows:
+        values = row[1:]
+        c = class_of.get(values)
+        if c is None:
+            c = class_of[values] = len(classes)
+            classes.append(classify(*values))
+        for period in row[0]:
+            p = period_of.get(period)
+            if p is None:
+                p = period_of[period] = len(period_of)
+            period_codes.append(p)
+            class_codes.append(c)
+    return count_cube(period_codes, class_codes, list(period_of), classes)
+
+
+def count_cube(period_codes, class_codes, periods, classes) -> dict:
+    """Metric cube from parallel code arrays (one entry per row and period).
+
+    periods[p] is the key of period code p; classes[c] is classify()'s
+    result for class code c (None: not counted). Rows are tallied per
+    (period, class) with one bincount, and the tallies are spread over the
+    metrics and table cells with one matrix product, so the cost does not
+    grow with the number of metrics.
+    """
+    import numpy as np  # heavy; only needed by reporting paths
+
+    if not periods or not classes:
+        return {}
+    n_periods, n_classes = len(periods), len(classes)
+    n_cells = len(AGE_GROUPS) * len(SEXES)
+    codes = np.frombuffer(period_codes, dtype=np.int32).astype(np.intp) * n_classes
+    codes += np.frombuffer(class_codes, dtype=np.int32)
+    tally = np.bincount(codes, minlength=n_periods * n_classes).reshape(n_periods, n_classes)
+    # Per class: the metrics it counts in, and its age group x sex cell
+    member = np.zeros((n_classes, len(METRIC_KEYS)), dtype=np.int64)
+    cell = np.zeros((n_classes, n_cells), dtype=np.int64)
+    for c, hit in enumerate(classes):
+        if hit is not None:
+            ag, sx, keys = hit
+            member[c, [_METRIC_INDEX[k] for k in keys]] = 1
+            cell[c, ag * len(SEXES) + sx] = 1
+    # counts[p, m, cell] = sum over classes of tally * member * cell
+    counts = (tally[:, None, :] * member.T[None, :, :]) @ cell
+    admitted = _METRIC_INDEX['admitted']
+    cube = {}
+    for p, period in enumerate(periods):
+        if counts[p, admitted].any():
+            by_cell = counts[p].reshape(len(METRIC_KEYS), len(AGE_GROUPS), len(SEXES)).tolist()
+            cube[period] = dict(zip(METRIC_KEYS, by_cell))
+    return cube
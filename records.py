@@ -0,0 +1,78 @@
+# records.py
+# Typed patient rows.
+#
+# PatientRecord is a namedtuple in COLUMNS order holding the values as MySQL
+# returns them: datetime.date for DATE_COLUMNS, datetime for Last Updated,
+# int Age and Decimal Height/Weight. Reporting code (export, summaries,
+# backups) reads record.date_of_visit.month instead of re-parsing text.
+#
+# Text is produced only at the edges that show or store rows as text:
+# display_row() gives the UI's row format ('YYYY-MM-DD' dates, '' for a
+# missing date), which the grid, the snapshot and the offline store keep.
+# to_date() / month_of() read the other direction, for values that may come
+# from a form or a workbook cell (date, datetime or 'YYYY-M-D' text).
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from constants import COLUMNS, DATE_COLUMNS, DATETIME_COLUMNS
+
+
+def _field_name(column: str) -> str:
+    # 'Diet Prescriptions(Current)' -> 'diet_prescriptions_current'
+    return re.sub(r'[^0-9a-z]+', '_', column.lower()).strip('_')
+
+
+FIELDS = [_field_name(c) for c in COLUMNS]
+PatientRecord = namedtuple('PatientRecord', FIELDS)
+
+
+def format_date(v) -> str:
+    return v.isoformat()
+
+
+def format_datetime(v) -> str:
+    # Keep the same format the UI uses
+    return v.isoformat(sep=' ', timespec='seconds')
+
+
+# (index, formatter) for the only columns display_row() touches
+_DISPLAY_FORMATTERS = (
+    [(COLUMNS.index(c), format_date) for c in DATE_COLUMNS]
+    + [(COLUMNS.index(c), format_datetime) for c in DATETIME_COLUMNS]
+)
+
+
+def display_row(record: Sequence[Any]) -> Tuple[Any, ...]:
+    """record in the UI's row format: dates as text, '' for a missing date."""
+    row = list(record)
+    for idx, fmt in _DISPLAY_FORMATTERS:
+        v = row[idx]
+        row[idx] = '' if v is None else fmt(v)
+    return tuple(row)
+
+
+def to_date(value: Any) -> Optional[date]:
+    """value as a date: date/datetime as-is, 'YYYY-M-D[ time]' text parsed, else None."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    parts = str(value).strip().split('T')[0].split(' ')[0].split('-')
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return None
+    try:
+        return date(int(parts[0]), int(parts[1]), int(parts[2]))
+    except ValueError:
+        return None
+
+
+def month_of(value: Any) -> int:
+    """Month (1-12) of a date value (see to_date), 0 if it has none."""
+    if isinstance(value, date):
+        return value.month
+    d = to_date(value)
+    return d.month if d is not None else 0
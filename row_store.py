@@ -0,0 +1,341 @@
+# row_store.py
+# Compact, column-wise storage for the UI's patient cache.
+#
+# A list of row tuples keeps 29 Python objects per visit, and the same few
+# ward names, age groups and Yes/No answers are repeated in every row.
+# RowStore keeps one array per column instead:
+#   - CATEGORY_OPTIONS columns: one byte per row, a code into the column's
+#     vocabulary (the options from constants.py, plus any other values seen)
+#   - date columns: day ordinals; Last Updated: seconds; Age: int; Height and
+#     Weight: hundredths (DECIMAL(5,2) in the database)
+#   - everything else: a plain list
+# A value the column's array can't represent exactly (e.g. text typed into a
+# date field while offline) is kept as-is in an overflow dict, so rows always
+# read back exactly as they were stored.
+#
+# Rows are still read and written as tuples in COLUMNS order (store[i],
+# store.append(row), iteration), and they are only built when asked for: the
+# grid materializes the rows on screen, not the whole cache.
+from array import array
+from datetime import date
+from itertools import accumulate, compress
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Tuple
+
+from constants import COLUMNS, CATEGORY_OPTIONS, DATE_COLUMNS
+
+_ID_IDX = COLUMNS.index('Patient ID')
+_CATEGORY_IDXS = [COLUMNS.index(c) for c in CATEGORY_OPTIONS]
+_DATE_IDXS = [COLUMNS.index(c) for c in DATE_COLUMNS]
+_STAMP_IDXS = [COLUMNS.index('Last Updated')]
+_INT_IDXS = [COLUMNS.index('Age')]
+_CENTS_IDXS = [COLUMNS.index('Height'), COLUMNS.index('Weight')]
+_TYPED_IDXS = set(_CATEGORY_IDXS + _DATE_IDXS + _STAMP_IDXS + _INT_IDXS + _CENTS_IDXS + [_ID_IDX])
+_TEXT_IDXS = [i for i in range(len(COLUMNS)) if i not in _TYPED_IDXS]
+
+# Markers in the typed arrays
+_NONE = -(2 ** 62)
+_EMPTY = _NONE + 1   # '' (the database layer formats NULL dates as '')
+_OTHER = _NONE + 2   # value is in the overflow dict
+_CODE_NONE, _CODE_EMPTY, _CODE_OTHER = 0, 1, 255
+# Rows decoded at a time when iterating
+_CHUNK_ROWS = 1024
+
+
+def _encode_date(value) -> int:
+    # Only canonical 'YYYY-MM-DD' text, so decoding gives the same string back
+    if value is None:
+        return _NONE
+    if value == '':
+        return _EMPTY
+    if type(value) is str and len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return date(int(value[:4]), int(value[5:7]), int(value[8:])).toordinal()
+        except ValueError:
+            pass
+    return _OTHER
+
+
+def _encode_stamp(value) -> int:
+    # 'YYYY-MM-DD HH:MM:SS' -> seconds since day 1
+    if value is None:
+        return _NONE
+    if value == '':
+        return _EMPTY
+    if (type(value) is str and len(value) == 19 and value[10] == ' '
+            and value[13] == ':' and value[16] == ':' and value[11:13].isdigit()
+            and value[14:16].isdigit() and value[17:].isdigit()):
+        day = _encode_date(value[:10])
+        hh, mm, ss = int(value[11:13]), int(value[14:16]), int(value[17:])
+        if day > 0 and hh < 24 and mm < 60 and ss < 60:
+            return day * 86400 + hh * 3600 + mm * 60 + ss
+    return _OTHER
+
+
+def _encode_int(value) -> int:
+    if value is None:
+        return _NONE
+    return value if type(value) is int and abs(value) < 2 ** 61 else _OTHER
+
+
+def _encode_cents(value) -> int:
+    if value is None:
+        return _NONE
+    if type(value) is Decimal and value.is_finite() and value.as_tuple().exponent == -2:
+        cents = int(value.scaleb(2))
+        if abs(cents) < 2 ** 61:
+            return cents
+    return _OTHER
+
+
+class RowStore:
+    """List-like store of patient rows (tuples in COLUMNS order)."""
+
+    def __init__(self, rows: Iterable[Tuple[Any, ...]] = ()):
+        self._ids = array('q')
+        self._pos = {}      # Patient ID -> position
+        self._codes = {i: array('B') for i in _CATEGORY_IDXS}
+        self._vocab = {}    # column -> [None, '', options..., other values seen]
+        self._code_of = {}  # column -> value -> code
+        for i in _CATEGORY_IDXS:
+            self._vocab[i] = [None, ''] + list(CATEGORY_OPTIONS[COLUMNS[i]])
+            self._code_of[i] = {v: c for c, v in enumerate(self._vocab[i])}
+        self._nums = {i: array('q') for i in _DATE_IDXS + _STAMP_IDXS + _INT_IDXS + _CENTS_IDXS}
+        self._text = {i: [] for i in _TEXT_IDXS}
+        self._other = {}    # position -> {column: raw value}
+        self.extend(rows)
+
+    # --- Sequence API ---
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        n = len(self._ids)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            if step == 1:
+                return self._decode(start, max(start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('RowStore index out of range')
+        return self._decode(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, len(self._ids), _CHUNK_ROWS):
+            yield from self._decode(start, min(start + _CHUNK_ROWS, len(self._ids)))
+
+    def __setitem__(self, index: int, row: Tuple[Any, ...]):
+        old_id = self._ids[index]
+        if old_id != row[_ID_IDX]:
+            del self._pos[old_id]
+            self._pos[row[_ID_IDX]] = index if index >= 0 else index + len(self._ids)
+        self._other.pop(index, None)
+        self._encode(row, index)
+
+    @property
+    def ids(self) -> array:
+        """Patient IDs in row order (do not modify)."""
+        return self._ids
+
+    def position(self, patient_id) -> Optional[int]:
+        return self._pos.get(patient_id)
+
+    def get(self, patient_id) -> Optional[Tuple[Any, ...]]:
+        pos = self._pos.get(patient_id)
+        return None if pos is None else self._decode(pos, pos + 1)[0]
+
+    def append(self, row: Tuple[Any, ...]):
+        self.extend([row])
+
+    def extend(self, rows: Iterable[Tuple[Any, ...]]):
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+        start = len(self._ids)
+        columns = list(zip(*rows))
+        other = {}
+        self._ids.extend(columns[_ID_IDX])
+        for i in _CATEGORY_IDXS:
+            code_of = self._code_of[i]
+            codes = list(map(code_of.get, columns[i]))
+            if None in codes:
+                for k, code in enumerate(codes):
+                    if code is None:
+                        v = columns[i][k]
+                        code = code_of.get(v)
+                        codes[k] = code if code is not None else self._new_code(i, v, other, start + k)
+            self._codes[i].extend(codes)
+        for idxs, encode in ((_DATE_IDXS, _encode_date), (_STAMP_IDXS, _encode_stamp),
+                             (_INT_IDXS, _encode_int), (_CENTS_IDXS, _encode_cents)):
+            for i in idxs:
+                # Dates and measurements repeat a lot: encode each value once
+                memo = {v: encode(v) for v in set(columns[i])}
+                nums = list(map(memo.__getitem__, columns[i]))
+                if _OTHER in memo.values():
+                    for k, n in enumerate(nums):
+                        if n == _OTHER:
+                            other.setdefault(start + k, {})[i] = columns[i][k]
+                self._nums[i].extend(nums)
+        for i in _TEXT_IDXS:
+            self._text[i].extend(columns[i])
+        self._other.update(other)
+        pos = self._pos
+        for k, pid in enumerate(columns[_ID_IDX], start):
+            pos[pid] = k
+
+    def _new_code(self, i: int, value, other: dict, pos: int) -> int:
+        # A value not in the vocabulary yet; past 254 values, keep it raw
+        vocab = self._vocab[i]
+        if type(value) is str and len(vocab) < _CODE_OTHER:
+            self._code_of[i][value] = len(vocab)
+            vocab.append(value)
+            return len(vocab) - 1
+        other.setdefault(pos, {})[i] = value
+        return _CODE_OTHER
+
+    def copy(self) -> 'RowStore':
+        """Independent copy, e.g. to hand to a worker thread."""
+        other = RowStore.__new__(RowStore)
+        other._ids = array('q', self._ids)
+        other._pos = dict(self._pos)
+        other._codes = {i: array('B', a) for i, a in self._codes.items()}
+        other._vocab = {i: list(v) for i, v in self._vocab.items()}
+        other._code_of = {i: dict(c) for i, c in self._code_of.items()}
+        other._nums = {i: array('q', a) for i, a in self._nums.items()}
+        other._text = {i: list(v) for i, v in self._text.items()}
+        other._other = {p: dict(v) for p, v in self._other.items()}
+        return other
+
+    def remove_ids(self, ids: Iterable[Any]):
+        """Drop the rows with these Patient IDs, keeping the order of the rest."""
+        drop = [self._pos[pid] for pid in set(ids) if pid in self._pos]
+        if not drop:
+            return
+        # Rebuild each column once through a keep-mask
+        keep = bytearray(b'\x01') * len(self._ids)
+        for pos in drop:
+            keep[pos] = 0
+        self._ids = array('q', compress(self._ids, keep))
+        self._codes = {i: array('B', compress(a, keep)) for i, a in self._codes.items()}
+        self._nums = {i: array('q', compress(a, keep)) for i, a in self._nums.items()}
+        self._text = {i: list(compress(v, keep)) for i, v in self._text.items()}
+        if self._other:
+            # Overflow entries move down by the number of rows dropped before them
+            new_pos = list(accumulate(keep))
+            self._other = {new_pos[p] - 1: v for p, v in self._other.items() if keep[p]}
+        self._reindex()
+
+    def sort_by_id(self):
+        """Reorder rows by Patient ID."""
+        order = sorted(range(len(self._ids)), key=self._ids.__getitem__)
+        self._ids = array('q', map(self._ids.__getitem__, order))
+        self._codes = {i: array('B', map(a.__getitem__, order)) for i, a in self._codes.items()}
+        self._nums = {i: array('q', map(a.__getitem__, order)) for i, a in self._nums.items()}
+        self._text = {i: list(map(v.__getitem__, order)) for i, v in self._text.items()}
+        if self._other:
+            new_pos = {old: new for new, old in enumerate(order)}
+            self._other = {new_pos[p]: v for p, v in self._other.items()}
+        self._reindex()
+
+    def _reindex(self):
+        self._pos = {pid: i for i, pid in enumerate(self._ids)}
+
+    # --- Encoding ---
+    def _encode(self, row: Tuple[Any, ...], pos: int):
+        other = {}
+        pid = row[_ID_IDX]
+        self._ids[pos] = pid  # IDs are always ints (negative for offline adds)
+        for i in _CATEGORY_IDXS:
+            value = row[i]
+            code = self._code_of[i].get(value)
+            if code is None:
+                code = self._new_code(i, value, {}, pos)
+                if code == _CODE_OTHER:
+                    other[i] = value
+            self._codes[i][pos] = code
+        for idxs, encode in ((_DATE_IDXS, _encode_date), (_STAMP_IDXS, _encode_stamp),
+                             (_INT_IDXS, _encode_int), (_CENTS_IDXS, _encode_cents)):
+            for i in idxs:
+                n = encode(row[i])
+                if n == _OTHER:
+                    other[i] = row[i]
+                self._nums[i][pos] = n
+        for i in _TEXT_IDXS:
+            self._text[i][pos] = row[i]
+        if other:
+            self._other[pos] = other
+
+    # --- Decoding ---
+    def _decode(self, start: int, stop: int) -> List[Tuple[Any, ...]]:
+        columns = [None] * len(COLUMNS)
+        columns[_ID_IDX] = self._ids[start:stop].tolist()
+        for i in _CATEGORY_IDXS:
+            vocab = self._vocab[i]
+            columns[i] = [vocab[c] if c != _CODE_OTHER else None for c in self._codes[i][start:stop]]
+        for i in _DATE_IDXS:
+            columns[i] = [_date_text(n) for n in self._nums[i][start:stop]]
+        for i in _STAMP_IDXS:
+            columns[i] = [_stamp_text(n) for n in self._nums[i][start:stop]]
+        for i in _INT_IDXS:
+            columns[i] = [None if n == _NONE else n for n in self._nums[i][start:stop]]
+        for i in _CENTS_IDXS:
+            columns[i] = [None if n <= _OTHER else Decimal(n).scaleb(-2) for n in self._nums[i][start:stop]]
+        for i in _TEXT_IDXS:
+            columns[i] = self._text[i][start:stop]
+        rows = list(zip(*columns))
+        if self._other:
+            for pos in range(start, stop):
+                values = self._other.get(pos)
+                if values:
+                    row = list(rows[pos - start])
+                    for i, v in values.items():
+                        row[i] = v
+                    rows[pos - start] = tuple(row)
+        return rows
+
+
+_DATE_TEXT = {}
+
+
+def _date_text(n: int):
+    # Day ordinal -> 'YYYY-MM-DD', memoized: a cache holds few distinct days
+    if n <= _OTHER:
+        return None if n == _NONE else ('' if n == _EMPTY else None)
+    text = _DATE_TEXT.get(n)
+    if text is None:
+        text = _DATE_TEXT[n] = date.fromordinal(n).isoformat()
+    return text
+
+
+def _stamp_text(n: int):
+    if n <= _OTHER:
+        return None if n == _NONE else ('' if n == _EMPTY else None)
+    day, secs = divmod(n, 86400)
+    hh, rest = divmod(secs, 3600)
+    mm, ss = divmod(rest, 60)
+    return f'{_date_text(day)} {hh:02d}:{mm:02d}:{ss:02d}'
+
+
+class RowView:
+    """Read-only sequence of the rows for a list of Patient IDs.
+
+    Rows are fetched through lookup(patient_id) when indexed, so a view of
+    50k matches costs a list of IDs until rows are actually shown.
+    """
+
+    def __init__(self, ids: List[Any], lookup):
+        self.ids = ids
+        self._lookup = lookup
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._lookup(pid) for pid in self.ids[index]]
+        return self._lookup(self.ids[index])
+
+    def __iter__(self):
+        return (self._lookup(pid) for pid in self.ids)
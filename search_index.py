@@ -0,0 +1,310 @@
+# search_index.py
+# In-memory search over the cached patient rows, so a search keystroke does
+# not scan every cell of every row.
+#
+# PatientIndex gives every indexed row a slot and keeps three structures over
+# the slots:
+#   - trigram postings: for each 3-character sequence, the slots of the rows
+#     whose searchable text contains it. A substring query is answered from
+#     the rows listed under its rarest trigrams, and each candidate is then
+#     checked against the actual text; queries shorter than 3 characters scan
+#     the searchable text only.
+#   - value bitmaps for the fixed-vocabulary columns (CATEGORY_OPTIONS): per
+#     column, value -> int with bit `slot` set for the rows holding it.
+#   - sorted (date, slot) arrays for the date columns, for range filters.
+# filter() evaluates a parsed query (see FilterTerm) as AND/OR/NOT over
+# bitmaps, so combined filters cost a few big-int operations.
+#
+# Rows are replaced (update) or dropped (remove) as the UI cache changes; the
+# index keeps only Patient IDs, not the rows, and answers with Patient IDs.
+# All structures are append-only: entries left behind by an edit or a delete
+# are masked out by the live-slot bitmap, and the index compacts itself once
+# such stale slots outnumber the live ones.
+import bisect
+from array import array
+from collections import defaultdict, namedtuple
+from typing import Iterable, List, Tuple, Any
+
+from constants import COLUMNS, CATEGORY_OPTIONS, DATE_COLUMNS
+
+SEARCH_COLUMNS = ['Patient Name', 'Diagnosis', 'Ward', 'Diet Prescriptions(Current)', 'Encoded By']
+# Patient ID is searchable too (as text), so typing an ID finds the patient
+_TEXT_INDEXES = [COLUMNS.index('Patient ID')] + [COLUMNS.index(c) for c in SEARCH_COLUMNS]
+_CATEGORY_INDEXES = {col: COLUMNS.index(col) for col in CATEGORY_OPTIONS}
+_DATE_INDEXES = {col: COLUMNS.index(col) for col in DATE_COLUMNS}
+# Past this many candidates from the rarest trigram, also intersect with the
+# next rarest before checking candidates one by one
+INTERSECT_MIN_CANDIDATES = 2048
+# Below this many new dates, insert into the sorted array instead of re-sorting
+_DATE_INSORT_MAX = 64
+
+# One condition of a parsed query; a row must satisfy every term.
+#   kind 'text':  values = (substring,), column unused
+#   kind 'value': column value equals (or starts with) any of values
+#   kind 'range': values = (lo, hi) 'YYYY-MM-DD' prefixes, either may be ''
+# Matching is case-insensitive; negate inverts the term.
+FilterTerm = namedtuple('FilterTerm', 'kind column values negate')
+
+# Bit positions set in each byte value, for turning a bitmap back into slots
+_BYTE_BITS = [tuple(b for b in range(8) if v >> b & 1) for v in range(256)]
+
+
+def _text_of(row) -> str:
+    # Separator keeps a match from spanning two columns
+    return '\x00'.join(str(row[i]).lower() for i in _TEXT_INDEXES if i < len(row) and row[i] is not None)
+
+
+def _value_of(row, idx: int) -> str:
+    v = row[idx] if idx < len(row) else None
+    return str(v).strip().lower() if v is not None else ''
+
+
+def date_key(value):
+    # 'YYYY-MM-DD' (zero-padded, time dropped) or None; offline rows may
+    # still hold the form's unpadded 'YYYY-M-D'
+    if value is None:
+        return None
+    s = str(value).strip().split('T')[0].split(' ')[0]
+    parts = s.split('-')
+    if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        return None
+    return f"{int(parts[0]):04d}-{int(parts[1]):02d}-{int(parts[2]):02d}"
+
+
+def _filter_keys(row):
+    # Everything a slot's bitmaps / date entries are built from
+    return (tuple(_value_of(row, idx) for idx in _CATEGORY_INDEXES.values()),
+            tuple(date_key(row[idx]) if idx < len(row) else None for idx in _DATE_INDEXES.values()))
+
+
+def _value_matches(value: str, wanted) -> bool:
+    # Exact or prefix match: 'male' is Male but not Female, 'caring' is every Caring ward
+    return any(value == w or value.startswith(w) for w in wanted)
+
+
+def _in_range(key, lo: str, hi: str) -> bool:
+    # lo/hi are date prefixes, so hi '2025-06' takes in all of June
+    return key is not None and (not lo or key >= lo) and (not hi or key <= hi + '~')
+
+
+def row_matches(row, terms: List[FilterTerm]) -> bool:
+    """Unindexed equivalent of PatientIndex.filter for one row."""
+    for term in terms:
+        if term.kind == 'text':
+            ok = term.values[0].lower() in _text_of(row)
+        elif term.kind == 'value':
+            ok = _value_matches(_value_of(row, COLUMNS.index(term.column)), [w.lower() for w in term.values])
+        else:
+            idx = COLUMNS.index(term.column)
+            ok = _in_range(date_key(row[idx]) if idx < len(row) else None, *term.values)
+        if ok == term.negate:
+            return False
+    return True
+
+
+def _new_posting():
+    return array('i')
+
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _bitmap(slots) -> int:
+    if not slots:
+        return 0
+    bits = bytearray((max(slots) >> 3) + 1)
+    for s in slots:
+        bits[s >> 3] |= 1 << (s & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _slots_of(bitmap: int) -> List[int]:
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, 'little')
+    slots = []
+    for i, byte in enumerate(data):
+        if byte:
+            base = i << 3
+            slots.extend(base + b for b in _BYTE_BITS[byte])
+    return slots
+
+
+class PatientIndex:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(_new_posting)
+        self._ids = []       # slot -> Patient ID (None once removed / replaced)
+        self._texts = []     # slot -> searchable text
+        self._sigs = array('q')  # slot -> hash of the slot's category values and dates
+        self._slot_of = {}   # Patient ID -> live slot
+        self._live = 0       # bitmap of live slots
+        self._stale = 0
+        # column -> lowercased value -> bitmap of slots
+        self._values = {col: {} for col in _CATEGORY_INDEXES}
+        # column -> [(date, slot)] sorted
+        self._dates = {col: [] for col in _DATE_INDEXES}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[Any, ...]]) -> 'PatientIndex':
+        index = cls()
+        index.update(rows)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def update(self, rows: Iterable[Tuple[Any, ...]]):
+        """Add rows, replacing any indexed row with the same Patient ID."""
+        postings = self._postings
+        added, dropped = [], []
+        new_values = defaultdict(list)
+        new_dates = defaultdict(list)
+        for row in rows:
+            pid = row[0]
+            text = _text_of(row)
+            keys = _filter_keys(row)
+            sig = hash(keys)
+            slot = self._slot_of.get(pid)
+            if slot is not None:
+                if self._texts[slot] == text and self._sigs[slot] == sig:
+                    continue  # only non-indexed columns changed
+                self._ids[slot] = None
+                self._texts[slot] = None
+                dropped.append(slot)
+            slot = len(self._ids)
+            self._ids.append(pid)
+            self._texts.append(text)
+            self._sigs.append(sig)
+            self._slot_of[pid] = slot
+            added.append(slot)
+            for tri in _trigrams(text):
+                postings[tri].append(slot)
+            values, dates = keys
+            for col, value in zip(_CATEGORY_INDEXES, values):
+                if value:
+                    new_values[col, value].append(slot)
+            for col, key in zip(_DATE_INDEXES, dates):
+                if key:
+                    new_dates[col].append((key, slot))
+        # Bitmaps are immutable ints: build each change once per batch
+        for (col, value), slots in new_values.items():
+            by_value = self._values[col]
+            by_value[value] = by_value.get(value, 0) | _bitmap(slots)
+        for col, pairs in new_dates.items():
+            entries = self._dates[col]
+            if len(pairs) > _DATE_INSORT_MAX:
+                entries.extend(pairs)
+                entries.sort()
+            else:
+                for pair in pairs:
+                    bisect.insort(entries, pair)
+        self._live |= _bitmap(added)
+        self._drop(dropped)
+        self._maybe_compact()
+
+    def remove(self, ids: Iterable[Any]):
+        slots = []
+        for pid in ids:
+            slot = self._slot_of.pop(pid, None)
+            if slot is not None:
+                self._ids[slot] = None
+                self._texts[slot] = None
+                slots.append(slot)
+        self._drop(slots)
+        self._maybe_compact()
+
+    def _drop(self, slots: List[int]):
+        if slots:
+            self._live &= ~_bitmap(slots)
+            self._stale += len(slots)
+
+    def _maybe_compact(self):
+        if self._stale <= max(1024, len(self._slot_of)):
+            return
+        # Renumber the live slots 0..n-1, in order, in every structure
+        new_slot = array('i', [-1]) * len(self._ids)
+        n = 0
+        for slot, pid in enumerate(self._ids):
+            if pid is not None:
+                new_slot[slot] = n
+                n += 1
+        keep = [slot for slot, pid in enumerate(self._ids) if pid is not None]
+        postings = defaultdict(_new_posting)
+        for tri, posting in self._postings.items():
+            moved = array('i', [new_slot[s] for s in posting if new_slot[s] >= 0])
+            if moved:
+                postings[tri] = moved
+        self._postings = postings
+        for by_value in self._values.values():
+            for value, bits in list(by_value.items()):
+                bits = _bitmap([new_slot[s] for s in _slots_of(bits & self._live)])
+                if bits:
+                    by_value[value] = bits
+                else:
+                    del by_value[value]
+        for col, entries in self._dates.items():
+            self._dates[col] = [(key, new_slot[s]) for key, s in entries if new_slot[s] >= 0]
+        self._ids = [self._ids[s] for s in keep]
+        self._texts = [self._texts[s] for s in keep]
+        self._sigs = array('q', [self._sigs[s] for s in keep])
+        self._slot_of = {pid: slot for slot, pid in enumerate(self._ids)}
+        self._live = (1 << n) - 1
+        self._stale = 0
+
+    def _ids_of(self, slots) -> List[Any]:
+        ids = [self._ids[s] for s in slots]
+        ids.sort()
+        return ids
+
+    def _text_slots(self, q: str) -> List[int]:
+        texts = self._texts
+        if len(q) < 3:
+            return [s for s in self._slot_of.values() if q in texts[s]]
+        postings = []
+        for tri in _trigrams(q):
+            posting = self._postings.get(tri)
+            if posting is None:
+                return []  # some trigram occurs nowhere
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0]
+        if len(candidates) > INTERSECT_MIN_CANDIDATES and len(postings) > 1:
+            candidates = set(candidates).intersection(postings[1])
+        else:
+            candidates = set(candidates)
+        return [s for s in candidates if texts[s] is not None and q in texts[s]]
+
+    def search(self, query: str) -> List[Any]:
+        """Sorted Patient IDs of rows whose searchable columns contain query (case-insensitive)."""
+        q = (query or '').strip().lower()
+        if not q:
+            return []
+        return self._ids_of(self._text_slots(q))
+
+    def _term_bitmap(self, term: FilterTerm) -> int:
+        if term.kind == 'text':
+            return _bitmap(self._text_slots(term.values[0].lower()))
+        if term.kind == 'value':
+            wanted = [w.lower() for w in term.values]
+            bitmap = 0
+            for value, bits in self._values[term.column].items():
+                if _value_matches(value, wanted):
+                    bitmap |= bits
+            return bitmap
+        lo, hi = term.values
+        entries = self._dates[term.column]
+        start = bisect.bisect_left(entries, (lo,)) if lo else 0
+        end = bisect.bisect_right(entries, (hi + '~',)) if hi else len(entries)
+        return _bitmap([slot for _key, slot in entries[start:end]])
+
+    def filter(self, terms: List[FilterTerm]) -> List[Any]:
+        """Sorted Patient IDs of the rows satisfying every term (see FilterTerm)."""
+        result = self._live
+        for term in terms:
+            if not result:
+                break
+            bits = self._term_bitmap(term)
+            result = result & ~bits if term.negate else result & bits
+        return self._ids_of(_slots_of(result))
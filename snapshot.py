@@ -0,0 +1,132 @@
+# snapshot.py
+# Compact binary copy of the patient cache, read at startup so the grid can
+# show the last synced rows before MySQL (or the SQLite store) is touched.
+#
+# Layout (native byte order, recorded in the metadata):
+#   header    MAGIC, metadata length, value count, row count, column count
+#   metadata  JSON: data version, revision, row count, max Last Updated, columns
+#   offsets   uint32 * (values + 1) into the value blob
+#   values    each distinct cell value once: a type byte + its text
+#   cells     uint32 * rows * columns: 0 for NULL, else 1 + value number
+# Repeated values (wards, statuses, dates) are stored once, and the offset
+# and cell arrays are read straight out of the mmap without copying.
+import json
+import mmap
+import os
+import struct
+import sys
+from decimal import Decimal
+from array import array
+from typing import Any, List, Optional, Tuple
+
+from constants import COLUMNS
+from diagnostics import traced, file_size
+
+MAGIC = b'DMSSNAP1'
+_HEADER = struct.Struct('<8sIIII')
+_LAST_UPDATED_IDX = COLUMNS.index('Last Updated')
+
+# Type byte -> decoder, and the type byte for each Python type stored
+_DECODERS = {b's'[0]: str, b'i'[0]: int, b'f'[0]: float, b'd'[0]: Decimal}
+_TYPE_CODES = {str: b's', int: b'i', float: b'f', Decimal: b'd'}
+
+
+def _pad4(n: int) -> int:
+    return (n + 3) & ~3
+
+
+@traced('snapshot_write', rows=lambda r, a: len(a[1]), size=lambda r, a: file_size(a[0]))
+def write(path: str, rows: List[Tuple[Any, ...]], version: Optional[str], revision: int):
+    """Replace path with a snapshot of rows (tuples in COLUMNS order)."""
+    codes = {}
+    blob = bytearray()
+    offsets = array('I', [0])
+    cells = array('I')
+    for row in rows:
+        for v in row:
+            if v is None:
+                cells.append(0)
+                continue
+            key = (type(v), v)
+            code = codes.get(key)
+            if code is None:
+                type_code = _TYPE_CODES.get(type(v))
+                if type_code is None:
+                    v, type_code = str(v), b's'  # e.g. a date that wasn't formatted
+                blob += type_code + str(v).encode('utf-8')
+                offsets.append(len(blob))
+                code = codes[key] = len(codes) + 1
+            cells.append(code)
+    meta = json.dumps({
+        'version': version,
+        'revision': revision,
+        'rows': len(rows),
+        'max_last_updated': max((str(r[_LAST_UPDATED_IDX] or '') for r in rows), default=''),
+        'columns': COLUMNS,
+        'byteorder': sys.byteorder,
+    }).encode('utf-8')
+    header = _HEADER.pack(MAGIC, len(meta), len(codes), len(rows), len(COLUMNS))
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(meta.ljust(_pad4(len(meta)), b' '))
+        f.write(offsets.tobytes())
+        f.write(bytes(blob).ljust(_pad4(len(blob)), b'\x00'))
+        f.write(cells.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_meta(path: str) -> Optional[dict]:
+    """The snapshot's metadata, or None if it is missing or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(_HEADER.size)
+            magic, meta_len, _values, _rows, _cols = _HEADER.unpack(head)
+            if magic != MAGIC:
+                return None
+            meta = json.loads(f.read(meta_len).decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+    if meta.get('columns') != COLUMNS or meta.get('byteorder') != sys.byteorder:
+        return None  # written by another schema version or machine type
+    return meta
+
+
+@traced('snapshot_read', rows=lambda r, a: len(r[0]) if r else 0, size=lambda r, a: file_size(a[0]))
+def read(path: str) -> Optional[Tuple[List[Tuple[Any, ...]], dict]]:
+    """(rows, metadata) from path, or None if it is missing or unreadable."""
+    meta = read_meta(path)
+    if meta is None:
+        return None
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            views = [view]
+            try:
+                _magic, meta_len, nvalues, nrows, ncols = _HEADER.unpack_from(view)
+                pos = _HEADER.size + _pad4(meta_len)
+                offsets = view[pos:pos + 4 * (nvalues + 1)].cast('I')
+                views.append(offsets)
+                pos += 4 * (nvalues + 1)
+                blob = view[pos:pos + offsets[-1]]
+                views.append(blob)
+                pos += _pad4(offsets[-1])
+                if len(view) < pos + 4 * nrows * ncols:
+                    return None  # truncated: the slices below would come back short, not fail
+                cells = view[pos:pos + 4 * nrows * ncols].cast('I')
+                views.append(cells)
+                values = [None]
+                for i in range(nvalues):
+                    with blob[offsets[i]:offsets[i + 1]] as item:
+                        values.append(_DECODERS[item[0]](str(item[1:], 'utf-8')))
+                lookup = values.__getitem__
+                rows = [tuple(map(lookup, cells[i:i + ncols])) for i in range(0, nrows * ncols, ncols)]
+            finally:
+                # The mmap can't close while views of it exist
+                for v in reversed(views):
+                    v.release()
+    except (OSError, ValueError, KeyError, IndexError, TypeError, struct.error):
+        return None
+    return rows, meta
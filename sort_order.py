@@ -0,0 +1,169 @@
+# sort_order.py
+# Column sorting for the patient grid without re-sorting the cache on every
+# heading click or search keystroke.
+#
+# SortCache keeps, per column that has been sorted on, the permutation of
+# all cached rows as a sorted list of (key, Patient ID). Keys are typed:
+# numbers compare as numbers, dates as dates, Age Group in its option order,
+# and blank cells sort last. A filtered view (a list of Patient IDs) is
+# ordered from that permutation (by walking it, or by sorting on integer
+# ranks for small views). Row changes move only the affected entries; a large change drops
+# the permutations, which are rebuilt on the next sort.
+import bisect
+from typing import Callable, Iterable, List, Tuple, Any
+
+from constants import COLUMNS, NUMERIC_COLUMNS, DATE_COLUMNS, AGE_GROUP_OPTIONS
+from search_index import date_key
+
+# Stored as text but numeric in meaning
+_NUMERIC_TEXT_COLUMNS = ['WFL Z-Score', 'BMI Percentile']
+# Past this many changed rows (or 1/16 of the cache) rebuild instead of patching
+INCREMENTAL_MAX_CHANGES = 256
+# Views larger than 1/WALK_FRACTION of the cache are ordered by walking the permutation
+WALK_FRACTION = 8
+
+_BLANK = (1,)  # sorts after every (0, value) key
+
+
+def _number_key(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return _BLANK
+    return (0, number) if number == number else _BLANK  # NaN is blank
+
+
+def _date_sort_key(value):
+    key = date_key(value)
+    return (0, key) if key else _BLANK
+
+
+def _age_group_key(value):
+    # Known groups in option order, then any other text alphabetically
+    if value in AGE_GROUP_OPTIONS:
+        return (0, AGE_GROUP_OPTIONS.index(value), '')
+    text = str(value).strip().lower() if value is not None else ''
+    return (0, len(AGE_GROUP_OPTIONS), text) if text else _BLANK
+
+
+def _text_key(value):
+    text = str(value).strip().lower() if value is not None else ''
+    return (0, text) if text else _BLANK
+
+
+def _key_function(column: str):
+    if column in NUMERIC_COLUMNS or column in _NUMERIC_TEXT_COLUMNS:
+        return _number_key
+    if column in DATE_COLUMNS:
+        return _date_sort_key
+    if column == 'Age Group':
+        return _age_group_key
+    return _text_key
+
+
+class _Order:
+    def __init__(self, column: str, rows):
+        self.idx = COLUMNS.index(column)
+        self.key = _key_function(column)
+        self.key_of = {}
+        for row in rows:
+            self.key_of[row[0]] = self.key(row[self.idx])
+        self.entries = sorted((k, pid) for pid, k in self.key_of.items())
+        # descending -> Patient IDs in display order / their ranks
+        self._ordered = {}
+        self._ranks = {}
+
+    def ordered(self, descending: bool) -> List[Any]:
+        ids = self._ordered.get(descending)
+        if ids is None:
+            entries = self.entries
+            if not descending:
+                ids = [pid for _k, pid in entries]
+            else:
+                # Non-blank keys from the largest down, each run of equal keys
+                # still by Patient ID ascending; blanks stay last
+                ids = []
+                end = self.blank_start()
+                while end > 0:
+                    start = bisect.bisect_left(entries, (entries[end - 1][0],), 0, end)
+                    ids.extend(pid for _k, pid in entries[start:end])
+                    end = start
+                ids.extend(pid for _k, pid in entries[self.blank_start():])
+            self._ordered[descending] = ids
+        return ids
+
+    def ranks(self, descending: bool):
+        rank = self._ranks.get(descending)
+        if rank is None:
+            rank = self._ranks[descending] = {pid: i for i, pid in enumerate(self.ordered(descending))}
+        return rank
+
+    def _changed(self):
+        self._ordered = {}
+        self._ranks = {}
+
+    def blank_start(self) -> int:
+        return bisect.bisect_left(self.entries, (_BLANK,))
+
+    def discard(self, pid):
+        old = self.key_of.pop(pid, None)
+        if old is not None:
+            i = bisect.bisect_left(self.entries, (old, pid))
+            del self.entries[i]
+            self._changed()
+
+    def put(self, row):
+        key = self.key(row[self.idx])
+        if self.key_of.get(row[0]) == key:
+            return
+        self.discard(row[0])
+        self.key_of[row[0]] = key
+        bisect.insort(self.entries, (key, row[0]))
+        self._changed()
+
+
+class SortCache:
+    def __init__(self, source: Callable[[], Iterable[Tuple[Any, ...]]]):
+        # source() gives every cached row; read when a permutation is built
+        self._source = source
+        self._orders = {}
+
+    def reset(self):
+        self._orders = {}
+
+    def update(self, changed, deleted_ids):
+        """Patch the cached permutations for changed rows and deleted Patient IDs."""
+        if not self._orders:
+            return
+        changed = list(changed)
+        deleted_ids = list(deleted_ids)
+        size = max(len(o.entries) for o in self._orders.values())
+        if len(changed) + len(deleted_ids) > max(INCREMENTAL_MAX_CHANGES, size // 16):
+            self.reset()
+            return
+        for order in self._orders.values():
+            for pid in deleted_ids:
+                order.discard(pid)
+            for row in changed:
+                order.put(row)
+
+    def _order(self, column: str) -> _Order:
+        order = self._orders.get(column)
+        if order is None:
+            order = self._orders[column] = _Order(column, self._source())
+        return order
+
+    def sort(self, ids: List[Any], column: str, descending: bool = False) -> List[Any]:
+        """Patient IDs ordered by column (blanks last either way), ties by Patient ID ascending."""
+        order = self._order(column)
+        if len(ids) * WALK_FRACTION >= len(order.entries):
+            wanted = set(ids)
+            out = [pid for pid in order.ordered(descending) if pid in wanted]
+            if len(out) < len(wanted):
+                # IDs the cache doesn't know (shouldn't happen) go last
+                known = order.key_of
+                out.extend(pid for pid in ids if pid not in known)
+            return out
+        rank = order.ranks(descending)
+        missing = len(order.entries)
+        return sorted(ids, key=lambda pid: rank.get(pid, missing))
@@ -0,0 +1,39 @@
+# conftest.py
+# The app is a flat set of modules in the repository root; make them
+# importable from the tests.
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import COLUMNS  # noqa: E402
+
+
+def _make_rows(ids, pools, seed=1, default=None):
+    """Random rows in COLUMNS order.
+
+    ids is a row count (Patient IDs 1..n) or the Patient IDs to use. Each
+    column in pools (column -> values) gets a random pick from its values;
+    the others get default, or default(rnd) if it is callable. seed is a
+    number, or a random.Random to keep drawing from.
+    """
+    rnd = seed if isinstance(seed, random.Random) else random.Random(seed)
+    if isinstance(ids, int):
+        ids = range(1, ids + 1)
+    picks = [(COLUMNS.index(col), list(values)) for col, values in pools.items()]
+    rows = []
+    for pid in ids:
+        row = [default(rnd) if callable(default) else default for _ in COLUMNS]
+        row[0] = pid
+        for idx, values in picks:
+            row[idx] = rnd.choice(values)
+        rows.append(tuple(row))
+    return rows
+
+
+@pytest.fixture
+def make_rows():
+    return _make_rows
@@ -0,0 +1,132 @@
+# test_local_store.py
+from decimal import Decimal
+
+import pytest
+
+import db_utils
+from constants import COLUMNS
+from local_store import LocalStore
+
+HEIGHT = COLUMNS.index('Height')
+WEIGHT = COLUMNS.index('Weight')
+
+
+def _row(pid, height=Decimal('101.50'), weight=Decimal('15.25')):
+    row = [f'v{i}' for i in range(len(COLUMNS))]
+    row[0] = pid
+    row[COLUMNS.index('Age')] = 4
+    row[HEIGHT] = height
+    row[WEIGHT] = weight
+    row[COLUMNS.index('Last Updated')] = '2025-07-01 10:00:00'
+    return tuple(row)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = LocalStore(str(tmp_path / 'local.db'))
+    yield s
+    s.close()
+
+
+def test_full_load_round_trips_decimals(store, monkeypatch):
+    rows = [_row(1), _row(2, height=None), _row(3, weight=Decimal('0.00'))]
+    monkeypatch.setattr(db_utils, 'load_patients_since', lambda version: (list(rows), [], 'v1'))
+    loaded, deleted, version = store.load_patients_since(None)
+    assert (loaded, deleted, version) == (rows, [], 'v1')
+    cached, cached_version = store.snapshot()
+    assert sorted(cached) == rows
+    assert cached_version == 'v1'
+    assert type(cached[0][HEIGHT]) is Decimal
+
+
+def test_queued_edit_keeps_decimals(store, monkeypatch):
+    monkeypatch.setattr(db_utils, 'load_patients_since', lambda version: ([_row(1)], [], 'v1'))
+    store.load_patients_since(None)
+    store._mark_offline()
+    assert store.update_patient_fields(1, {'Weight': Decimal('16.75')}, '2025-07-01 10:00:00') == ''
+    assert store.pending_count() == 1
+    # A second edit to the same patient is merged into the queued one
+    store.update_patient_fields(1, {'Height': Decimal('102.00')}, '2025-07-01 10:00:00')
+    assert store.pending_count() == 1
+    # The cached count the UI reads follows every transaction
+    assert store.pending == 1
+    store._mark_online()
+    monkeypatch.setattr(db_utils, 'load_patients_since', lambda version: ([_row(1)], [], 'v2'))
+    loaded, _deleted, _version = store.load_patients_since('v1')
+    assert loaded[0][WEIGHT] == Decimal('16.75')
+    assert loaded[0][HEIGHT] == Decimal('102.00')
+
+
+def test_offline_add_round_trips_decimals(store):
+    store._mark_offline()
+    item = list(_row(None))
+    row = store.add_patient(item)
+    assert row[0] < 0
+    cached, _version = store.snapshot()
+    assert cached == [row]
+    assert cached[0][HEIGHT] == Decimal('101.50')
+
+
+def test_full_load_overlays_queue_and_writes_only_changes(store, monkeypatch):
+    server = [_row(1), _row(2), _row(3)]
+    monkeypatch.setattr(db_utils, 'load_patients_since', lambda version: (list(server), [], 'v1'))
+    store.load_patients_since(None)
+    store._mark_offline()
+    store.update_patient_fields(1, {'Weight': Decimal('16.75')}, '2025-07-01 10:00:00')
+    store.delete_patient(2)
+    store._mark_online()
+    revision = store._revision
+    loaded, deleted, _version = store.load_patients_since(None)
+    # Queued edits win over the server rows; nothing changed on disk
+    assert [r[0] for r in loaded] == [1, 3]
+    assert loaded[0][WEIGHT] == Decimal('16.75')
+    assert deleted == [2]
+    assert store._revision == revision
+    # Rows the server no longer has are dropped from the snapshot
+    server = [_row(3), _row(4)]
+    store.load_patients_since(None)
+    cached, _version = store.snapshot()
+    assert sorted(r[0] for r in cached) == [3, 4]
+
+
+def test_rejected_writes_can_be_requeued_or_discarded(store, monkeypatch):
+    monkeypatch.setattr(db_utils, 'load_patients_since', lambda version: ([_row(1), _row(2)], [], 'v1'))
+    store.load_patients_since(None)
+    store._mark_offline()
+    store.update_patient_fields(1, {'Weight': Decimal('16.75')}, '2025-07-01 10:00:00')
+    store.add_patient(list(_row(None)))
+    store.delete_patient(2)
+    store._mark_online()
+
+    def reject(*_args):
+        raise db_utils.ConflictError('changed on another PC')
+
+    for name in ('update_patient_fields', 'add_patient', 'delete_patient'):
+        monkeypatch.setattr(db_utils, name, reject)
+    result = store.replay()
+    assert result['remaining'] == 0
+    assert len(result['conflicts']) == 3
+    conflicts = store.list_conflicts()
+    assert [c['op'] for c in conflicts] == ['update', 'add', 'delete']
+    assert conflicts[0]['payload'] == {'Weight': Decimal('16.75')}
+    assert conflicts[1]['payload'][HEIGHT] == Decimal('101.50')
+    assert store.conflicts == 3
+
+    # An update goes back unconditionally; an add gets a new temporary ID
+    store.requeue_conflict(conflicts[0]['id'])
+    row = store.requeue_conflict(conflicts[1]['id'])
+    assert row[0] < 0 and row[HEIGHT] == Decimal('101.50')
+    assert store.discard_conflict(conflicts[2]['id'])
+    assert not store.discard_conflict(conflicts[2]['id'])
+    with pytest.raises(db_utils.DatabaseError):
+        store.requeue_conflict(conflicts[0]['id'])
+    assert store.list_conflicts() == []
+    assert (store.pending, store.conflicts) == (2, 0)
+
+    sent = []
+    monkeypatch.setattr(db_utils, 'update_patients_bulk', lambda ids, changes: sent.append((ids, changes)) or 's2')
+    monkeypatch.setattr(db_utils, 'add_patient', lambda item: sent.append(item[HEIGHT]) or _row(3))
+    result = store.replay()
+    assert result['replayed'] == 2
+    assert sent == [([1], {'Weight': Decimal('16.75')}), Decimal('101.50')]
+    assert result['id_map'] == {row[0]: _row(3)}
@@ -0,0 +1,72 @@
+# test_metrics.py
+import pytest
+
+import metrics
+from constants import AGE_GROUP_OPTIONS, COLUMNS, NUTRITIONAL_STATUS_OPTIONS
+from records import month_of
+
+pytest.importorskip('numpy')
+
+
+POOLS = {
+    'Date of Visit': [f'2025-{month:02d}-15' for month in range(1, 13)],
+    'Age Group': AGE_GROUP_OPTIONS + ['', 'unknown'],
+    'Sex': ['Male', 'female', ' FEMALE ', '', None],
+    'Nutritional Status': NUTRITIONAL_STATUS_OPTIONS + ['', None, 'sam '],
+    'Type Of Visit': ['Routine', '', None],
+    'Purpose of Visit': ['Monitoring', None],
+    'RND Dietary Management': ['Maintain Current Feeding', ''],
+    'With Documents': ['Yes', 'yes', 'No', None],
+    'Given NCP': ['Yes', 'No', ''],
+}
+_FIELD_INDEXES = [COLUMNS.index(f) for f in metrics.SUMMARY_FIELDS]
+
+
+def _summary_rows(rows):
+    # summarize() input: each row's month, half-year and the whole, then its values
+    result = []
+    for row in rows:
+        month = month_of(row[COLUMNS.index('Date of Visit')])
+        periods = (month, 'H1' if month <= 6 else 'H2', 'All')
+        result.append((periods,) + tuple(row[i] for i in _FIELD_INDEXES))
+    return result
+
+
+def _brute_force(rows):
+    cube = {}
+    for row in rows:
+        hit = metrics.classify(*row[1:])
+        if hit is None:
+            continue
+        ag, sx, keys = hit
+        for period in row[0]:
+            entry = cube.setdefault(period, metrics.empty_cube_entry())
+            for key in keys:
+                entry[key][ag][sx] += 1
+    return cube
+
+
+@pytest.mark.parametrize('n', [0, 1, 50, 5000])
+def test_summarize_matches_brute_force(n, make_rows):
+    rows = _summary_rows(make_rows(n, POOLS))
+    assert metrics.summarize(rows) == _brute_force(rows)
+
+
+def test_uncounted_periods_are_left_out():
+    rows = [((1, 'All'), AGE_GROUP_OPTIONS[0], 'Male', 'Normal', '', '', '', '', ''),
+            ((2, 'All'), 'unknown', 'Male', 'Normal', '', '', '', '', '')]
+    cube = metrics.summarize(rows)
+    assert set(cube) == {1, 'All'}
+    assert metrics.totals(cube['All']['admitted']) == (1, 0, 1)
+    assert metrics.totals(cube['All']['nar']) == (0, 0, 0)
+
+
+def test_classify_rules():
+    ag, sx, keys = metrics.classify(AGE_GROUP_OPTIONS[2], ' Female', 'SAM', 'Routine', 'Monitoring',
+                                    'Provision of Modulars', 'YES', 'no')
+    assert (ag, sx) == (2, 1)
+    assert keys == ('admitted', 'nar', 'sam', 'screening', 'assessment', 'intervention', 'documentation')
+    # Blank status counts as at risk; Normal does not
+    assert 'nar' in metrics.classify(AGE_GROUP_OPTIONS[0], 'Male', '', '', '', '', '', '')[2]
+    assert 'nar' not in metrics.classify(AGE_GROUP_OPTIONS[0], 'Male', 'normal', '', '', '', '', '')[2]
+    assert metrics.classify('', 'Male', 'Normal', '', '', '', '', '') is None
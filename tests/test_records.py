@@ -0,0 +1,56 @@
+# test_records.py
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from constants import COLUMNS, DATE_COLUMNS, DATETIME_COLUMNS
+from records import FIELDS, PatientRecord, display_row, month_of, to_date
+
+
+def test_fields_follow_columns():
+    assert len(FIELDS) == len(COLUMNS) == len(set(FIELDS))
+    assert FIELDS[COLUMNS.index('Diet Prescriptions(Current)')] == 'diet_prescriptions_current'
+    assert FIELDS[COLUMNS.index('Date of Visit')] == 'date_of_visit'
+
+
+def test_display_row_formats_only_date_columns():
+    values = []
+    for col in COLUMNS:
+        if col in DATE_COLUMNS:
+            values.append(date(2025, 6, 3))
+        elif col in DATETIME_COLUMNS:
+            values.append(datetime(2025, 6, 3, 8, 5, 9, 123456))
+        else:
+            values.append(Decimal('55.20'))
+    record = PatientRecord(*values)
+    row = display_row(record)
+    assert isinstance(row, tuple)
+    for col, v in zip(COLUMNS, row):
+        if col in DATE_COLUMNS:
+            assert v == '2025-06-03'
+        elif col in DATETIME_COLUMNS:
+            assert v == '2025-06-03 08:05:09'
+        else:
+            assert v == Decimal('55.20')
+    blank = display_row([None] * len(COLUMNS))
+    assert all(v == '' if c in DATE_COLUMNS or c in DATETIME_COLUMNS else v is None
+               for c, v in zip(COLUMNS, blank))
+
+
+@pytest.mark.parametrize('value, expected', [
+    (date(2025, 6, 3), date(2025, 6, 3)),
+    (datetime(2025, 6, 3, 23, 59), date(2025, 6, 3)),
+    ('2025-06-03', date(2025, 6, 3)),
+    ('2025-6-3', date(2025, 6, 3)),
+    (' 2025-06-03 08:00:00', date(2025, 6, 3)),
+    ('2025-06-03T08:00:00', date(2025, 6, 3)),
+    ('2025-02-30', None),
+    ('2025/06/03', None),
+    ('June 3', None),
+    ('', None),
+    (None, None),
+])
+def test_to_date(value, expected):
+    assert to_date(value) == expected
+    assert month_of(value) == (expected.month if expected else 0)
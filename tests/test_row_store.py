@@ -0,0 +1,80 @@
+# test_row_store.py
+import random
+from decimal import Decimal
+
+from constants import CATEGORY_OPTIONS
+from row_store import RowStore, RowView
+
+
+POOLS = {col: list(options) + ['', None, 'Typed in'] for col, options in CATEGORY_OPTIONS.items()}
+POOLS.update({col: ['2025-06-03', '2024-12-31', '', None, '2025-6-3']
+              for col in ('Ward Admission Date', 'Date of Visit', 'Encoded Date')})
+POOLS.update({
+    'Last Updated': ['2025-07-01 10:00:00', '', None, 'soon'],
+    'Age': [4, 70, None, '4'],
+    'Height': [Decimal('101.50'), None, Decimal('7'), 101.5],
+    'Weight': [Decimal('15.25'), Decimal('0.00'), None],
+})
+
+
+def _text(rnd):
+    return f'text {rnd.randrange(50)}'
+
+
+def test_rows_read_back_exactly(make_rows):
+    rows = make_rows(3000, POOLS, default=_text)
+    store = RowStore(rows)
+    assert len(store) == len(rows)
+    assert list(store) == rows
+    assert store[17] == rows[17]
+    assert store[-1] == rows[-1]
+    assert store[10:20] == rows[10:20]
+    assert [type(v) for v in store[5]] == [type(v) for v in rows[5]]
+    assert list(store.ids) == [r[0] for r in rows]
+    assert store.get(42) == rows[41]
+    assert store.get(10 ** 6) is None
+
+
+def test_append_set_and_copy_match_a_list(make_rows):
+    rows = make_rows(500, POOLS, default=_text)
+    store = RowStore(rows[:400])
+    expected = list(rows[:400])
+    for row in rows[400:]:
+        store.append(row)
+        expected.append(row)
+    replaced = make_rows(500, POOLS, seed=2, default=_text)
+    for pos in (0, 123, 499):
+        store[pos] = replaced[pos]
+        expected[pos] = replaced[pos]
+    copy = store.copy()
+    store[1] = replaced[1]
+    assert list(copy) == expected
+    expected[1] = replaced[1]
+    assert list(store) == expected
+
+
+def test_remove_ids_and_sort_by_id_match_a_list(make_rows):
+    rows = make_rows(2000, POOLS, default=_text)
+    rnd = random.Random(3)
+    store = RowStore(rows)
+    gone = set(rnd.sample(range(1, 2001), 700)) | {10 ** 6}
+    store.remove_ids(gone)
+    expected = [r for r in rows if r[0] not in gone]
+    assert list(store) == expected
+    assert all(store.position(r[0]) == i for i, r in enumerate(expected))
+    shuffled = list(expected)
+    rnd.shuffle(shuffled)
+    store = RowStore(shuffled)
+    store.sort_by_id()
+    assert list(store) == expected
+    assert store.position(expected[5][0]) == 5
+
+
+def test_row_view_looks_rows_up_by_id(make_rows):
+    rows = make_rows(50, POOLS, default=_text)
+    store = RowStore(rows)
+    view = RowView([5, 2, 40], store.get)
+    assert len(view) == 3
+    assert view[1] == rows[1]
+    assert list(view) == [rows[4], rows[1], rows[39]]
+    assert view[:2] == [rows[4], rows[1]]
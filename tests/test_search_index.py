@@ -0,0 +1,83 @@
+# test_search_index.py
+import random
+
+import pytest
+
+from search_index import FilterTerm, PatientIndex, _text_of, row_matches
+
+POOLS = {
+    'Patient Name': ['Ana Cruz', 'ana reyes', 'Ben', 'Bea Santos', 'Cy', None],
+    'Diagnosis': ['Pneumonia', 'pneumonitis', 'AGE', 'Dengue', '', None],
+    'Ward': ['ICU', 'NICU', 'Caring 1', 'Caring 2', 'caring 3 ', None],
+    'Sex': ['Male', 'Female', 'female', None],
+    'Date of Visit': ['2025-06-03', '2025-6-30', '2025-07-01', '2024-12-31 08:00:00', '', None],
+}
+
+
+def _by_id(rows):
+    return {r[0]: r for r in rows}
+
+
+def _search(rows, query):
+    # Brute force: substring of the searchable text
+    q = query.strip().lower()
+    return sorted(r[0] for r in rows.values() if q and q in _text_of(r))
+
+
+def _filter(rows, terms):
+    return sorted(r[0] for r in rows.values() if row_matches(r, terms))
+
+
+TERMS = [
+    [FilterTerm('value', 'Sex', ('male',), False)],
+    [FilterTerm('value', 'Sex', ('Female',), True)],
+    [FilterTerm('value', 'Ward', ('caring',), False), FilterTerm('value', 'Ward', ('caring 3',), True)],
+    [FilterTerm('value', 'Ward', ('icu', 'nicu'), False)],
+    [FilterTerm('range', 'Date of Visit', ('2025-06', '2025-06'), False)],
+    [FilterTerm('range', 'Date of Visit', ('', '2025-06-03'), False)],
+    [FilterTerm('range', 'Date of Visit', ('2025', ''), True)],
+    [FilterTerm('text', None, ('ana',), False), FilterTerm('value', 'Sex', ('female',), False)],
+    [FilterTerm('text', None, ('pneumon',), True), FilterTerm('range', 'Date of Visit', ('2025-07', ''), False)],
+]
+
+QUERIES = ['an', 'ana', 'ANA ', 'pneumon', 'caring', 'ring 3', 'icu', 'a', '1', '12', 'zzz', '']
+
+
+def test_search_matches_scan(make_rows):
+    rows = _by_id(make_rows(500, POOLS, seed=1))
+    index = PatientIndex.from_rows(rows.values())
+    for q in QUERIES:
+        assert index.search(q) == _search(rows, q)
+
+
+def test_filter_matches_row_matches(make_rows):
+    rows = _by_id(make_rows(500, POOLS, seed=3))
+    index = PatientIndex.from_rows(rows.values())
+    for terms in TERMS:
+        expected = _filter(rows, terms)
+        assert expected  # every case selects something
+        assert index.filter(terms) == expected
+    assert index.filter([]) == sorted(rows)
+
+
+@pytest.mark.parametrize('rounds', [3, 40])  # 40 rounds goes through compaction
+def test_search_after_updates_and_removes(rounds, make_rows):
+    rnd = random.Random(2)
+    rows = _by_id(make_rows(300, POOLS, rnd))
+    index = PatientIndex.from_rows(rows.values())
+    next_id = 301
+    for _ in range(rounds):
+        changed = make_rows(rnd.sample(sorted(rows), 60), POOLS, rnd)
+        changed += make_rows(range(next_id, next_id + 10), POOLS, rnd)
+        next_id += 10
+        rows.update((r[0], r) for r in changed)
+        index.update(changed)
+        gone = rnd.sample(sorted(rows), 15)
+        for pid in gone:
+            del rows[pid]
+        index.remove(gone + [10 ** 6])  # unknown IDs are ignored
+        assert len(index) == len(rows)
+        for q in QUERIES:
+            assert index.search(q) == _search(rows, q)
+        for terms in TERMS:
+            assert index.filter(terms) == _filter(rows, terms)
@@ -0,0 +1,51 @@
+# test_snapshot.py
+from decimal import Decimal
+
+import snapshot
+from constants import COLUMNS
+
+
+VALUES = [None, '', 'ICU', 'Ana Cruz', 'ñandú ✓', 0, 7, -3, 10 ** 12, 1.5,
+          Decimal('160.50'), Decimal('0.0'), '2025-06-03', '2025-06-03 08:15:00', '1']
+POOLS = {col: VALUES for col in COLUMNS[1:]}
+
+
+def test_round_trip(tmp_path, make_rows):
+    path = str(tmp_path / 'cache.snap')
+    rows = make_rows(300, POOLS)
+    snapshot.write(path, rows, 'v42', 7)
+    got, meta = snapshot.read(path)
+    assert got == rows
+    # Same values and the same types: '1' stays text, Decimal keeps its scale
+    for a, b in zip(got, rows):
+        assert [type(v) for v in a] == [type(v) for v in b]
+        assert [str(v) for v in a] == [str(v) for v in b]
+    assert meta['version'] == 'v42'
+    assert meta['revision'] == 7
+    assert meta['rows'] == 300
+    assert snapshot.read_meta(path) == meta
+
+
+def test_empty_and_overwrite(tmp_path, make_rows):
+    path = str(tmp_path / 'cache.snap')
+    snapshot.write(path, [], None, 0)
+    assert snapshot.read(path)[0] == []
+    rows = make_rows(5, POOLS, seed=2)
+    snapshot.write(path, rows, 'v1', 1)
+    assert snapshot.read(path)[0] == rows
+
+
+def test_unreadable_files(tmp_path, make_rows):
+    missing = str(tmp_path / 'missing.snap')
+    assert snapshot.read(missing) is None
+    assert snapshot.read_meta(missing) is None
+    junk = tmp_path / 'junk.snap'
+    junk.write_bytes(b'not a snapshot')
+    assert snapshot.read(str(junk)) is None
+    path = str(tmp_path / 'cache.snap')
+    snapshot.write(path, make_rows(50, POOLS), 'v1', 1)
+    size = len(open(path, 'rb').read())
+    with open(path, 'r+b') as f:
+        f.truncate(size - 100)  # cells cut short, metadata intact
+    assert snapshot.read_meta(path) is not None
+    assert snapshot.read(path) is None
@@ -0,0 +1,89 @@
+# test_sort_order.py
+import random
+
+import pytest
+
+from constants import COLUMNS, AGE_GROUP_OPTIONS
+from sort_order import SortCache
+
+
+POOLS = {
+    'Patient Name': ['Ana', 'ana ', 'Ben', '', None, 'Cy'],
+    'Age': [1, 4, 4, 12, None],
+    'Age Group': AGE_GROUP_OPTIONS[:3] + ['', 'other'],
+    'Date of Visit': ['2025-06-03', '2025-6-3', '2024-01-09', '', None],
+    'WFL Z-Score': ['-1.5', '0', 'n/a', '', None],
+}
+
+
+def _reference(rows, ids, column, descending):
+    # Brute force: non-blank keys in the requested direction, ties by
+    # Patient ID ascending, then blanks by Patient ID
+    idx = COLUMNS.index(column)
+    by_id = {r[0]: r for r in rows}
+
+    def value(pid):
+        v = by_id[pid][idx]
+        if column in ('Age', 'WFL Z-Score'):
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                return None
+        if column == 'Date of Visit':
+            if not v:
+                return None
+            y, m, d = (int(p) for p in v.split('-'))
+            return (y, m, d)
+        if column == 'Age Group':
+            if v in AGE_GROUP_OPTIONS:
+                return (AGE_GROUP_OPTIONS.index(v), '')
+            return (len(AGE_GROUP_OPTIONS), v.strip().lower()) if v and v.strip() else None
+        text = str(v).strip().lower() if v is not None else ''
+        return text or None
+
+    # reverse=True keeps equal keys in input (Patient ID) order
+    filled = sorted(pid for pid in ids if value(pid) is not None)
+    filled.sort(key=value, reverse=descending)
+    blanks = sorted(pid for pid in ids if value(pid) is None)
+    return filled + blanks
+
+
+@pytest.mark.parametrize('column', ['Patient Name', 'Age', 'Age Group', 'Date of Visit', 'WFL Z-Score'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_matches_reference(column, descending, make_rows):
+    rows = make_rows(400, POOLS)
+    cache = SortCache(lambda: rows)
+    all_ids = [r[0] for r in rows]
+    small = random.Random(2).sample(all_ids, 20)  # ranked path
+    large = all_ids[::2]                          # walk path
+    for ids in (all_ids, small, large):
+        assert cache.sort(ids, column, descending) == _reference(rows, ids, column, descending)
+
+
+def test_descending_keeps_ties_by_patient_id(make_rows):
+    rows = make_rows(50, POOLS)
+    cache = SortCache(lambda: rows)
+    out = cache.sort([r[0] for r in rows], 'Age', descending=True)
+    age = COLUMNS.index('Age')
+    fours = [pid for pid in out if rows[pid - 1][age] == 4]
+    assert fours == sorted(fours)
+
+
+def test_update_patches_the_permutations(make_rows):
+    rows = make_rows(300, POOLS)
+    current = {r[0]: r for r in rows}
+    cache = SortCache(lambda: list(current.values()))
+    cache.sort([1], 'Patient Name')
+    cache.sort([1], 'Age', descending=True)
+    changed = [r[:1] + ('Zed',) + r[2:] for r in make_rows(30, POOLS, seed=5)]
+    deleted = [100, 101, 102]
+    for r in changed:
+        current[r[0]] = r
+    for pid in deleted:
+        del current[pid]
+    cache.update(changed, deleted)
+    rows_now = list(current.values())
+    ids = [r[0] for r in rows_now]
+    for column in ('Patient Name', 'Age'):
+        for descending in (False, True):
+            assert cache.sort(ids, column, descending) == _reference(rows_now, ids, column, descending)
@@ -4,14 +4,102 @@ from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import json
 import os
+import re
+import shlex
 import sys
-import platform
+from itertools import chain
 from constants import *
-from extractor import open_extractor_window
-from db_utils import DatabaseError
-from excel_utils import ExcelFileOpenError
+from db_utils import ConflictError, DatabaseError, DatabaseUnavailableError, init_db, search_patients
+from db_worker import DbWorker
+from grid_view import PatientGrid
+from search_index import FilterTerm, PatientIndex, row_matches
+from sort_order import SortCache
+from row_store import RowStore, RowView
+import diagnostics
+from helpers import user_config_dir
+from local_store import LocalStore
 from typing import Optional
 
+# How often queued offline writes are retried / the server is probed
+REPLAY_INTERVAL_MS = 15000
+# Most archived visits fetched per search (the archive is never loaded whole)
+ARCHIVE_SEARCH_LIMIT = 200
+
+# Search box fields (field:value), besides each filterable column's own name
+# with spaces dropped (e.g. subspecialty:, dateofvisit:)
+FILTER_FIELDS = {
+    'ward': 'Ward',
+    'status': 'Nutritional Status',
+    'sex': 'Sex',
+    'age': 'Age Group',
+    'sub': 'Subspecialty',
+    'type': 'Type Of Visit',
+    'purpose': 'Purpose of Visit',
+    'support': 'With Nutrition Support',
+    'bm': 'Bowel Movement',
+    'distention': 'Abdominal Distention',
+    'labs': 'Biochemical Parameters',
+    'rnd': 'RND Dietary Management',
+    'docs': 'With Documents',
+    'ncp': 'Given NCP',
+    'by': 'Encoded By',
+    'visit': 'Date of Visit',
+    'admit': 'Ward Admission Date',
+    'encoded': 'Encoded Date',
+}
+for _col in list(CATEGORY_OPTIONS) + DATE_COLUMNS:
+    FILTER_FIELDS.setdefault(re.sub(r'[^a-z0-9]', '', _col.lower()), _col)
+_DATE_PREFIX = re.compile(r'^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$')
+
+
+def _date_prefix(text: str):
+    # '2025', '2025-3', '2025-03-01' -> zero-padded prefix; '' stays open
+    if not text:
+        return ''
+    m = _DATE_PREFIX.match(text)
+    if not m:
+        return None
+    return '-'.join(part if i == 0 else part.zfill(2) for i, part in enumerate(m.groups()) if part)
+
+
+def parse_filter(query: str):
+    """Search box text -> list of FilterTerm, all of which must hold.
+
+    Words match the searchable text columns; field:value matches a column
+    (see FILTER_FIELDS) by value or value prefix, with a,b for either;
+    date fields take a range such as visit:2025-03..2025-06 (either end may
+    be left open). A leading - negates a term; quote values with spaces.
+    """
+    try:
+        tokens = shlex.split(query)
+    except ValueError:
+        # Unbalanced quote (still typing, or a name like O'Brien)
+        tokens = query.split()
+    terms = []
+    for token in tokens:
+        negate = token.startswith('-') and len(token) > 1
+        if negate:
+            token = token[1:]
+        field, sep, value = token.partition(':')
+        column = FILTER_FIELDS.get(field.lower()) if sep else None
+        if column is None:
+            if len(token) >= 2:
+                terms.append(FilterTerm('text', None, (token.lower(),), negate))
+            continue
+        value = value.strip()
+        if not value:
+            continue  # still typing
+        if column in DATE_COLUMNS:
+            lo, _, hi = value.partition('..') if '..' in value else (value, '', value)
+            lo, hi = _date_prefix(lo.strip()), _date_prefix(hi.strip())
+            if lo is not None and hi is not None and (lo or hi):
+                terms.append(FilterTerm('range', column, (lo, hi), negate))
+        else:
+            values = tuple(v.strip().lower() for v in value.split(',') if v.strip())
+            if values:
+                terms.append(FilterTerm('value', column, values, negate))
+    return terms
+
 class InventoryApp:
     def __init__(self, root):
         self.root = root
@@ -19,8 +107,30 @@ class InventoryApp:
         # Search state
         self.search_var = StringVar()
         self.search_after_id = None  # for debounced search
-        # Cached data for table to avoid loading Excel on every keystroke
-        self.all_rows = []
+        # Cached data for table to avoid loading Excel on every keystroke,
+        # stored column-wise (see row_store.py); rows are built when shown
+        self.all_rows = RowStore()
+        # The server version the cache is at
+        self.data_version = None
+        # Archived (older) visits matching the current search, fetched with
+        # search_patients() while "Include archive" is on; they are read-only
+        self.archive_rows = RowStore()
+        self._archive_ids = set()
+        self._archive_query = None
+        # Search index over the cached rows (text, category values, dates). It is
+        # (re)built on a worker after a full load; changes made meanwhile are
+        # kept in _index_backlog and applied to the new index when it's ready.
+        self.search_index = None
+        self._index_backlog = None
+        self._index_generation = 0
+        # Heading-click sort (None = Patient ID order); permutations are
+        # cached per column and patched alongside the search index
+        self.sort_column = None
+        self.sort_descending = False
+        self.sort_cache = SortCache(lambda: chain(self.all_rows, self.archive_rows))
+        # (Patient ID, Last Updated, form values) captured when a row is
+        # selected; update_item sends only fields that differ from it
+        self._edit_base = None
         # Settings (store in user-writable config dir)
         self.settings_dir = self._get_user_config_dir('Dietary_Management_System')
         try:
@@ -28,15 +138,23 @@ class InventoryApp:
         except Exception:
             pass
         self.settings_path = os.path.join(self.settings_dir, 'settings.json')
+        # Slow / failed database operations are logged next to the settings
+        diagnostics.configure(self.settings_dir)
         self.settings = self.load_settings()
         # Apply saved theme early if running under ttkbootstrap Window
         try:
             self._apply_theme(self.settings.get('theme'))
         except Exception:
             pass
+        # Database calls run on worker threads; results come back via root.after
+        self.db = DbWorker(root, on_busy_change=self._on_busy_change, on_error=self._on_db_error)
+        # Local snapshot + queue of offline writes; all patient reads and
+        # writes go through it so the app keeps working when MySQL is down
+        self.store = LocalStore(os.path.join(self.settings_dir, 'offline_store.sqlite3'))
         self.create_widgets()
-        self.load_data()
-        self.refresh_table()
+        self._load_snapshot()
+        self._replay_after_id = self.root.after(REPLAY_INTERVAL_MS, self._replay_tick)
+        self.root.protocol('WM_DELETE_WINDOW', self._on_close)
         # Auto-backup scheduling
         self._auto_backup_after_id: Optional[str] = None
         if self.settings.get('auto_backup_enabled', False):
@@ -223,8 +341,10 @@ class InventoryApp:
         btn_frame.pack(pady=5)
         self.add_button = ttk.Button(btn_frame, text='Add Patient', command=self.add_item)
         self.add_button.grid(row=0, column=0, padx=3)
-        ttk.Button(btn_frame, text='Update Patient', command=self.update_item).grid(row=0, column=1, padx=3)
-        ttk.Button(btn_frame, text='Delete Patient', command=self.delete_item).grid(row=0, column=2, padx=3)
+        self.update_button = ttk.Button(btn_frame, text='Update Patient', command=self.update_item)
+        self.update_button.grid(row=0, column=1, padx=3)
+        self.delete_button = ttk.Button(btn_frame, text='Delete Patient', command=self.delete_item)
+        self.delete_button.grid(row=0, column=2, padx=3)
         ttk.Button(btn_frame, text='Open Extractor', command=self.open_extractor).grid(row=0, column=3, padx=3)
         ttk.Button(btn_frame, text='Export to Excel', command=self.export_excel).grid(row=0, column=4, padx=3)
 
@@ -250,13 +370,28 @@ class InventoryApp:
         # Settings button (theme selector, etc.)
         ttk.Button(btn_frame, text='Settings', command=self.open_settings).grid(row=0, column=11, padx=(6, 3))
 
+        # Busy indicator for background database work
+        status_frame = ttk.Frame(self.content)
+        status_frame.pack(padx=10, fill=X)
+        self.status_var = StringVar(value='')
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side=LEFT)
+        self.busy_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=120)
+
         # Search bar (filters table)
         search_frame = ttk.Frame(self.content)
         search_frame.pack(padx=10, pady=(6, 0), fill=X)
         ttk.Label(search_frame, text='Search:').pack(side=LEFT)
-        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
         self.search_entry.pack(side=LEFT, padx=(6, 6))
         ttk.Button(search_frame, text='Clear', command=self.clear_search).pack(side=LEFT)
+        # Older visits live in the archive table; searched on the server on request
+        self.include_archive_var = BooleanVar(value=False)
+        ttk.Checkbutton(
+            search_frame,
+            text='Include archive',
+            variable=self.include_archive_var,
+            command=self.on_include_archive_toggle,
+        ).pack(side=LEFT, padx=(12, 0))
         # Live filtering
         self.search_entry.bind('<KeyRelease>', self.on_search)
 
@@ -269,15 +404,17 @@ class InventoryApp:
         style.configure('Treeview', rowheight=28)  # Increased row height
         style.configure('Treeview.Heading', font=('Segoe UI', 10, 'bold'))
         
-        # Create treeview with horizontal scrollbar
-        self.tree = ttk.Treeview(
-            table_frame, 
-            columns=COLUMNS, 
-            show='headings', 
+        # Patient grid (virtualized for large result sets) with scrollbars
+        self.grid_view = PatientGrid(
+            table_frame,
+            COLUMNS,
+            on_select=self.on_row_select,
+            on_sort=self.on_sort_column,
             style='Treeview',
-            selectmode='browse',
+            selectmode='extended',  # Ctrl/Shift-click for bulk update/delete
             height=20  # Show 20 rows by default
         )
+        self.tree = self.grid_view.tree
         
         # Configure column widths based on content
         col_widths = {
@@ -301,28 +438,22 @@ class InventoryApp:
             self.tree.heading(col, text=col, anchor=W)
             self.tree.column(col, width=width, minwidth=80, stretch=NO, anchor=W)
         
-        # Bind selection event to input population
-        self.tree.bind('<<TreeviewSelect>>', self.on_row_select)
-
-        # Scrollbars for the table
-        vscrollbar = ttk.Scrollbar(table_frame, orient=VERTICAL, command=self.tree.yview)
-        hscrollbar = ttk.Scrollbar(table_frame, orient=HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vscrollbar.set, xscrollcommand=hscrollbar.set)
-        
-        # Grid layout with proper expansion
-        self.tree.grid(row=0, column=0, sticky='nsew')
-        vscrollbar.grid(row=0, column=1, sticky='ns')
-        hscrollbar.grid(row=1, column=0, sticky='ew')
-        
         # Configure grid weights for proper resizing
         table_frame.grid_rowconfigure(0, weight=1)
         table_frame.grid_columnconfigure(0, weight=1)
 
     def on_row_select(self, event):
-        selected = self.tree.focus()
-        if not selected:
+        if len(self.grid_view.selected_ids()) > 1:
+            # Bulk mode: start from an empty form; only the fields filled in
+            # are applied to every selected patient by Update
+            self.clear_fields()
+            if hasattr(self, 'add_button'):
+                self.add_button['state'] = 'disabled'
+            return
+        row = self.grid_view.focused_row()
+        if row is None:
             return
-        values = self.tree.item(selected, 'values')
+        values = ['' if v is None else str(v) for v in row]
         if values:
             for idx, col in enumerate(COLUMNS):
                 if col in ['Patient ID', 'Last Updated']:
@@ -353,6 +484,10 @@ class InventoryApp:
                 else:
                     widget.delete(0, END)
                     widget.insert(0, value)
+            # Remember what was loaded so update can send only changed fields
+            last_updated_idx = COLUMNS.index('Last Updated')
+            last_updated = values[last_updated_idx] if last_updated_idx < len(values) else ''
+            self._edit_base = (int(values[0]), last_updated, self._read_form())
             # Disable Add button when a row is selected
             if hasattr(self, 'add_button'):
                 self.add_button['state'] = 'disabled'
@@ -360,48 +495,32 @@ class InventoryApp:
 
     def add_item(self):
         # Compose item in the order of COLUMNS
-        from db_utils import add_patient, load_patients
-        # Auto-increment Patient ID
-        patients = load_patients()
-        existing_ids = [row[0] for row in patients if isinstance(row[0], int) or (isinstance(row[0], str) and str(row[0]).isdigit())]
-        next_id = max([int(i) for i in existing_ids], default=0) + 1 if existing_ids else 1
-        item = []
-        for col in COLUMNS:
-            if col == 'Patient ID':
-                item.append(next_id)
-            elif col == 'Last Updated':
-                item.append(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            elif col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
-                year_cb, month_cb, day_cb = self.entries[col]
-                y = year_cb.get()
-                m = month_cb.get()
-                d = day_cb.get()
-                val = f"{y}-{m}-{d}" if y and m and d else ''
-                item.append(val)
-            else:
-                w = self.entries[col]
-                if isinstance(w, Text):
-                    val = w.get('1.0', 'end-1c')
-                else:
-                    val = w.get()
-                item.append(val)
+        form = self._read_form()
+        # Patient ID is assigned by the database; Last Updated by the server
+        item = [form.get(col, '') if col not in ('Patient ID', 'Last Updated') else None for col in COLUMNS]
         if not all(item[1:6]):
             messagebox.showerror('Error', 'All fields except Patient ID and Last Updated are required.')
             return
-        try:
-            add_patient(item)
-        except DatabaseError as e:
-            messagebox.showerror('Database Error', str(e))
-            return
+        self.db.submit(self.store.add_patient, item, write=True, on_success=self._on_item_added, busy_text='Saving patient...')
+
+    def _on_item_added(self, row):
         # Optionally regenerate summary tables
         if getattr(self, 'auto_summary_var', None) and self.auto_summary_var.get():
             # Placeholder: when exporting from DB, summary will be generated on export
             pass
-        # Reload cache once after data changes, then refresh view
-        self.load_data()
-        self.refresh_table()
+        # Write-through: add the stored row to the cache and grid directly
+        self._apply_delta([row], [])
+        self.refresh_table()  # let the active filter decide if it shows
         self.clear_fields()  # Clear fields after adding
-        messagebox.showinfo('Success', f'Patient added successfully. Assigned Patient ID: {next_id}')
+        self._update_status()
+        if row[0] < 0:
+            messagebox.showinfo(
+                'Saved Offline',
+                'The database server is not reachable. The patient was saved on this PC '
+                'and will be sent when the connection is back; a Patient ID is assigned then.'
+            )
+        else:
+            messagebox.showinfo('Success', f'Patient added successfully. Assigned Patient ID: {row[0]}')
 
     def clear_fields(self):
         for col in COLUMNS:
@@ -419,95 +538,516 @@ class InventoryApp:
                 widget.delete('1.0', END)
             else:
                 widget.delete(0, END)
+        self._edit_base = None
         # Re-enable Add button when fields are cleared
         if hasattr(self, 'add_button'):
             self.add_button['state'] = 'normal'
 
+    def _selected_ids(self):
+        return [int(pid) for pid in self.grid_view.selected_ids()]
+
+    def _any_archived(self, ids):
+        if any(pid in self._archive_ids for pid in ids):
+            messagebox.showinfo('Archived Visit', 'Archived visits are read-only.')
+            return True
+        return False
+
+    def _read_form(self):
+        # Current form values by column (Patient ID / Last Updated are auto)
+        data = {}
+        for col in COLUMNS:
+            if col in ['Patient ID', 'Last Updated']:
+                continue
+            if col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
+                year_cb, month_cb, day_cb = self.entries[col]
+                y = year_cb.get()
+                m = month_cb.get()
+                d = day_cb.get()
+                data[col] = f"{y}-{m}-{d}" if y and m and d else ''
+            else:
+                w = self.entries[col]
+                if isinstance(w, Text):
+                    data[col] = w.get('1.0', 'end-1c')
+                else:
+                    data[col] = w.get()
+        return data
+
     def delete_item(self):
-        from db_utils import delete_patient
-        selected = self.tree.focus()
-        if not selected:
-            messagebox.showerror('Error', 'Please select a patient to delete.')
+        ids = self._selected_ids()
+        if self._any_archived(ids):
             return
-        values = self.tree.item(selected, 'values')
-        if not values:
-            messagebox.showerror('Error', 'No patient selected.')
+        if len(ids) > 1:
+            self.delete_items_bulk(ids)
             return
-        item_id = values[0]
-        try:
-            delete_patient(item_id)
-        except DatabaseError as e:
-            messagebox.showerror('Database Error', str(e))
+        if not ids:
+            messagebox.showerror('Error', 'Please select a patient to delete.')
             return
-        self.load_data()
+        item_id = ids[0]
+        self.db.submit(
+            self.store.delete_patient, item_id, write=True,
+            on_success=lambda _result: self._on_items_deleted([item_id]),
+            busy_text='Deleting patient...',
+        )
+
+    def delete_items_bulk(self, ids):
+        if not messagebox.askyesno('Delete Patients', f'Delete {len(ids)} selected patients?\nThis cannot be undone.'):
+            return
+        self.db.submit(
+            self.store.delete_patients_bulk, ids, write=True,
+            on_success=lambda _deleted: self._on_items_deleted(ids),
+            busy_text=f'Deleting {len(ids)} patients...',
+        )
+
+    def _on_items_deleted(self, ids):
+        # Patch the cache once for the whole batch
+        self._apply_delta([], ids)
         self.refresh_table()
         self.clear_fields()
-        self.tree.selection_remove(self.tree.selection())
-        messagebox.showinfo('Success', 'Patient deleted successfully.')
+        self.grid_view.clear_selection()
+        self._update_status()
+        if len(ids) > 1:
+            messagebox.showinfo('Success', f'{len(ids)} patients deleted successfully.')
+        else:
+            messagebox.showinfo('Success', 'Patient deleted successfully.')
+
+    def update_items_bulk(self, ids):
+        changes = {col: v for col, v in self._read_form().items() if str(v).strip() != ''}
+        if not changes:
+            messagebox.showerror('Error', 'Fill in the fields to change for the selected patients.')
+            return
+        summary = '\n'.join(f'- {col}: {v}' for col, v in changes.items())
+        if not messagebox.askyesno('Update Patients', f'Apply to {len(ids)} selected patients?\n\n{summary}'):
+            return
+        self.db.submit(
+            self.store.update_patients_bulk, ids, changes, write=True,
+            on_success=lambda stamp: self._on_items_updated(ids, changes, stamp),
+            busy_text=f'Updating {len(ids)} patients...',
+        )
 
     def update_item(self):
-        from db_utils import update_patient
-        selected = self.tree.focus()
-        if not selected:
+        ids = self._selected_ids()
+        if self._any_archived(ids):
+            return
+        if len(ids) > 1:
+            self.update_items_bulk(ids)
+            return
+        if not ids or self._edit_base is None:
             messagebox.showerror('Error', 'Please select a patient to update.')
             return
-        values = self.tree.item(selected, 'values')
-        if not values:
-            messagebox.showerror('Error', 'No patient selected.')
+        item_id, expected_last_updated, original = self._edit_base
+        form = self._read_form()
+        changes = {col: v for col, v in form.items() if v != original.get(col)}
+        if not changes:
+            messagebox.showinfo('No Changes', 'Nothing was changed for this patient.')
             return
-        item_id = values[0]
-        updated_item = []
-        for col in COLUMNS:
-            if col == 'Patient ID':
-                updated_item.append(item_id)
-            elif col == 'Last Updated':
-                updated_item.append(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            elif col in ['Ward Admission Date', 'Date of Visit', 'Encoded Date']:
-                year_cb, month_cb, day_cb = self.entries[col]
-                y = year_cb.get()
-                m = month_cb.get()
-                d = day_cb.get()
-                updated_item.append(f"{y}-{m}-{d}" if y and m and d else '')
-            else:
-                w = self.entries[col]
-                if isinstance(w, Text):
-                    updated_item.append(w.get('1.0', 'end-1c'))
-                else:
-                    updated_item.append(w.get())
-        try:
-            update_patient(item_id, updated_item)
-        except DatabaseError as e:
-            messagebox.showerror('Database Error', str(e))
+        self.db.submit(
+            self.store.update_patient_fields, item_id, changes, expected_last_updated, write=True,
+            on_success=lambda stamp: self._on_items_updated([item_id], changes, stamp),
+            on_error=self._on_update_error,
+            busy_text='Saving changes...',
+        )
+
+    def _on_update_error(self, error):
+        if not isinstance(error, ConflictError):
+            self._on_db_error(error)
             return
+        # Someone else saved first; show their version instead of overwriting it
+        messagebox.showwarning(
+            'Update Conflict',
+            f'{error}\n\nYour changes were not saved. The latest data will be reloaded; '
+            'please re-apply your edits.'
+        )
+        self.clear_fields()
+        self.sync_data()
+
+    def _on_items_updated(self, ids, changes, stamp):
         # Summary tables are now handled by export functionality
-        self.load_data()
+        # Patch the cache once for the whole batch
+        patched = []
+        last_updated_idx = COLUMNS.index('Last Updated')
+        for pid in ids:
+            pos = self.all_rows.position(pid)
+            if pos is None:
+                continue
+            row = list(self.all_rows[pos])
+            for col, v in changes.items():
+                row[COLUMNS.index(col)] = v
+            row[last_updated_idx] = stamp
+            patched.append(tuple(row))
+        self._apply_delta(patched, [])
         self.refresh_table()
         self.clear_fields()  # Clear fields after update
+        self._update_status()
+        if len(ids) > 1:
+            messagebox.showinfo('Success', f'{len(ids)} patients updated successfully.')
 
-    def load_data(self):
-        # Load patients from Excel once; other operations use this cache
-        from db_utils import load_patients
+    def _load_snapshot(self):
+        # Show what was saved locally at the last sync as soon as it's read,
+        # then check the schema and catch up with the server in the background
+        self.db.submit(
+            self._read_snapshot, self.store,
+            on_success=self._on_snapshot_read,
+            on_error=lambda _e: self._on_snapshot_read((RowStore(), None)),
+            busy_text='Loading saved patients...',
+        )
+
+    @staticmethod
+    def _read_snapshot(store):
+        rows, version = store.snapshot()
+        return RowStore(rows), version
+
+    def _on_snapshot_read(self, result):
+        rows, version = result
+        resume = bool(len(rows) and version)
+        if resume:
+            self.all_rows, self.data_version = rows, version
+            self._rebuild_search_index()
+            self.refresh_table()
+        self.db.submit(
+            init_db, write=True,
+            on_success=lambda _r: self._after_init_db(resume),
+            on_error=lambda e: self._after_init_db(resume, e),
+            busy_text='Connecting to database...',
+        )
+
+    def _after_init_db(self, resume, error=None):
+        # An unreachable server is handled by the load below (offline mode)
+        if error is not None and not isinstance(error, DatabaseUnavailableError):
+            self.status_var.set(f'Database setup failed: {error}')
+        if resume:
+            self.sync_data()
+        else:
+            self.load_data()
+
+    def _save_snapshot_file(self, force=False):
+        self.db.submit(
+            self.store.save_snapshot_file, force,
+            on_error=lambda _e: None,  # only a startup shortcut; SQLite has the data
+            busy_text='Saving local copy...',
+        )
+
+    def _on_close(self):
+        # Leave an up-to-date snapshot file for the next start
+        for after_id in (self._replay_after_id, self._auto_backup_after_id):
+            if after_id is not None:
+                try:
+                    self.root.after_cancel(after_id)
+                except Exception:
+                    pass
+        self.db.shutdown()
         try:
-            self.all_rows = load_patients()
+            self.store.save_snapshot_file(force=True)
         except Exception:
-            self.all_rows = []
+            pass
+        self.root.destroy()
+
+    def load_data(self):
+        # Full load of all patients in the background; other operations use this cache
+        self.db.submit(
+            self._load_all, self.store,
+            on_success=self._on_data_loaded,
+            on_error=self._on_load_error,
+            busy_text='Loading patients...',
+        )
+
+    @staticmethod
+    def _load_all(store):
+        rows, deleted, version = store.load_patients_since(None)
+        return RowStore(rows), deleted, version
+
+    def _on_data_loaded(self, result):
+        self.all_rows, _deleted, self.data_version = result
+        self._rebuild_search_index()
+        self.refresh_table()
+        self._save_snapshot_file(force=True)
+
+    def _on_load_error(self, error):
+        # Keep whatever is cached; the next refresh (or replay tick) retries
+        if isinstance(error, DatabaseUnavailableError):
+            self._update_status()
+        else:
+            self.status_var.set(f'Could not load patients: {error}')
+
+    def sync_data(self):
+        # Fetch only rows changed (and tombstones) since the last sync and
+        # patch the cache in place; the grid refreshes if anything changed
+        if self.data_version is None:
+            self.load_data()
+            return
+        self.db.submit(
+            self.store.load_patients_since, self.data_version,
+            on_success=self._on_delta_loaded,
+            on_error=self._on_load_error,
+            busy_text='Refreshing...',
+        )
+
+    def _on_delta_loaded(self, result):
+        changed, deleted, version = result
+        if self.data_version is not None and version < self.data_version:
+            return  # an older sync finished late; a newer one already applied
+        self.data_version = version
+        if self._apply_delta(changed, deleted):
+            self.refresh_table()
+        self._update_status()
+
+    # --- Offline queue replay ---
+    def _replay_tick(self):
+        # Send queued offline writes once the server is back; while the queue
+        # is empty and we're offline, a sync doubles as the reconnect probe
+        self._replay_after_id = self.root.after(REPLAY_INTERVAL_MS, self._replay_tick)
+        if self.db.busy:
+            return
+        # Cached counts: the store's lock may be held by a load on the worker
+        if self.store.pending:
+            self.db.submit(
+                self.store.replay, write=True,
+                on_success=self._on_replayed,
+                on_error=lambda _e: self._update_status(),
+                busy_text='Sending offline changes...',
+            )
+        elif self.store.offline or self.data_version is None:
+            self.sync_data()
+        else:
+            self._maybe_archive_old_visits()
+            self._save_snapshot_file()
+
+    def _on_replayed(self, result):
+        # Temporary IDs of offline-added rows are replaced by the real rows
+        temp_ids = list(result['id_map'])
+        stored = [row for row in result['id_map'].values() if row is not None]
+        if temp_ids or stored:
+            self._apply_delta(stored, temp_ids)
+            self.refresh_table()
+        if result['reload']:
+            self.data_version = None
+        if result['replayed'] or result['reload']:
+            self.sync_data()
+        self._update_status()
+        if result['conflicts']:
+            shown = '\n'.join(f'- {c}' for c in result['conflicts'][:10])
+            more = len(result['conflicts']) - 10
+            if more > 0:
+                shown += f'\n... and {more} more'
+            messagebox.showwarning(
+                'Offline Changes Not Saved',
+                'Some changes made while offline were rejected by the server '
+                f'because the same patients were changed or deleted on another PC:\n\n{shown}\n\n'
+                'The latest data has been reloaded. The rejected changes are kept under '
+                'Settings > Offline Conflicts, where each can be sent again or discarded.'
+            )
+
+    def _update_status(self):
+        # Idle status line: offline / pending-queue state
+        if self.db.busy:
+            return
+        pending = self.store.pending
+        if self.store.offline:
+            text = 'Offline - showing data saved on this PC'
+            if pending:
+                text += f'; {pending} change(s) waiting to be sent'
+        elif pending:
+            text = f'{pending} change(s) waiting to be sent'
+        else:
+            text = ''
+        self.status_var.set(text)
+
+    def _row_by_id(self, pid):
+        row = self.all_rows.get(pid)
+        return row if row is not None else self.archive_rows.get(pid)
+
+    def _apply_delta(self, changed, deleted_ids) -> bool:
+        # Deletes first; a changed row with the same ID is the live version
+        changed_ids = {row[0] for row in changed}
+        gone = {pid for pid in deleted_ids
+                if self.all_rows.position(pid) is not None and pid not in changed_ids}
+        if gone:
+            self.all_rows.remove_ids(gone)
+        dirty = bool(gone)
+        needs_sort = False
+        applied = []
+        last_updated_idx = COLUMNS.index('Last Updated')
+        for row in changed:
+            pos = self.all_rows.position(row[0])
+            if pos is None:
+                if len(self.all_rows) and self.all_rows.ids[-1] > row[0]:
+                    needs_sort = True
+                self.all_rows.append(row)
+                applied.append(row)
+                dirty = True
+                continue
+            cached = self.all_rows[pos]
+            if cached != row:
+                # Don't let a sync that read before our own write roll it back
+                new_stamp, cached_stamp = row[last_updated_idx], cached[last_updated_idx]
+                if new_stamp and cached_stamp and new_stamp < cached_stamp:
+                    continue
+                self.all_rows[pos] = row
+                applied.append(row)
+                dirty = True
+        if needs_sort:
+            # Keep Patient ID order, as returned by a full load
+            self.all_rows.sort_by_id()
+        if dirty:
+            self._index_apply(applied, gone)
+        return dirty
+
+    # --- Search index ---
+    def _rebuild_search_index(self):
+        self._index_generation += 1
+        generation = self._index_generation
+        # The old index may hold rows the full load dropped; scan until ready
+        self.search_index = None
+        self.sort_cache.reset()
+        self._index_backlog = []
+        # Copies, so the worker doesn't read the stores while they change
+        self.db.submit(
+            PatientIndex.from_rows, chain(self.all_rows.copy(), self.archive_rows.copy()),
+            on_success=lambda index: self._on_index_built(generation, index),
+            on_error=lambda _e: None,  # keep searching by scanning
+            busy_text='Indexing for search...',
+        )
+
+    def _on_index_built(self, generation, index):
+        if generation != self._index_generation:
+            return  # superseded by a newer full load
+        for changed, deleted_ids in self._index_backlog:
+            index.remove(deleted_ids)
+            index.update(changed)
+        self._index_backlog = None
+        self.search_index = index
+
+    def _index_apply(self, changed, deleted_ids):
+        self.sort_cache.update(changed, deleted_ids)
+        if self._index_backlog is not None:
+            self._index_backlog.append((list(changed), list(deleted_ids)))
+        if self.search_index is not None:
+            self.search_index.remove(deleted_ids)
+            self.search_index.update(changed)
 
     def refresh_table(self):
-        # Use cached rows to avoid expensive I/O during typing
-        all_rows = getattr(self, 'all_rows', [])
-        # Apply text filter across all columns if provided
-        query = (self.search_var.get() if hasattr(self, 'search_var') else '').strip().lower()
-        if query and len(query) >= 2:
-            def matches(row):
-                return any((str(cell).lower().find(query) != -1) for cell in row)
-            rows = [r for r in all_rows if matches(r)]
+        # Use cached rows to avoid expensive I/O during typing. Filtering and
+        # sorting work on Patient IDs; the grid builds only the rows it shows.
+        # Filter if a query was typed (see parse_filter)
+        terms = parse_filter(self.search_var.get() if hasattr(self, 'search_var') else '')
+        if terms:
+            if self.search_index is not None:
+                ids = self.search_index.filter(terms)
+            else:
+                # Index still being built: scan
+                ids = [r[0] for r in chain(self.all_rows, self.archive_rows) if row_matches(r, terms)]
+        elif not len(self.archive_rows) and self.sort_column is None:
+            self._render_rows(self.all_rows)
+            return
+        else:
+            ids = list(chain(self.all_rows.ids, self.archive_rows.ids))
+        if self.sort_column is not None:
+            ids = self.sort_cache.sort(ids, self.sort_column, self.sort_descending)
+        self._render_rows(RowView(ids, self._row_by_id))
+
+    def on_sort_column(self, column):
+        # First click sorts ascending, the next descending, the third restores
+        # Patient ID order
+        if column != self.sort_column:
+            self.sort_column, self.sort_descending = column, False
+        elif not self.sort_descending:
+            self.sort_descending = True
         else:
-            rows = all_rows
-        # Rebuild table
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        for row in rows:
-            self.tree.insert('', END, values=row)
+            self.sort_column, self.sort_descending = None, False
+        self.grid_view.show_sort(self.sort_column, self.sort_descending)
+        self.refresh_table()
+
+    def on_include_archive_toggle(self):
+        self._archive_query = None
+        self.search_archive()
+
+    def search_archive(self):
+        # The archive is searched on the server (FULLTEXT index) by the
+        # query's words; field filters then apply to the rows fetched
+        if not self.include_archive_var.get():
+            self._set_archive_rows([])
+            return
+        words = [t.values[0] for t in parse_filter(self.search_var.get()) if t.kind == 'text' and not t.negate]
+        query = ' '.join(words)
+        if query == self._archive_query:
+            return
+        self._archive_query = query
+        if not query:
+            self._set_archive_rows([])
+            self.status_var.set('Type a name, diagnosis or ID to search the archive.')
+            return
+        self.db.submit(
+            search_patients, query, ARCHIVE_SEARCH_LIMIT, archive=True,
+            on_success=lambda rows: self._on_archive_loaded(query, rows),
+            on_error=self._on_archive_error,
+            busy_text='Searching archive...',
+        )
+
+    def _on_archive_loaded(self, query, rows):
+        if not self.include_archive_var.get() or query != self._archive_query:
+            return  # unticked or superseded while searching
+        self._set_archive_rows(rows)
+        if len(rows) >= ARCHIVE_SEARCH_LIMIT:
+            self.status_var.set(f'Showing the first {ARCHIVE_SEARCH_LIMIT} archived matches; refine the search.')
+
+    def _set_archive_rows(self, rows):
+        if not rows and not self._archive_ids:
+            return  # nothing shown from the archive, nothing to change
+        self.archive_rows = RowStore(rows)
+        gone = self._archive_ids.difference(self.archive_rows.ids)
+        self._archive_ids = set(self.archive_rows.ids)
+        self._index_apply(rows, gone)
+        self.refresh_table()
+
+    def _on_archive_error(self, error):
+        self.include_archive_var.set(False)
+        self._archive_query = None
+        self._set_archive_rows([])
+        self._on_db_error(error)
+
+    def _maybe_archive_old_visits(self):
+        # Only with "Archive old visits daily" ticked in Settings (off by
+        # default): once a day, offer to move visits older than the previous
+        # year to the archive (a no-op on PCs where another one already did)
+        if not self.settings.get('auto_archive_enabled', False):
+            return
+        today = datetime.now().strftime('%Y-%m-%d')
+        if self.settings.get('last_archive_run') == today or self.store.offline:
+            return
+        self.settings['last_archive_run'] = today
+        self.save_settings()
+        self.archive_old_visits()
+
+    def archive_old_visits(self, parent=None):
+        # Moving clinical records is always confirmed first
+        from db_utils import archive_cutoff, archive_patients
+        cutoff = archive_cutoff().isoformat()
+        if not messagebox.askyesno(
+            'Archive Old Visits',
+            f'Move visits dated before {cutoff} to the archive?\n\n'
+            'They can still be searched with "Include archive" ticked, but become read-only.',
+            parent=parent or self.root,
+        ):
+            return
+        self.db.submit(
+            archive_patients, write=True,
+            on_success=self._on_archived,
+            on_error=lambda e: self.status_var.set(f'Archiving old visits failed: {e}'),
+            busy_text='Archiving old visits...',
+        )
+
+    def on_auto_archive_toggle(self):
+        self.settings['auto_archive_enabled'] = bool(self.auto_archive_var.get())
+        self.save_settings()
+
+    def _on_archived(self, moved):
+        if not moved:
+            return
+        # Tombstones drop the moved rows from the cache on sync
+        self.sync_data()
+        self.on_include_archive_toggle()
+
+    def _render_rows(self, rows):
+        self.grid_view.set_rows(rows)
 
     def on_search(self, event=None):
         # Debounce: wait a short moment after typing stops
@@ -516,16 +1056,51 @@ class InventoryApp:
                 self.root.after_cancel(self.search_after_id)
             except Exception:
                 pass
-        self.search_after_id = self.root.after(250, self.refresh_table)
+        self.search_after_id = self.root.after(250, self._on_search_settled)
+
+    def _on_search_settled(self):
+        self.search_after_id = None
+        self.refresh_table()
+        self.search_archive()
 
     def clear_search(self):
         self.search_var.set('')
         self.refresh_table()
+        self.search_archive()
 
     def refresh_now(self):
-        # Reload data from source and refresh the table view
-        self.load_data()
-        self.refresh_table()
+        # Pull changes from the server; the table view refreshes when they arrive
+        self.sync_data()
+
+    # --- Background work feedback ---
+    def _on_busy_change(self, busy, text):
+        try:
+            if busy:
+                self.status_var.set(text)
+                if not self.busy_bar.winfo_ismapped():
+                    self.busy_bar.pack(side=LEFT, padx=(8, 0))
+                    self.busy_bar.start(12)
+                self.root.configure(cursor='watch')
+            else:
+                self.busy_bar.stop()
+                self.busy_bar.pack_forget()
+                self.root.configure(cursor='')
+            # Writes are serialized; don't let the user queue duplicates
+            state = 'disabled' if self.db.writing else 'normal'
+            self.update_button['state'] = state
+            self.delete_button['state'] = state
+            if self._edit_base is None and len(self.grid_view.selected_ids()) <= 1:
+                self.add_button['state'] = state
+            if not busy:
+                self._update_status()
+        except Exception:
+            pass
+
+    def _on_db_error(self, error):
+        if isinstance(error, DatabaseError):
+            messagebox.showerror('Database Error', str(error))
+        else:
+            messagebox.showerror('Error', f'Unexpected error:\n{error}')
 
     # --- Settings persistence ---
     def load_settings(self):
@@ -628,10 +1203,163 @@ class InventoryApp:
         theme_cb = ttk.Combobox(top, values=themes, textvariable=self.theme_var, state='readonly', width=18)
         theme_cb.grid(row=0, column=1, sticky='w', **pad)
 
+        # Archiving moves records between tables, so it is opt-in and confirmed
+        self.auto_archive_var = BooleanVar(value=bool(self.settings.get('auto_archive_enabled', False)))
+        ttk.Checkbutton(
+            top, text='Offer to archive old visits daily',
+            variable=self.auto_archive_var, command=self.on_auto_archive_toggle,
+        ).grid(row=1, column=0, sticky='w', **pad)
+        ttk.Button(top, text='Archive Now...', command=lambda: self.archive_old_visits(top)).grid(
+            row=1, column=1, sticky='w', **pad)
+
         btns = ttk.Frame(top)
-        btns.grid(row=1, column=0, columnspan=2, sticky='e', padx=10, pady=(0,10))
-        ttk.Button(btns, text='Apply', command=lambda: self._on_theme_apply(top)).grid(row=0, column=0, padx=(0,6))
-        ttk.Button(btns, text='Close', command=top.destroy).grid(row=0, column=1)
+        btns.grid(row=2, column=0, columnspan=2, sticky='e', padx=10, pady=(0,10))
+        ttk.Button(btns, text='Diagnostics', command=lambda: self.open_diagnostics(top)).grid(row=0, column=0, padx=(0,6))
+        ttk.Button(btns, text='Offline Conflicts', command=lambda: self.open_conflicts(top)).grid(row=0, column=1, padx=(0,6))
+        ttk.Button(btns, text='Apply', command=lambda: self._on_theme_apply(top)).grid(row=0, column=2, padx=(0,6))
+        ttk.Button(btns, text='Close', command=top.destroy).grid(row=0, column=3)
+
+    def open_diagnostics(self, parent):
+        # Latency per operation recorded by diagnostics.traced since startup
+        top = Toplevel(parent)
+        top.title('Diagnostics')
+        top.transient(parent)
+        try:
+            top.grab_set()
+        except Exception:
+            pass
+        columns = ('Operation', 'Calls', 'Errors', 'p50 (ms)', 'p95 (ms)', 'Max (ms)', 'Rows', 'Data')
+        tree = ttk.Treeview(top, columns=columns, show='headings', height=12)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=110 if col == 'Operation' else 80, anchor='w' if col == 'Operation' else 'e')
+        tree.grid(row=0, column=0, columnspan=3, sticky='nsew', padx=10, pady=(10, 4))
+        log_path = diagnostics.slow_log_path()
+        note = (f'Operations over {diagnostics.SLOW_OPERATION_MS} ms and failures are logged to:\n{log_path}'
+                if log_path else 'Slow-operation log is not available.')
+        ttk.Label(top, text=note, justify=LEFT).grid(row=1, column=0, columnspan=3, sticky='w', padx=10, pady=4)
+
+        def fmt_bytes(n):
+            for unit in ('B', 'KB', 'MB'):
+                if n < 1024:
+                    return f'{n:.0f} {unit}'
+                n /= 1024.0
+            return f'{n:.1f} GB'
+
+        def refresh():
+            for iid in tree.get_children():
+                tree.delete(iid)
+            for st in diagnostics.snapshot():
+                tree.insert('', END, values=(
+                    st['op'], st['calls'], st['errors'], f"{st['p50_ms']:.1f}", f"{st['p95_ms']:.1f}",
+                    f"{st['max_ms']:.1f}", st['rows'], fmt_bytes(st['bytes']),
+                ))
+
+        def reset():
+            diagnostics.reset()
+            refresh()
+
+        ttk.Button(top, text='Refresh', command=refresh).grid(row=2, column=0, sticky='w', padx=10, pady=(4, 10))
+        ttk.Button(top, text='Reset', command=reset).grid(row=2, column=1, sticky='w', pady=(4, 10))
+        ttk.Button(top, text='Close', command=top.destroy).grid(row=2, column=2, sticky='e', padx=10, pady=(4, 10))
+        top.grid_columnconfigure(2, weight=1)
+        refresh()
+
+    def open_conflicts(self, parent):
+        # Offline writes the server rejected on replay (local_store conflicts
+        # table): each can be queued again or discarded
+        top = Toplevel(parent)
+        top.title('Offline Conflicts')
+        top.transient(parent)
+        try:
+            top.grab_set()
+        except Exception:
+            pass
+        columns = ('Rejected', 'Change', 'Patient ID', 'Reason', 'Data')
+        tree = ttk.Treeview(top, columns=columns, show='headings', height=12)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width={'Reason': 260, 'Data': 320}.get(col, 90), anchor='w')
+        tree.grid(row=0, column=0, columnspan=4, sticky='nsew', padx=10, pady=(10, 4))
+
+        def describe(conflict):
+            payload = conflict['payload']
+            if conflict['op'] == 'add':
+                return ', '.join(f'{c}: {v}' for c, v in zip(COLUMNS[1:], payload[1:]) if v not in (None, ''))
+            if conflict['op'] == 'update':
+                return ', '.join(f'{c}: {v}' for c, v in payload.items())
+            return ''
+
+        shown = {}  # tree iid -> conflict
+
+        def fill(conflicts):
+            if not top.winfo_exists():
+                return
+            for iid in tree.get_children():
+                tree.delete(iid)
+            shown.clear()
+            for c in conflicts:
+                iid = tree.insert('', END, values=(
+                    c['created_at'], c['op'].capitalize(), c['patient_id'], c['error'], describe(c),
+                ))
+                shown[iid] = c
+
+        def refresh():
+            # On the worker: the store's lock may be held by a load
+            self.db.submit(self.store.list_conflicts, on_success=fill, on_error=self._on_db_error,
+                           busy_text='Reading offline conflicts...')
+
+        def requeue():
+            chosen = [shown[iid] for iid in tree.selection()]
+            if not chosen or not messagebox.askyesno(
+                'Send Again',
+                f'Queue {len(chosen)} rejected change(s) to be sent again?\n\n'
+                'Edits will overwrite what was saved on the other PC.',
+                parent=top,
+            ):
+                return
+
+            def requeued(c, row):
+                self._on_conflict_requeued(c, row)
+                refresh()
+
+            for c in chosen:
+                self.db.submit(
+                    self.store.requeue_conflict, c['id'], write=True,
+                    on_success=lambda row, c=c: requeued(c, row),
+                    on_error=self._on_db_error,
+                    busy_text='Queueing change...',
+                )
+
+        def discard():
+            chosen = [shown[iid] for iid in tree.selection()]
+            if not chosen or not messagebox.askyesno(
+                'Discard Changes',
+                f'Discard {len(chosen)} rejected change(s)? They cannot be recovered.',
+                parent=top,
+            ):
+                return
+            for c in chosen:
+                self.db.submit(self.store.discard_conflict, c['id'], write=True,
+                               on_success=lambda _found: refresh(), on_error=self._on_db_error,
+                               busy_text='Discarding change...')
+
+        ttk.Button(top, text='Send Again', command=requeue).grid(row=1, column=0, sticky='w', padx=10, pady=(4, 10))
+        ttk.Button(top, text='Discard', command=discard).grid(row=1, column=1, sticky='w', pady=(4, 10))
+        ttk.Button(top, text='Refresh', command=refresh).grid(row=1, column=2, sticky='w', padx=(6, 0), pady=(4, 10))
+        ttk.Button(top, text='Close', command=top.destroy).grid(row=1, column=3, sticky='e', padx=10, pady=(4, 10))
+        top.grid_columnconfigure(3, weight=1)
+        refresh()
+
+    def _on_conflict_requeued(self, conflict, row):
+        # The re-queued change shows locally right away, like an offline edit
+        if conflict['op'] == 'delete':
+            changed = self._apply_delta([], [conflict['patient_id']])
+        else:
+            changed = row is not None and self._apply_delta([row], [])
+        if changed:
+            self.refresh_table()
+        self._update_status()
 
     def _on_theme_apply(self, dialog):
         theme = self.theme_var.get().strip()
@@ -641,20 +1369,32 @@ class InventoryApp:
             self.save_settings()
 
     def backup_now(self):
-        try:
-            from backup_utils import backup_all
-            backup_dir = self.settings.get('backup_dir') or os.path.join(self.settings_dir, 'backups')
-            os.makedirs(backup_dir, exist_ok=True)
-            results = backup_all(backup_dir, with_excel=False)
-            msg = "Backup created:\n"
-            if 'sql' in results:
-                msg += f"- SQL: {results['sql']}\n"
-            if 'excel' in results:
-                msg += f"- Excel: {results['excel']}\n"
-            messagebox.showinfo('Backup', msg.rstrip())
-        except DatabaseError as e:
+        from backup_utils import backup_all
+        backup_dir = self.settings.get('backup_dir') or os.path.join(self.settings_dir, 'backups')
+        self.db.submit(
+            self._run_backup, backup_all, backup_dir,
+            on_success=self._on_backup_done,
+            on_error=self._on_backup_error,
+            busy_text='Creating backup...',
+        )
+
+    @staticmethod
+    def _run_backup(backup_all, backup_dir):
+        os.makedirs(backup_dir, exist_ok=True)
+        return backup_all(backup_dir, with_excel=False)
+
+    def _on_backup_done(self, results):
+        msg = "Backup created:\n"
+        if 'sql' in results:
+            msg += f"- SQL: {results['sql']}\n"
+        if 'excel' in results:
+            msg += f"- Excel: {results['excel']}\n"
+        messagebox.showinfo('Backup', msg.rstrip())
+
+    def _on_backup_error(self, e):
+        if isinstance(e, DatabaseError):
             messagebox.showerror('Database Error', f'Backup failed due to database error:\n{e}')
-        except Exception as e:
+        else:
             messagebox.showerror('Backup Error', f'Unexpected error during backup:\n{e}')
 
     def on_auto_backup_toggle(self):
@@ -707,50 +1447,52 @@ class InventoryApp:
         self._auto_backup_after_id = self.root.after(delay_ms, self._run_auto_backup_tick)
 
     def _run_auto_backup_tick(self):
-        # Perform backup quietly; surface errors
-        try:
-            from backup_utils import backup_all
-            backup_dir = self.settings.get('backup_dir') or os.path.join(self.settings_dir, 'backups')
-            os.makedirs(backup_dir, exist_ok=True)
-            backup_all(backup_dir, with_excel=False)
-        except Exception as e:
+        # Perform backup quietly in the background; surface errors
+        from backup_utils import backup_all
+        backup_dir = self.settings.get('backup_dir') or os.path.join(self.settings_dir, 'backups')
+        self.db.submit(
+            self._run_backup, backup_all, backup_dir,
+            on_success=lambda _results: self._after_auto_backup(None),
+            on_error=self._after_auto_backup,
+            busy_text='Auto-backup...',
+        )
+
+    def _after_auto_backup(self, error):
+        if error is not None:
             # Non-fatal: show a brief warning
             try:
-                messagebox.showwarning('Auto-backup', f'Auto-backup encountered an error:\n{e}')
+                messagebox.showwarning('Auto-backup', f'Auto-backup encountered an error:\n{error}')
             except Exception:
                 pass
-        finally:
-            # Schedule next run if still enabled
-            if self.settings.get('auto_backup_enabled', False):
-                self._schedule_next_backup()
+        # Schedule next run if still enabled
+        if self.settings.get('auto_backup_enabled', False):
+            self._schedule_next_backup()
 
     def _get_user_config_dir(self, app_name: str) -> str:
-        system = platform.system()
-        home = os.path.expanduser('~')
-        if system == 'Windows':
-            base = os.environ.get('APPDATA') or os.path.join(home, 'AppData', 'Roaming')
-            return os.path.join(base, app_name)
-        elif system == 'Darwin':
-            return os.path.join(home, 'Library', 'Application Support', app_name)
-        else:
-            base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(home, '.config')
-            return os.path.join(base, app_name)
+        return user_config_dir(app_name)
 
     def export_excel(self):
         from exporter import export_db_to_excel
         export_path = filedialog.asksaveasfilename(defaultextension='.xlsx', filetypes=[('Excel files', '*.xlsx')])
         if export_path:
-            try:
-                export_db_to_excel(export_path)
-                messagebox.showinfo('Exported', f'Inventory exported to {export_path}')
-            except DatabaseError as e:
-                messagebox.showerror('Database Error', f'Failed to export from DB:\n{e}')
-            except Exception as e:
-                messagebox.showerror('Export Error', f'Unexpected error during export:\n{e}')
+            self.db.submit(
+                export_db_to_excel, export_path, self.include_archive_var.get(),
+                on_success=lambda _r: messagebox.showinfo('Exported', f'Inventory exported to {export_path}'),
+                on_error=self._on_export_error,
+                busy_text='Exporting to Excel...',
+            )
+
+    def _on_export_error(self, e):
+        if isinstance(e, DatabaseError):
+            messagebox.showerror('Database Error', f'Failed to export from DB:\n{e}')
+        else:
+            messagebox.showerror('Export Error', f'Unexpected error during export:\n{e}')
 
     def open_extractor(self):
-        # Opens the extractor/merger window defined in extractor.py
+        # Opens the extractor/merger window defined in extractor.py; imported
+        # here because it pulls in openpyxl, which startup doesn't need
         try:
+            from extractor import open_extractor_window
             open_extractor_window(self.root)
         except Exception as e:
             messagebox.showerror('Extractor Error', f'Unable to open extractor window:\n{e}')
\ No newline at end of file